@@ -3,22 +3,82 @@ import pandas as pd
 import os
 from datetime import date, datetime
 import utils
+import async_utils
+import availability
+import balances
+import billing
+import budgets
+import compliance
+import db_pool
+import export
+import instrumentation
+import offline
+import profiling
+import search
+import slow_queries
+import timesheets
+import work_calendar
+import write_queue
 
 st.set_page_config(page_title="Stundenerfassung", layout="wide")
 
+# Opt-in profiler for this rerun (PROFILING=1, or PROFILING=query and ?profile=1)
+profiling.start(st.session_state, st.query_params)
+
+# Per-rerun call and query stats for the debug panel (INSTRUMENTATION=1)
+if instrumentation.ENABLED:
+    instrumentation.start_window()
+
 st.title("⏱️ Stundenerfassung")
 
-# Check database connection
+# Check database connection (fails immediately while offline.py knows the database is down)
 db_success, db_error = utils.test_db_connection()
-if not db_success:
+if not db_success and offline.has_snapshot():
+    offline_stats = offline.status()
+    st.warning(
+        "📴 Keine Verbindung zur Datenbank. Angezeigt wird der zuletzt geladene Stand; Änderungen werden lokal "
+        f"gespeichert und übertragen, sobald die Datenbank wieder erreichbar ist ({offline_stats['offen']} Monate ausstehend)."
+    )
+elif not db_success:
     st.error(db_error)
     st.info("💡 **Quick Fix Options:**\n"
             "1. **If using Supabase:** Go to https://supabase.com/dashboard and resume your paused project\n"
             "2. **To use local database:** Comment out the Supabase line in `.streamlit/secrets.toml` and uncomment the local database line, then run `docker-compose up -d`")
     st.stop()
 
+# Outcome of this session's queued month saves (WRITE_BEHIND=1)
+if st.session_state.get("pending_saves"):
+    still_pending = []
+    for save_emp, save_year, save_month, ticket in st.session_state["pending_saves"]:
+        if not ticket.done():
+            still_pending.append((save_emp, save_year, save_month, ticket))
+        elif not ticket.result():
+            st.error(f"Speichern fehlgeschlagen: {save_emp}, {utils.MONTH_NAMES[save_month - 1]} {save_year}. Bitte erneut speichern.")
+    st.session_state["pending_saves"] = still_pending
+
+# Offline saves that conflict with a change made in the database meanwhile
+offline_conflicts = offline.conflicts()
+if not offline_conflicts.empty:
+    with st.expander(f"⚠️ {len(offline_conflicts)} Offline-Änderung(en) mit Konflikt", expanded=True):
+        st.caption("Diese Monate wurden offline bearbeitet und zwischenzeitlich in der Datenbank geändert.")
+        for conflict in offline_conflicts.itertuples(index=False):
+            c1, c2, c3 = st.columns([3, 1, 1])
+            c1.write(f"{conflict.mitarbeiter}, {utils.MONTH_NAMES[conflict.monat - 1]} {conflict.jahr} (offline gespeichert {conflict.gespeichert})")
+            conflict_key = f"{conflict.mitarbeiter}_{conflict.jahr}_{conflict.monat}"
+            if c2.button("Lokale Version übernehmen", key=f"offline_keep_{conflict_key}"):
+                if offline.resolve(conflict.mitarbeiter, conflict.jahr, conflict.monat, keep_local=True):
+                    st.rerun()
+                st.error("Fehler beim Speichern.")
+            if c3.button("Verwerfen", key=f"offline_drop_{conflict_key}"):
+                offline.resolve(conflict.mitarbeiter, conflict.jahr, conflict.monat, keep_local=False)
+                st.rerun()
+
+# Load master data, calendars and entries concurrently into the utils caches
+if offline.is_online():
+    async_utils.prefetch()
+
 # Tabs
-tab1, tab2_1, tab2_2, tab4 = st.tabs(["Übersicht", "Mitarbeiter", "Projekte", "Einstellungen"])
+tab1, tab2_1, tab2_2, tab3, tab_search, tab4 = st.tabs(["Übersicht", "Mitarbeiter", "Projekte", "Prüfung", "Suche", "Einstellungen"])
 
 # --- Tab 1: Übersicht (Matrix View) ---
 with tab1:
@@ -41,6 +101,9 @@ with tab1:
     with col_filter2:
         employees = utils.get_employees()
         selected_emp_filter = st.selectbox("Mitarbeiter", ["Alle"] + employees)
+    
+    profiling.tag(st.session_state, ansicht="uebersicht" if selected_emp_filter == "Alle" else "mitarbeiter",
+                  jahr=selected_year, mitarbeiter=None if selected_emp_filter == "Alle" else selected_emp_filter)
 
     month_names = ["Januar", "Februar", "März", "April", "Mai", "Juni", "Juli", "August", "September", "Oktober", "November", "Dezember"]
     
@@ -64,23 +127,110 @@ with tab1:
                 # Calculate Grand Total (sum of all projects)
                 grand_total = df_year['stunden'].sum()
                 st.metric(label="Gesamt (Alle Projekte)", value=f"{grand_total:.2f} Std")
+                
+                # Overtime account per employee (year-to-date for the running year)
+                summary = balances.get_year_summary(selected_year)
+                if not summary.empty:
+                    with st.expander("Stundenkonto (Soll / Ist / Saldo)", expanded=True):
+                        st.dataframe(
+                            summary.rename(columns={'mitarbeiter': 'Mitarbeiter', 'soll': 'Soll', 'ist': 'Ist', 'saldo': 'Saldo'})
+                                   .set_index('Mitarbeiter').style.format("{:.2f}"),
+                            use_container_width=True
+                        )
+                
+                leave = utils.get_leave_balances(selected_year)
+                if not leave.empty:
+                    with st.expander("Urlaub & Krankheit (Tage)", expanded=False):
+                        st.dataframe(
+                            leave.rename(columns={
+                                'mitarbeiter': 'Mitarbeiter', 'anspruch': 'Anspruch', 'uebertrag': 'Übertrag',
+                                'urlaub': 'Genommen', 'rest': 'Rest', 'krank': 'Krankheitstage'
+                            }).set_index('Mitarbeiter'),
+                            use_container_width=True
+                        )
+                
+                # Who is absent when (one grid for all employees, cached per period)
+                with st.expander("Verfügbarkeit", expanded=False):
+                    col_av1, col_av2 = st.columns(2)
+                    with col_av1:
+                        av_mode = st.radio("Zeitraum", ["Monat", "Quartal"], horizontal=True, key="av_mode")
+                    with col_av2:
+                        if av_mode == "Monat":
+                            av_month = st.selectbox("Monat", list(range(1, 13)), index=date.today().month - 1,
+                                                    format_func=lambda m: month_names[m - 1], key="av_month")
+                            av_start, av_end = availability.period(selected_year, month=av_month)
+                        else:
+                            av_quarter = st.selectbox("Quartal", [1, 2, 3, 4], index=(date.today().month - 1) // 3,
+                                                      format_func=lambda q: f"Q{q}", key="av_quarter")
+                            av_start, av_end = availability.period(selected_year, quarter=av_quarter)
+                    av_grid = availability.get_availability(av_start, av_end)
+                    if not av_grid.empty:
+                        av_present = availability.present_per_day(av_grid)
+                        av_columns = [d.strftime("%d.%m.") for d in av_grid.columns]
+                        av_labels = pd.DataFrame(availability.label_grid(av_grid, availability.STATUS_LABELS),
+                                                 index=av_grid.index, columns=av_columns)
+                        av_labels.loc["Verfügbar"] = av_present.astype(str)
+                        av_colors = pd.DataFrame(availability.label_grid(av_grid, availability.STATUS_COLORS),
+                                                 index=av_grid.index, columns=av_columns)
+                        av_colors.loc["Verfügbar"] = ""
+                        st.dataframe(av_labels.style.apply(lambda _: av_colors, axis=None), use_container_width=True)
+                        st.caption(" · ".join(
+                            f"{availability.STATUS_LABELS[k] or '–'} = {name}" for k, name in availability.STATUS_NAMES.items()
+                        ))
+                
+                # Budget consumption of all projects (one aggregated query)
+                budget_overview = budgets.get_budget_overview(selected_year)
+                if budget_overview['budget'].notna().any() or (budget_overview['plan_jahr'] > 0).any():
+                    with st.expander("Projektbudgets", expanded=True):
+                        st.dataframe(
+                            budget_overview.rename(columns={
+                                'projekt': 'Projekt', 'budget': 'Budget', 'ist_gesamt': 'Ist gesamt', 'rest': 'Rest',
+                                'verbrauch': 'Verbrauch %', 'plan_jahr': f'Plan {selected_year}',
+                                'ist_jahr': f'Ist {selected_year}', 'verbrauch_jahr': f'Verbrauch {selected_year} %'
+                            }).set_index('Projekt').style.format("{:.1f}", na_rep="–"),
+                            use_container_width=True
+                        )
+                
+                # Hours rolled up over the project hierarchy (one query via the closure table)
+                if utils.has_project_hierarchy():
+                    with st.expander("Projektstruktur", expanded=True):
+                        max_level = int(utils.get_project_tree()['ebene'].max())
+                        tree_depth = st.select_slider(
+                            "Ebenen", options=list(range(max_level + 1)), value=max_level,
+                            format_func=lambda d: f"bis Ebene {d + 1}", key="tree_depth"
+                        )
+                        st.dataframe(
+                            utils.project_rollup_table(selected_year, tree_depth).style.format("{:.2f}"),
+                            use_container_width=True
+                        )
+                
+                # Billable amounts (hours x effective hourly rates)
+                if not utils.get_rates().empty:
+                    with st.expander("Kosten (€)", expanded=False):
+                        cost_by = st.radio("Gruppieren nach", ["Projekt", "Mitarbeiter"], horizontal=True, key="cost_by")
+                        costs = billing.cost_summary(selected_year, by='projekt' if cost_by == "Projekt" else 'mitarbeiter')
+                        st.dataframe(costs.style.format("{:,.2f}"), use_container_width=True)
+                        missing = billing.get_costs(selected_year)['satz'].isna().sum()
+                        if missing:
+                            st.caption(f"⚠️ {missing} Monatssummen ohne gültigen Stundensatz.")
                 st.divider()
                 
                 # Get all projects
                 all_projects = utils.get_projects()
                 
+                # Hours per project, employee and month, aggregated in the DB once for all projects
+                hours_year = utils.monthly_hours(selected_year)
+                project_hours = {proj: grp for proj, grp in hours_year.groupby('projekt')}
+                
                 for proj in all_projects:
                     with st.expander(f"Projekt: {proj}", expanded=True):
-                        # Filter for project
-                        df_proj = df_year[df_year['projekt'] == proj]
+                        df_proj = project_hours.get(proj)
                         
-                        if not df_proj.empty:
+                        if df_proj is not None and not df_proj.empty:
                             # Pivot: Index=Mitarbeiter, Columns=Month
-                            df_proj['Monat'] = df_proj['datum'].apply(lambda x: x.month)
-                            
                             pivot = df_proj.pivot_table(
                                 index='mitarbeiter', 
-                                columns='Monat', 
+                                columns='monat', 
                                 values='stunden', 
                                 aggfunc='sum', 
                                 fill_value=0
@@ -125,8 +275,9 @@ with tab1:
     else:
         st.subheader(f"Erfassung: {selected_emp_filter} - {selected_year}")
         
-        # Get Assigned Projects
+        # Get Assigned Projects and the employee's holiday calendar
         assigned_projects = utils.get_assigned_projects(selected_emp_filter)
+        emp_region = utils.get_employee_region(selected_emp_filter)
         if not assigned_projects:
             st.warning("Diesem Mitarbeiter sind keine Projekte zugewiesen. Bitte unter 'Mitarbeiter' Projekte zuweisen.")
         
@@ -138,10 +289,6 @@ with tab1:
             with st.expander(f"{month_name} {selected_year}", expanded=True):
                 
                 # 1. Prepare Matrix Structure
-                import calendar
-                num_days = calendar.monthrange(selected_year, month_num)[1]
-                days = list(range(1, num_days + 1))
-                
                 # Filter data for this user/month
                 user_data = pd.DataFrame()
                 if not df.empty:
@@ -149,60 +296,21 @@ with tab1:
                            (df['datum'].apply(lambda x: x.year) == selected_year) & \
                            (df['datum'].apply(lambda x: x.month) == month_num)
                     user_data = df[mask]
+                # Saves made while the database was unreachable are shown until they are transferred
+                journaled = offline.journaled_entries(selected_emp_filter, selected_year, month_num)
+                if journaled is not None:
+                    user_data = pd.DataFrame(journaled)
+                    st.caption("📴 Offline gespeichert, noch nicht übertragen")
+                # A queued save (WRITE_BEHIND=1) is shown before it is committed
+                pending = write_queue.pending_entries(selected_emp_filter, selected_year, month_num)
+                if pending is not None:
+                    user_data = pd.DataFrame(pending)
+                    st.caption("⏳ Wird gespeichert …")
                 
                 # Create Matrix DataFrame
                 # Index: Assigned Projects only (no Kommentar)
-                # Columns: Days (1..31)
-                
-                # Initialize
-                # Load holidays and vacation days once for this month
-                holidays = utils.load_holidays()
-                vacation_days = utils.load_vacation_days()
-                
-                matrix_data = {}
-                for d in days:
-                    # Check weekend, holidays, and vacation days
-                    curr_date = date(selected_year, month_num, d)
-                    is_weekend = curr_date.weekday() >= 5 # 5=Sat, 6=Sun
-                    is_holiday = curr_date in holidays
-                    is_vacation = curr_date in vacation_days
-                    
-                    # Determine default value (priority: weekend > holiday > vacation)
-                    if is_weekend:
-                        default_val = "/"
-                    elif is_holiday:
-                        default_val = "F"
-                    elif is_vacation:
-                        default_val = "U"
-                    else:
-                        default_val = None
-                    
-                    # Only use assigned projects
-                    matrix_data[d] = [default_val]*len(assigned_projects)
-                
-                # Row Index Mapping
-                row_index = assigned_projects
-                
-                # Fill with existing data
-                df_matrix = pd.DataFrame(matrix_data, index=row_index)
-                
-                if not user_data.empty:
-                    for _, row in user_data.iterrows():
-                        d = row['datum'].day
-                        proj = row['projekt']
-                        val = None
-                        
-                        if row['typ'] == 'Arbeit':
-                            val = row['stunden']
-                        else:
-                            val = row['typ'] # Code
-                        
-                        # If project exists in index, update the cell
-                        # But preserve holiday/weekend defaults if the DB value is None/empty
-                        if proj in df_matrix.index:
-                            # Only overwrite if we have actual data, not None
-                            if val is not None and str(val).strip() != "" and str(val).lower() != 'nan':
-                                df_matrix.at[proj, d] = val
+                # Columns: Days (1..31), day defaults overlaid with the saved entries
+                df_matrix = work_calendar.month_matrix(selected_year, month_num, assigned_projects, user_data, emp_region)
 
                 # Display Editor
                 # Calculate Row Totals (Project Totals)
@@ -224,7 +332,14 @@ with tab1:
                 grand_total = df_display['Gesamt'].sum()
                 
                 # Display Grand Total as a Metric above or below
-                st.metric("Gesamtstunden (Monat)", f"{grand_total:.2f}")
+                balance = balances.get_employee_month(selected_emp_filter, selected_year, month_num)
+                if balance:
+                    col_ist, col_soll, col_saldo = st.columns(3)
+                    col_ist.metric("Gesamtstunden (Monat)", f"{grand_total:.2f}")
+                    col_soll.metric("Soll (Monat)", f"{balance['soll']:.2f}")
+                    col_saldo.metric("Saldo kumuliert", f"{balance['saldo_kumuliert']:+.2f}", delta=f"{balance['saldo']:+.2f}")
+                else:
+                    st.metric("Gesamtstunden (Monat)", f"{grand_total:.2f}")
 
                 edited_matrix = st.data_editor(
                     df_display,
@@ -269,9 +384,25 @@ with tab1:
                             # Drop 'Gesamt' row and column before saving
                             # We use errors='ignore' just in case
                             to_save = edited_matrix.drop(index=['Gesamt'], columns=['Gesamt'], errors='ignore')
-                            if utils.save_matrix_entries(selected_emp_filter, selected_year, month_num, to_save):
+                            if not offline.is_online():
+                                if offline.journal_matrix(selected_emp_filter, selected_year, month_num, to_save):
+                                    st.rerun()
+                                else:
+                                    st.error("Fehler beim Speichern.")
+                            elif write_queue.ENABLED:
+                                ticket = write_queue.enqueue_matrix(selected_emp_filter, selected_year, month_num, to_save)
+                                if ticket is not None:
+                                    st.session_state.setdefault("pending_saves", []).append(
+                                        (selected_emp_filter, selected_year, month_num, ticket))
+                                    st.rerun()
+                                else:
+                                    st.error("Fehler beim Speichern.")
+                            elif utils.save_matrix_entries(selected_emp_filter, selected_year, month_num, to_save):
                                 st.success("Gespeichert!")
                                 st.rerun()
+                            elif not offline.is_online() and offline.journal_matrix(selected_emp_filter, selected_year, month_num, to_save):
+                                # The connection was lost during the save
+                                st.rerun()
                             else:
                                 st.error("Fehler beim Speichern.")
 
@@ -323,6 +454,75 @@ with tab2_1:
     with col2:
         st.subheader("Hinweis")
         st.write("Bearbeite oder lösche Mitarbeiter direkt in der Liste. Änderungen werden sofort übernommen.")
+        
+        st.write("---")
+        st.subheader("Standort (Feiertagskalender)")
+        if employees:
+            region_emp = st.selectbox("Mitarbeiter", employees, key="region_emp")
+            region_options = [utils.DEFAULT_REGION] + list(utils.GERMAN_STATES)
+            current_region = utils.get_employee_region(region_emp)
+            new_region = st.selectbox(
+                "Feiertagskalender",
+                region_options,
+                index=region_options.index(current_region) if current_region in region_options else 0,
+                format_func=lambda r: r or "Standard (Firma)",
+                key=f"region_select_{region_emp}"
+            )
+            if st.button("Standort speichern", key="region_save"):
+                if utils.set_employee_region(region_emp, new_region):
+                    st.success("Gespeichert!")
+                    st.rerun()
+                else:
+                    st.error("Fehler beim Speichern.")
+        
+        st.write("---")
+        st.subheader("Sollstunden")
+        if employees:
+            hours_emp = st.selectbox("Mitarbeiter", employees, key="hours_emp")
+            new_daily_hours = st.number_input(
+                "Stunden pro Arbeitstag",
+                min_value=0.0, max_value=24.0, step=0.5,
+                value=float(utils.get_employee_daily_hours().get(hours_emp, 8.0)),
+                key=f"daily_hours_{hours_emp}"
+            )
+            if st.button("Sollstunden speichern", key="daily_hours_save"):
+                if utils.set_employee_daily_hours(hours_emp, new_daily_hours):
+                    st.success("Gespeichert!")
+                    st.rerun()
+                else:
+                    st.error("Fehler beim Speichern.")
+        
+        st.write("---")
+        st.subheader("Urlaubsanspruch")
+        if employees:
+            leave_year = st.number_input("Jahr", min_value=2000, max_value=2100, value=date.today().year, step=1, key="leave_year")
+            leave_emp = st.selectbox("Mitarbeiter", employees, key="leave_emp")
+            leave_df = utils.get_leave_balances(leave_year).set_index('mitarbeiter')
+            leave_row = leave_df.loc[leave_emp] if leave_emp in leave_df.index else None
+            col_anspruch, col_uebertrag = st.columns(2)
+            with col_anspruch:
+                new_anspruch = st.number_input(
+                    "Anspruch (Tage)", min_value=0.0, max_value=366.0, step=0.5,
+                    value=float(leave_row['anspruch']) if leave_row is not None else float(utils.DEFAULT_LEAVE_DAYS),
+                    key=f"leave_anspruch_{leave_emp}_{leave_year}"
+                )
+            with col_uebertrag:
+                new_uebertrag = st.number_input(
+                    "Übertrag (Tage)", min_value=0.0, max_value=366.0, step=0.5,
+                    value=float(leave_row['uebertrag']) if leave_row is not None else 0.0,
+                    key=f"leave_uebertrag_{leave_emp}_{leave_year}"
+                )
+            if leave_row is not None:
+                st.caption(f"Genommen: {leave_row['urlaub']} Tage · Rest: {leave_row['rest']:g} Tage · Krank: {leave_row['krank']} Tage")
+            if st.button("Urlaubsanspruch speichern", key="leave_save"):
+                if utils.set_leave_entitlement(leave_emp, leave_year, new_anspruch, new_uebertrag):
+                    st.success("Gespeichert!")
+                    st.rerun()
+                else:
+                    st.error("Fehler beim Speichern.")
+            if st.button(f"Resturlaub {int(leave_year)} nach {int(leave_year) + 1} übertragen", key="leave_carry_over"):
+                count = utils.carry_over_leave(leave_year)
+                st.success(f"Resturlaub für {count} Mitarbeiter übertragen.")
 
 # Sub-Tab: Projekte & Zuweisung
 with tab2_2:
@@ -334,10 +534,11 @@ with tab2_2:
         # Add Project
         with st.form("add_project_form"):
             new_proj_name = st.text_input("Neues Projekt", placeholder="z. B. Kundenprojekt A")
+            new_proj_parent = st.selectbox("Übergeordnet", [None] + all_projects, format_func=lambda p: p or "— keins —")
             add_project_clicked = st.form_submit_button("Projekt erstellen")
         if add_project_clicked:
             if new_proj_name:
-                if utils.add_project(new_proj_name.strip()):
+                if utils.add_project(new_proj_name.strip(), new_proj_parent):
                     st.success(f"Projekt '{new_proj_name}' erstellt.")
                     st.rerun()
                 else:
@@ -371,6 +572,28 @@ with tab2_2:
                             st.error("Löschen fehlgeschlagen.")
         else:
             st.info("Keine Projekte vorhanden.")
+        
+        st.write("---")
+        st.subheader("Projektstruktur")
+        if all_projects:
+            tree = utils.get_project_tree()
+            st.caption(" · ".join(" / ".join(path) for path in tree['pfad'] if len(path) > 1) or "Alle Projekte sind oberste Ebene.")
+            move_proj = st.selectbox("Projekt", all_projects, key="tree_proj")
+            # A project can't be moved below itself or one of its sub-projects
+            subtree = {name for name, path in zip(tree['projekt'], tree['pfad']) if move_proj in path}
+            parent_options = [None] + [p for p in all_projects if p not in subtree]
+            current_parent = tree.set_index('projekt')['parent'].get(move_proj)
+            move_parent = st.selectbox(
+                "Übergeordnetes Projekt", parent_options,
+                index=parent_options.index(current_parent) if current_parent in parent_options else 0,
+                format_func=lambda p: p or "— keins —", key=f"tree_parent_{move_proj}"
+            )
+            if st.button("Struktur speichern", key="tree_save"):
+                if utils.set_project_parent(move_proj, move_parent):
+                    st.success("Gespeichert!")
+                    st.rerun()
+                else:
+                    st.error("Fehler beim Speichern.")
             
     with col_p2:
         st.subheader("Projekt-Zuweisung")
@@ -396,45 +619,147 @@ with tab2_2:
                     st.error("Fehler beim Speichern.")
         else:
             st.info("Bitte erst Mitarbeiter anlegen.")
+        
+        st.write("---")
+        st.subheader("Projektbudget")
+        if all_projects:
+            budget_proj = st.selectbox("Projekt", all_projects, key="budget_proj")
+            budget_total, burndown = budgets.get_burndown(budget_proj)
+            new_budget = st.number_input(
+                "Gesamtbudget (Std.)", min_value=0.0, step=10.0,
+                value=float(budget_total or 0.0), key=f"budget_total_{budget_proj}"
+            )
+            
+            budget_year = st.number_input("Planjahr", min_value=2000, max_value=2100, value=date.today().year, step=1, key="budget_year")
+            planned = burndown[burndown['monat'].map(lambda d: d.year) == budget_year]
+            planned = {d.month: h for d, h in zip(planned['monat'], planned['plan'])}
+            plan_df = pd.DataFrame([[planned.get(m, 0.0) for m in range(1, 13)]], columns=utils.MONTH_NAMES, index=["Plan (Std.)"])
+            edited_plan = st.data_editor(plan_df, use_container_width=True, key=f"budget_plan_{budget_proj}_{budget_year}")
+            
+            if st.button("Budget speichern", key="budget_save"):
+                ok = utils.set_project_budget(budget_proj, new_budget or None)
+                ok = utils.set_monthly_budgets(
+                    budget_proj, budget_year,
+                    {m: edited_plan.iloc[0, m - 1] for m in range(1, 13)}
+                ) and ok
+                if ok:
+                    st.success("Gespeichert!")
+                    st.rerun()
+                else:
+                    st.error("Fehler beim Speichern.")
+            
+            if not burndown.empty:
+                chart = burndown.set_index('monat')[['plan_kumuliert', 'ist_kumuliert']].rename(
+                    columns={'plan_kumuliert': 'Plan kumuliert', 'ist_kumuliert': 'Ist kumuliert'}
+                )
+                if budget_total:
+                    chart['Budget'] = budget_total
+                st.line_chart(chart)
+                forecast = budgets.get_forecast(budget_proj)
+                if forecast['budget']:
+                    if forecast['erschoepft_am']:
+                        end_label = f"{utils.MONTH_NAMES[forecast['erschoepft_am'].month - 1]} {forecast['erschoepft_am'].year}"
+                    else:
+                        end_label = "–"
+                    st.caption(
+                        f"Rest: {forecast['rest']:.1f} Std. · Verbrauch zuletzt: {forecast['run_rate']:.1f} Std./Monat · "
+                        f"Budget voraussichtlich aufgebraucht: {end_label}"
+                    )
 
-# --- Tab 3: Berichte ---
-# with tab3:
-#     st.header("Berichte exportieren")
+# --- Tab 3: Prüfung (Arbeitszeitgesetz & Datenqualität) ---
+with tab3:
+    st.header("Prüfung")
+    st.caption("Tage über 10 Std., Pausenpflicht, Arbeit an Feiertagen / im Betriebsurlaub, doppelte Einträge und nicht zugewiesene Projekte.")
     
-#     df = utils.load_data()
-#     if not df.empty:
-#         df['datum'] = pd.to_datetime(df['datum'])
-#         years = sorted(df['datum'].dt.year.unique(), reverse=True)
-#         report_year = st.selectbox("Jahr für Bericht", years, key="report_year")
+    col_scan, col_full = st.columns(2)
+    with col_scan:
+        if st.button("🔍 Geänderte Monate prüfen", key="compliance_scan"):
+            scanned, found = compliance.scan()
+            st.success(f"{scanned} Mitarbeiter-Monate geprüft, {found} Auffälligkeiten gefunden.")
+    with col_full:
+        if st.button("Alles neu prüfen", key="compliance_full"):
+            scanned, found = compliance.scan(full=True)
+            st.success(f"{scanned} Mitarbeiter-Monate geprüft, {found} Auffälligkeiten gefunden.")
+    
+    findings = compliance.get_findings()
+    if findings.empty:
+        st.info("Keine Auffälligkeiten gefunden.")
+    else:
+        col_f1, col_f2, col_f3 = st.columns(3)
+        with col_f1:
+            finding_years = sorted({d.year for d in findings['datum']}, reverse=True)
+            finding_year = st.selectbox("Jahr", ["Alle"] + finding_years, key="compliance_year")
+        with col_f2:
+            finding_emp = st.selectbox("Mitarbeiter", ["Alle"] + sorted(findings['mitarbeiter'].unique()), key="compliance_emp")
+        with col_f3:
+            finding_rules = st.multiselect(
+                "Regeln", list(compliance.RULES), default=list(compliance.RULES),
+                format_func=lambda r: compliance.RULES[r], key="compliance_rules"
+            )
+        view = findings[findings['regel'].isin(finding_rules)]
+        if finding_year != "Alle":
+            view = view[view['datum'].map(lambda d: d.year) == finding_year]
+        if finding_emp != "Alle":
+            view = view[view['mitarbeiter'] == finding_emp]
         
-#         col1, col2 = st.columns(2)
+        st.metric("Auffälligkeiten", len(view))
+        st.dataframe(
+            view[['datum', 'mitarbeiter', 'projekt', 'regel_text', 'details']].rename(columns={
+                'datum': 'Datum', 'mitarbeiter': 'Mitarbeiter', 'projekt': 'Projekt',
+                'regel_text': 'Regel', 'details': 'Details'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+# --- Suche (Beschreibungen) ---
+with tab_search:
+    st.header("Suche")
+    search_query = st.text_input("Suchbegriff", placeholder="z. B. Kundentermin, \"Review Meeting\", Workshop -intern", key="search_query")
+    col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+    with col_s1:
+        search_emp = st.selectbox("Mitarbeiter", ["Alle"] + utils.get_employees(), key="search_emp")
+    with col_s2:
+        search_proj = st.selectbox("Projekt", ["Alle"] + utils.get_projects(), key="search_proj")
+    with col_s3:
+        search_start = st.date_input("Von", value=None, key="search_start")
+    with col_s4:
+        search_end = st.date_input("Bis", value=None, key="search_end")
+    
+    if search_query.strip():
+        search_args = {
+            "employee": None if search_emp == "Alle" else search_emp,
+            "project": None if search_proj == "Alle" else search_proj,
+            "start": search_start,
+            "end": search_end,
+        }
+        # A new query or filter starts on the first page
+        search_signature = (search_query, *search_args.values())
+        if st.session_state.get("search_signature") != search_signature:
+            st.session_state["search_signature"] = search_signature
+            st.session_state["search_page_input"] = 1
+        search_page = int(st.session_state.get("search_page_input", 1))
+        results, total = search.search_entries(search_query, page=search_page, **search_args)
+        if total == 0 and search_page > 1:
+            # The page is out of range (e.g. entries were deleted) -> back to the first page
+            search_page = st.session_state["search_page_input"] = 1
+            results, total = search.search_entries(search_query, page=1, **search_args)
+        pages = max(1, -(-total // search.PAGE_SIZE))
         
-#         with col1:
-#             # CSV Download
-#             csv_data = df[df['datum'].dt.year == report_year].to_csv(index=False).encode('utf-8')
-#             st.download_button(
-#                 label=f"📄 Download CSV {report_year}",
-#                 data=csv_data,
-#                 file_name=f"{report_year}_stunden.csv",
-#                 mime='text/csv',
-#             )
-            
-#         with col2:
-#             # PDF Generation
-#             if st.button(f"📄 Generiere PDF {report_year}"):
-#                 filename = f"{report_year}_bericht.pdf"
-#                 if utils.generate_pdf_report(report_year, filename):
-#                     with open(filename, "rb") as pdf_file:
-#                         st.download_button(
-#                             label="Download PDF",
-#                             data=pdf_file,
-#                             file_name=filename,
-#                             mime="application/pdf"
-#                         )
-#                 else:
-#                     st.error("Fehler beim Generieren des PDFs oder keine Daten.")
-#     else:
-#         st.info("Keine Daten verfügbar.")
+        if total == 0:
+            st.info("Keine Treffer.")
+        else:
+            st.caption(f"{total} Treffer · Seite {search_page} von {pages}")
+            st.dataframe(
+                results.drop(columns=['id']).rename(columns={
+                    'datum': 'Datum', 'mitarbeiter': 'Mitarbeiter', 'projekt': 'Projekt',
+                    'stunden': 'Stunden', 'typ': 'Typ', 'beschreibung': 'Beschreibung'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+            if pages > 1:
+                st.number_input("Seite", min_value=1, max_value=pages, step=1, key="search_page_input")
 
 # --- Tab 4: Einstellungen (Feiertage) ---
 with tab4:
@@ -523,7 +848,193 @@ with tab4:
                 st.error(message)
     
     st.divider()
+
+    # Export (streamed from the DB, never loads the full table)
+    st.subheader("Export")
+    col_exp1, col_exp2, col_exp3 = st.columns(3)
+    with col_exp1:
+        export_year = st.selectbox("Jahr", ["Alle"] + available_years, key="export_year")
+        export_kind = st.radio("Inhalt", ["Einträge", "Monatssummen", "Kosten"], key="export_kind", horizontal=True)
+    with col_exp2:
+        export_emp = st.selectbox("Mitarbeiter", ["Alle"] + utils.get_employees(), key="export_emp")
+        export_fmt = st.radio("Format", ["CSV", "Parquet"], key="export_fmt", horizontal=True)
+    with col_exp3:
+        export_proj = st.selectbox("Projekt", ["Alle"] + utils.get_projects(), key="export_proj")
+
+    export_args = {
+        "fmt": export_fmt.lower(),
+        "kind": {"Einträge": "entries", "Monatssummen": "aggregates", "Kosten": "costs"}[export_kind],
+        "year": None if export_year == "Alle" else export_year,
+        "employee": None if export_emp == "Alle" else export_emp,
+        "project": None if export_proj == "Alle" else export_proj,
+    }
+
+    def export_data():
+        write_queue.flush()  # include queued month saves
+        return export.export_file(**export_args)
+
+    st.download_button(
+        label=f"📄 Download {export_fmt}",
+        # Callable: the export is only streamed when the button is actually clicked
+        data=export_data,
+        file_name=export.export_filename(**export_args),
+        mime=export.MIME_TYPES[export_args["fmt"]],
+        key="export_download",
+    )
+
+    st.divider()
+    
+    # Hourly rates (effective-dated; most specific match wins)
+    st.subheader("Stundensätze")
+    rates = utils.get_rates()
+    if not rates.empty:
+        for rate in rates.itertuples():
+            col_r1, col_r2, col_r3, col_r4 = st.columns([3, 3, 3, 1])
+            col_r1.write(f"{rate.mitarbeiter or 'Alle Mitarbeiter'} · {rate.projekt or 'Alle Projekte'}")
+            until = rate.gueltig_bis.strftime("%m/%Y") if pd.notna(rate.gueltig_bis) else "offen"
+            col_r2.write(f"{rate.gueltig_ab.strftime('%m/%Y')} – {until}")
+            col_r3.write(f"{rate.satz:,.2f} €/Std.")
+            if col_r4.button("🗑️", key=f"rate_delete_{rate.id}"):
+                utils.delete_rate(rate.id)
+                st.rerun()
+    else:
+        st.info("Noch keine Stundensätze angelegt.")
+    
+    with st.form("add_rate_form"):
+        col_rf1, col_rf2, col_rf3 = st.columns(3)
+        with col_rf1:
+            rate_emp = st.selectbox("Mitarbeiter", ["Alle"] + utils.get_employees(), key="rate_emp")
+            rate_proj = st.selectbox("Projekt", ["Alle"] + utils.get_projects(), key="rate_proj")
+        with col_rf2:
+            rate_from = st.date_input("Gültig ab (Monat)", value=date(date.today().year, 1, 1), key="rate_from")
+            rate_has_end = st.checkbox("Befristet", key="rate_has_end")
+            rate_until = st.date_input("Gültig bis (Monat)", value=date(date.today().year, 12, 1), key="rate_until")
+        with col_rf3:
+            rate_value = st.number_input("Satz (€/Std.)", min_value=0.0, step=5.0, key="rate_value")
+        if st.form_submit_button("Stundensatz hinzufügen"):
+            if utils.save_rate(
+                None if rate_emp == "Alle" else rate_emp,
+                None if rate_proj == "Alle" else rate_proj,
+                rate_from, rate_value,
+                rate_until if rate_has_end else None
+            ):
+                st.success("Stundensatz gespeichert.")
+                st.rerun()
+            else:
+                st.error("Fehler beim Speichern.")
     
+    st.divider()
+    
+    # Slow-query log (statements above the threshold, with EXPLAIN plans on demand)
+    st.subheader("Langsame Abfragen")
+    with st.expander("Abfragen über dem Schwellwert", expanded=False):
+        col_sq1, col_sq2 = st.columns([2, 1])
+        with col_sq1:
+            sq_threshold = st.number_input(
+                "Schwellwert (ms, 0 = aus)", min_value=0, step=50,
+                value=int(slow_queries.get_threshold() or 0), key="slow_query_threshold"
+            )
+            if sq_threshold != int(slow_queries.get_threshold() or 0):
+                slow_queries.set_threshold(sq_threshold)
+        with col_sq2:
+            st.write("")
+            if st.button("🗑️ Log leeren", use_container_width=True, key="slow_query_clear"):
+                slow_queries.clear_log()
+                st.rerun()
+        
+        offenders = slow_queries.top_offenders()
+        if offenders.empty:
+            st.info("Keine langsamen Abfragen protokolliert.")
+        else:
+            st.dataframe(
+                offenders.drop(columns=['letzte_id']).rename(columns={
+                    'statement': 'Statement', 'anzahl': 'Anzahl', 'summe_ms': 'Summe (ms)',
+                    'mittel_ms': 'Mittel (ms)', 'max_ms': 'Max (ms)', 'funktion': 'Funktion'
+                }).style.format({'Summe (ms)': "{:.0f}", 'Mittel (ms)': "{:.0f}", 'Max (ms)': "{:.0f}"}),
+                use_container_width=True,
+                hide_index=True
+            )
+            sq_choice = st.selectbox(
+                "Statement", range(len(offenders)), key="slow_query_choice",
+                format_func=lambda i: f"{offenders['funktion'].iat[i] or '?'} · {offenders['statement'].iat[i][:80]}"
+            )
+            if st.button("EXPLAIN (ANALYZE, BUFFERS) erfassen", key="slow_query_explain"):
+                plan = slow_queries.explain(offenders['letzte_id'].iat[sq_choice])
+                if plan:
+                    st.code(plan)
+                else:
+                    st.error("Plan konnte nicht erfasst werden.")
+    
+    st.divider()
+
+    # PDF report (rendered in memory and cached until the data changes)
+    st.write("### PDF-Bericht")
+    col_rep1, col_rep2 = st.columns([2, 1])
+    with col_rep1:
+        report_year = st.selectbox("Jahr für Bericht", available_years, key="report_year")
+        report_depth = None
+        if utils.has_project_hierarchy():
+            max_level = int(utils.get_project_tree()['ebene'].max())
+            report_depth = st.selectbox(
+                "Projektebenen im Bericht", list(range(max_level + 1)), index=max_level,
+                format_func=lambda d: f"bis Ebene {d + 1}", key="report_depth"
+            )
+            if report_depth == max_level:
+                # All levels: the same cache key as the report prerendered after saves
+                report_depth = None
+    with col_rep2:
+        st.write("")
+        st.write("")
+        report_pdf = utils.get_cached_pdf_report(report_year, max_depth=report_depth)
+        if report_pdf is None and st.button(f"📄 Generiere PDF {report_year}", use_container_width=True):
+            with st.spinner("PDF wird erstellt..."):
+                write_queue.flush()
+                report_pdf = utils.get_pdf_report(report_year, max_depth=report_depth)
+            if report_pdf is None:
+                st.error("Fehler beim Generieren des PDFs oder keine Daten.")
+        if report_pdf is not None:
+            st.download_button(
+                label=f"📄 Download PDF {report_year}",
+                data=report_pdf,
+                file_name=f"{report_year}_bericht.pdf",
+                mime="application/pdf",
+                use_container_width=True,
+                key="report_download",
+            )
+
+    # Monthly timesheets for all employees (rendered in parallel, one PDF each)
+    st.write("### Stundenzettel (alle Mitarbeiter)")
+    col_ts1, col_ts2, col_ts3 = st.columns([1, 1, 1])
+    with col_ts1:
+        ts_year = st.selectbox("Jahr", available_years, key="ts_year")
+    with col_ts2:
+        ts_month = st.selectbox("Monat", list(range(1, 13)), index=date.today().month - 1,
+                                format_func=lambda m: utils.MONTH_NAMES[m - 1], key="ts_month")
+    with col_ts3:
+        st.write("")
+        st.write("")
+        if st.button("🗂️ Stundenzettel erzeugen", use_container_width=True, key="ts_generate"):
+            progress_bar = st.progress(0.0, text="Stundenzettel werden erstellt...")
+            write_queue.flush()
+
+            def update_progress(done, total, employee):
+                progress_bar.progress(done / total, text=f"{done}/{total}: {employee}")
+
+            st.session_state["ts_zip"] = (ts_year, ts_month, timesheets.generate_timesheet_zip(ts_year, ts_month, progress=update_progress))
+            progress_bar.empty()
+        ts_zip = st.session_state.get("ts_zip")
+        if ts_zip and ts_zip[:2] == (ts_year, ts_month):
+            st.download_button(
+                label="📦 Download ZIP",
+                data=ts_zip[2],
+                file_name=f"{ts_year}_{ts_month:02d}_stundenzettel.zip",
+                mime="application/zip",
+                use_container_width=True,
+                key="ts_download",
+            )
+
+    st.divider()
+
     # Holiday Management
     st.subheader("Feiertage verwalten")
     
@@ -537,25 +1048,42 @@ with tab4:
                                  available_years,
                                  key="holiday_year")
     
+    # Holiday calendar: company default or one per German state (assigned per employee)
+    holiday_region = st.selectbox("Kalender", [utils.DEFAULT_REGION] + list(utils.GERMAN_STATES),
+                                  format_func=lambda r: r or "Standard (Firma)",
+                                  key="holiday_region")
+    
     col_actions = st.columns([1, 1])
     
-    # Auto-generate holidays
+    with col_actions[1]:
+        # A state calendar always gets that state's holidays
+        state_options = list(utils.GERMAN_STATES)
+        holiday_state = st.selectbox("Bundesland", state_options,
+                                     index=state_options.index(holiday_region or utils.DEFAULT_STATE),
+                                     disabled=bool(holiday_region),
+                                     key=f"holiday_state_{holiday_region}")
+        holiday_year_to = st.number_input("Bis Jahr", min_value=int(holiday_year), max_value=2100,
+                                          value=int(holiday_year), step=1, key="holiday_year_to")
+    
+    # Auto-generate holidays (one bulk insert for the whole year range)
     with col_actions[0]:
         if st.button("🇩🇪 Feiertage generieren", type="primary", use_container_width=True):
-            count, error = utils.populate_german_holidays(holiday_year)
+            holiday_years = range(int(holiday_year), int(holiday_year_to) + 1)
+            count, error = utils.populate_holidays_bulk(holiday_years, holiday_state, holiday_region)
             if error:
                 st.error(error)
             elif count > 0:
                 st.success(f"{count} Feiertage hinzugefügt!")
                 st.rerun()
             else:
-                st.info(f"Alle Feiertage für {holiday_year} bereits vorhanden.")
+                year_label = holiday_year if holiday_year_to == holiday_year else f"{holiday_year}–{holiday_year_to}"
+                st.info(f"Alle Feiertage für {year_label} bereits vorhanden.")
     
     st.divider()
     
     # Display holidays for selected year with edit and delete functionality
     st.write(f"### Feiertage {holiday_year}")
-    h_df = utils.get_holidays_df(year=holiday_year)
+    h_df = utils.get_holidays_df(year=holiday_year, region=holiday_region)
     
     if not h_df.empty:
         # Display holidays with editable names and delete buttons
@@ -565,15 +1093,15 @@ with tab4:
                 st.write(f"**{row['Datum']}**")
             with col2:
                 # Editable name field
-                new_name = st.text_input("Name", value=row['Name'], key=f"h_edit_{row['Datum']}", label_visibility="collapsed")
+                new_name = st.text_input("Name", value=row['Name'], key=f"h_edit_{holiday_region}_{row['Datum']}", label_visibility="collapsed")
                 if new_name != row['Name']:
-                    utils.update_holiday(row['Datum'], new_name)
+                    utils.update_holiday(row['Datum'], new_name, holiday_region)
             with col3:
-                if st.button("�", key=f"save_h_{row['Datum']}", help="Änderungen speichern"):
+                if st.button("�", key=f"save_h_{holiday_region}_{row['Datum']}", help="Änderungen speichern"):
                     st.rerun()
             with col4:
-                if st.button("�🗑️", key=f"del_h_{row['Datum']}", help="Löschen"):
-                    if utils.delete_holiday(row['Datum']):
+                if st.button("�🗑️", key=f"del_h_{holiday_region}_{row['Datum']}", help="Löschen"):
+                    if utils.delete_holiday(row['Datum'], holiday_region):
                         st.success("Gelöscht!")
                         st.rerun()
     else:
@@ -592,7 +1120,7 @@ with tab4:
         st.write("")
         if st.button("➕ Hinzufügen", use_container_width=True, key="add_holiday_btn"):
             if h_name:
-                if utils.save_holiday(h_date, h_name):
+                if utils.save_holiday(h_date, h_name, holiday_region):
                     st.success("Gespeichert!")
                     st.rerun()
                 else:
@@ -659,3 +1187,41 @@ with tab4:
                     st.info("Urlaubstag existiert bereits.")
             else:
                 st.error("Bitte Name eingeben.")
+
+# --- Debug panel: data-layer calls and SQL round trips of this rerun (INSTRUMENTATION=1) ---
+if instrumentation.ENABLED:
+    debug_stats = instrumentation.current_window()
+    with st.sidebar.expander("🔍 Debug: Datenzugriffe", expanded=False):
+        st.caption(f"{debug_stats.query_count} SQL-Abfragen · {debug_stats.query_seconds * 1000:.0f} ms in diesem Durchlauf")
+        pool_stats = db_pool.pool_metrics(utils.engine)
+        st.caption(
+            f"Pool ({pool_stats['modus']}): {pool_stats['ausgeliehen']}/{pool_stats['groesse']} belegt · "
+            f"Overflow {pool_stats['overflow']} · Wartezeit p95 {pool_stats['wartezeit_p95_s'] * 1000:.1f} ms"
+        )
+        if write_queue.ENABLED:
+            queue_stats = write_queue.status()
+            st.caption(
+                f"Schreibpuffer: {queue_stats['wartend']} wartend · {queue_stats['batches']} Batches · "
+                f"{queue_stats['zusammengefasst']} zusammengefasst · {queue_stats['fehlgeschlagen']} fehlgeschlagen"
+            )
+        offline_stats = offline.status()
+        st.caption(
+            f"Datenbank: {'erreichbar' if offline_stats['online'] else 'offline'} · Offline-Journal: "
+            f"{offline_stats['offen']} offen · {offline_stats['konflikte']} Konflikte · {offline_stats['uebertragen']} übertragen"
+        )
+        if utils.replica_router is not None:
+            replica_stats = utils.replica_router.status()
+            lag = replica_stats['verzoegerung_s']
+            st.caption(
+                f"Replica: {'aktiv' if replica_stats['gesund'] and replica_stats['aufgeholt'] else 'umgangen'} · "
+                f"Verzögerung {'–' if lag is None else f'{lag:.1f} s'} · "
+                f"Lesezugriffe {replica_stats['lesezugriffe_replica']} Replica / {replica_stats['lesezugriffe_primary']} Primary"
+            )
+        st.dataframe(instrumentation.function_table(debug_stats), use_container_width=True, hide_index=True)
+        st.dataframe(instrumentation.statement_table(debug_stats), use_container_width=True, hide_index=True)
+        st.download_button("Prometheus-Metriken (gesamt)", instrumentation.prometheus_text(),
+                           file_name="hourtracking.prom", mime="text/plain")
+    if instrumentation.PROMETHEUS_FILE:
+        instrumentation.write_prometheus(instrumentation.PROMETHEUS_FILE)
+
+profiling.finish(st.session_state)
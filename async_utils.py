@@ -0,0 +1,173 @@
+"""
+asyncio data layer mirroring the public utils API, on SQLAlchemy async with asyncpg.
+
+Readers (READERS) run the utils function itself inside a greenlet whose queries are awaited
+on the event loop, so independent reads overlap and no thread is held per call. They share
+the utils lru caches with the sync callers: a cached result returns without a query, and a
+computed one is cached for both. Replica routing (utils.read_engine) applies unchanged; the
+chosen engine is swapped for its asyncpg counterpart.
+
+Every other public utils function (writes, PDF rendering, ...) is available as a coroutine
+function running in a worker thread (asyncio.to_thread): writes run the sync month-save
+listeners and the cache invalidation and stay on utils.engine.
+
+Each event loop gets its own asyncpg engines (pool settings from db_pool); call dispose()
+before closing a loop. Sync callers use run(), which executes a coroutine on one shared
+background loop, or prefetch(), which gathers the reads of the main views concurrently and
+leaves them in the utils caches.
+
+Usage:
+    entries, employees = await asyncio.gather(async_utils.load_data(), async_utils.get_employees())
+    await async_utils.save_entry(datum, mitarbeiter, projekt, stunden, beschreibung, typ)
+    async_utils.prefetch()                     # sync code, e.g. at the top of app.py
+"""
+import asyncio
+import contextvars
+import threading
+import weakref
+
+from sqlalchemy.util import greenlet_spawn
+
+import db_pool
+import utils
+
+READERS = (
+    "load_data", "get_employees", "get_employee_regions", "get_employee_daily_hours",
+    "get_employee_region", "get_projects", "get_project_tree", "project_rollup",
+    "project_rollup_table", "has_project_hierarchy", "get_rates", "get_assigned_projects",
+    "get_all_assigned_projects", "load_holidays", "load_region_holidays", "load_vacation_days",
+    "get_holidays_df", "get_vacation_days_df", "get_month_entries", "monthly_hours",
+    "get_leave_balances",
+)
+
+# event loop -> {utils sync engine: sync facade of the matching asyncpg engine}
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _engine_map():
+    """The asyncpg engines of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    with _engines_lock:
+        mapping = _engines.get(loop)
+        if mapping is None:
+            mapping = {utils.engine: db_pool.create_async_pooled_engine(utils.DB_URL).sync_engine}
+            if utils.replica_engine is not None:
+                mapping[utils.replica_engine] = db_pool.create_async_pooled_engine(utils.REPLICA_URL).sync_engine
+            _engines[loop] = mapping
+    return mapping
+
+
+def _reader(name):
+    async def call(*args, **kwargs):
+        func = getattr(utils, name)
+        mapping = _engine_map()
+
+        def run():
+            token = utils._engine_override.set(mapping)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                utils._engine_override.reset(token)
+
+        return await greenlet_spawn(run)
+
+    call.__name__ = call.__qualname__ = name
+    call.__doc__ = getattr(utils, name).__doc__
+    return call
+
+
+for _name in READERS:
+    globals()[_name] = _reader(_name)
+
+
+def _threaded(name):
+    async def call(*args, **kwargs):
+        return await asyncio.to_thread(getattr(utils, name), *args, **kwargs)
+
+    call.__name__ = call.__qualname__ = name
+    call.__doc__ = getattr(utils, name).__doc__
+    return call
+
+
+def __getattr__(name):
+    """Public utils functions that are not READERS, as coroutine functions run in a worker thread."""
+    if name.startswith("_"):
+        raise AttributeError(name)
+    value = getattr(utils, name)
+    if not callable(value) or isinstance(value, type):
+        return value
+    return _threaded(name)
+
+
+async def load_view(assignments=True):
+    """
+    The independent reads behind the main views, gathered concurrently: master data,
+    calendars, all entries and (optionally) the project assignments. Returns {name: result}.
+    """
+    calls = {
+        "employees": get_employees(),
+        "projects": get_projects(),
+        "regions": get_employee_regions(),
+        "daily_hours": get_employee_daily_hours(),
+        "holidays": load_region_holidays(),
+        "vacation_days": load_vacation_days(),
+        "entries": load_data(),
+    }
+    if assignments:
+        calls["assignments"] = get_all_assigned_projects()
+    results = await asyncio.gather(*calls.values())
+    return dict(zip(calls, results))
+
+
+async def dispose():
+    """Closes the connections of the running loop's asyncpg engines."""
+    with _engines_lock:
+        mapping = _engines.pop(asyncio.get_running_loop(), {})
+    for sync_engine in mapping.values():
+        await greenlet_spawn(sync_engine.dispose)
+
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-utils", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+async def _in_context(coro, context):
+    return await context.run(asyncio.ensure_future, coro)
+
+
+def run(coro, timeout=None):
+    """
+    Sync facade: runs a coroutine on the shared background event loop and returns its result.
+    The coroutine sees the caller's context variables (e.g. the instrumentation window).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError("async_utils.run() would block the running event loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(_in_context(coro, contextvars.copy_context()), _background_loop()).result(timeout)
+
+
+def prefetch(timeout=None):
+    """
+    Sync facade for the existing callers: loads the cached readers of load_view concurrently,
+    so the following utils calls are cache hits. Errors are printed; the sync readers then
+    load the data themselves.
+    """
+    try:
+        return run(load_view(assignments=False), timeout)
+    except Exception as e:
+        print(f"Error prefetching data: {e}")
+        return None
@@ -0,0 +1,167 @@
+"""
+Team availability: an employees x days status grid for a month or quarter.
+
+The grid starts from the precomputed day types of each employee's calendar region
+(work_calendar) and is overlaid with the absence codes from a single aggregated query
+(one row per employee and absent day). Grids are cached per period and rebuilt only
+when entries of one of its months, holidays or the employee list change.
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import utils
+import work_calendar
+
+AVAILABLE = 0
+WEEKEND = 1
+HOLIDAY = 2
+COMPANY_VACATION = 3
+VACATION = 4
+SICK = 5
+
+STATUS_LABELS = {
+    AVAILABLE: "",
+    WEEKEND: "/",
+    HOLIDAY: "F",
+    COMPANY_VACATION: "BU",
+    VACATION: "U",
+    SICK: "KK",
+}
+STATUS_NAMES = {
+    AVAILABLE: "Verfügbar",
+    WEEKEND: "Wochenende",
+    HOLIDAY: "Feiertag",
+    COMPANY_VACATION: "Betriebsurlaub",
+    VACATION: "Urlaub",
+    SICK: "Krank",
+}
+STATUS_COLORS = {
+    AVAILABLE: "",
+    WEEKEND: "background-color: #e0e0e0",
+    HOLIDAY: "background-color: #b3d9ff",
+    COMPANY_VACATION: "background-color: #d9c2f0",
+    VACATION: "background-color: #ffe08a",
+    SICK: "background-color: #ff9e9e",
+}
+
+# Calendar day type -> status
+_DAY_TYPE_STATUS = np.array([AVAILABLE, WEEKEND, HOLIDAY, COMPANY_VACATION], dtype=np.int8)
+# Entry code -> status; on a day with several codes the highest wins
+_CODE_STATUS = {"F": HOLIDAY, "U": VACATION, "KK": SICK}
+
+# (start, end) -> (token, grid)
+_grids = {}
+_lock = threading.Lock()
+
+
+def period(year, month=None, quarter=None):
+    """Returns (start, end) dates (both inclusive) of a month or quarter."""
+    first_month = month if month else (quarter - 1) * 3 + 1
+    months = 1 if month else 3
+    start = date(int(year), first_month, 1)
+    end_year, end_month = divmod(first_month - 1 + months, 12)
+    end = date(int(year) + end_year, end_month + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+def _months(start, end):
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _token(start, end, employees):
+    return (
+        utils.get_holiday_version(),
+        tuple(employees),
+        tuple(sorted(utils.get_employee_regions().items())),
+        tuple(utils.get_month_version(y, m) for y, m in _months(start, end)),
+    )
+
+
+def _base_grid(start, end, employees):
+    """Calendar status per employee and day from the region day-type arrays."""
+    regions = utils.get_employee_regions()
+    emp_regions = [regions.get(emp) or utils.DEFAULT_REGION for emp in employees]
+    region_list = sorted(set(emp_regions))
+    rows = []
+    for region in region_list:
+        parts = []
+        for year in range(start.year, end.year + 1):
+            cal = work_calendar.year_calendar(year, region)
+            first = (max(start, date(year, 1, 1)) - date(year, 1, 1)).days
+            last = (min(end, date(year, 12, 31)) - date(year, 1, 1)).days
+            parts.append(cal.day_types[first:last + 1])
+        rows.append(_DAY_TYPE_STATUS[np.concatenate(parts)])
+    region_index = np.array([region_list.index(r) for r in emp_regions], dtype=np.intp)
+    num_days = (end - start).days + 1
+    if not rows:
+        return np.zeros((0, num_days), dtype=np.int8)
+    return np.array(rows)[region_index]
+
+
+def _absences(start, end):
+    query = """
+        SELECT mitarbeiter, datum,
+               MAX(CASE typ WHEN 'KK' THEN 3 WHEN 'U' THEN 2 WHEN 'F' THEN 1 END) AS code
+        FROM entries
+        WHERE typ IN ('U', 'KK', 'F') AND datum >= :start AND datum <= :end
+        GROUP BY mitarbeiter, datum
+    """
+    return pd.read_sql(text(query), utils.read_engine(), params={"start": start, "end": end})
+
+
+def _build(start, end, employees):
+    grid = _base_grid(start, end, employees)
+    absences = _absences(start, end)
+    if not absences.empty and len(employees):
+        rows = absences['mitarbeiter'].map({emp: i for i, emp in enumerate(employees)})
+        valid = rows.notna().to_numpy()
+        rows = rows[valid].astype(np.intp).to_numpy()
+        cols = (pd.to_datetime(absences['datum'][valid]) - pd.Timestamp(start)).dt.days.to_numpy()
+        status = np.array([AVAILABLE, HOLIDAY, VACATION, SICK], dtype=np.int8)[absences['code'][valid].astype(int).to_numpy()]
+        # Weekends stay weekends; everything else shows the entered absence
+        keep = grid[rows, cols] != WEEKEND
+        grid[rows[keep], cols[keep]] = status[keep]
+    grid.setflags(write=False)
+    return grid
+
+
+def get_availability(start, end):
+    """
+    Status grid for all employees between start and end (both inclusive) as a DataFrame
+    (index: employees, columns: dates, values: AVAILABLE / WEEKEND / HOLIDAY / ...).
+    """
+    employees = [e for e in utils.get_employees() if e != "System"]
+    token = _token(start, end, employees)
+    with _lock:
+        cached = _grids.get((start, end))
+    if cached is None or cached[0] != token:
+        try:
+            grid = _build(start, end, employees)
+        except Exception as e:
+            print(f"Error loading availability: {e}")
+            grid = np.zeros((len(employees), (end - start).days + 1), dtype=np.int8)
+            return pd.DataFrame(grid, index=employees, columns=pd.date_range(start, end).date)
+        cached = (token, grid)
+        with _lock:
+            _grids[(start, end)] = cached
+    return pd.DataFrame(cached[1], index=employees, columns=pd.date_range(start, end).date)
+
+
+def present_per_day(grid):
+    """Number of available employees per day."""
+    return (grid == AVAILABLE).sum(axis=0)
+
+
+def label_grid(grid, mapping):
+    """Maps a status grid to an object array of mapping values (e.g. STATUS_LABELS)."""
+    lookup = np.array([mapping.get(status, "") for status in range(max(mapping) + 1)], dtype=object)
+    return lookup[np.asarray(grid, dtype=np.intp)]
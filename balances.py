@@ -0,0 +1,220 @@
+"""
+Target hours (Soll), actual hours (Ist) and overtime balance (Saldo) per employee and month.
+
+Soll = working days of the employee's calendar region x contracted daily hours, minus days
+marked U / KK / F. Per year, the raw inputs for all employees are loaded in two aggregated
+queries into numpy arrays (hours: employees x 12, absences: employees x days); balances are then
+computed for everyone at once. Saving a month only reloads that employee-month (see
+utils.register_month_save_listener).
+"""
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+import utils
+import work_calendar
+
+# Entry codes that reduce the target hours of a working day
+ABSENCE_CODES = ('U', 'KK', 'F')
+
+BALANCE_COLUMNS = ['mitarbeiter', 'monat', 'soll', 'ist', 'saldo', 'saldo_kumuliert']
+
+
+class _YearData:
+    """Aggregated actual hours and absence days of one year for all employees."""
+
+    def __init__(self, year, version, employees):
+        self.year = year
+        self.version = version
+        self.employees = list(employees)
+        self.index = {emp: i for i, emp in enumerate(self.employees)}
+        num_days = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+        self.actual = np.zeros((len(self.employees), 12))
+        self.absent = np.zeros((len(self.employees), num_days), dtype=bool)
+
+    def set_hours(self, rows):
+        for emp, month, hours in rows:
+            if emp in self.index:
+                self.actual[self.index[emp], int(month) - 1] = hours
+
+    def set_absences(self, rows):
+        start = date(self.year, 1, 1)
+        for emp, day in rows:
+            if emp in self.index:
+                self.absent[self.index[emp], (day - start).days] = True
+
+
+# year -> _YearData, valid while its version matches utils.get_data_version()
+_years = {}
+_lock = threading.Lock()
+
+
+def _employees():
+    return [e for e in utils.get_employees() if e != "System"]
+
+
+def _query_hours(conn, start, end, employee=None):
+    emp_filter = "AND mitarbeiter = :employee" if employee else ""
+    result = conn.execute(text(f"""
+        SELECT mitarbeiter, CAST(EXTRACT(YEAR FROM datum) AS INTEGER),
+               CAST(EXTRACT(MONTH FROM datum) AS INTEGER), SUM(stunden)
+        FROM entries
+        WHERE typ = 'Arbeit' AND datum >= :start AND datum < :end {emp_filter}
+        GROUP BY 1, 2, 3
+    """), {"start": start, "end": end, "employee": employee})
+    return result.fetchall()
+
+
+def _query_absences(conn, start, end, employee=None):
+    emp_filter = "AND mitarbeiter = :employee" if employee else ""
+    result = conn.execute(text(f"""
+        SELECT DISTINCT mitarbeiter, datum
+        FROM entries
+        WHERE typ IN :codes AND datum >= :start AND datum < :end {emp_filter}
+    """).bindparams(bindparam("codes", expanding=True)),
+        {"codes": list(ABSENCE_CODES), "start": start, "end": end, "employee": employee})
+    return result.fetchall()
+
+
+def _load_years(years):
+    """Loads the given years for all employees with one query per data kind."""
+    version = utils.get_data_version()
+    employees = _employees()
+    data = {year: _YearData(year, version, employees) for year in years}
+    start, end = date(min(years), 1, 1), date(max(years) + 1, 1, 1)
+    with utils.read_engine().connect() as conn:
+        hours = _query_hours(conn, start, end)
+        absences = _query_absences(conn, start, end)
+    for year, year_data in data.items():
+        year_data.set_hours((emp, month, h) for emp, y, month, h in hours if y == year)
+        year_data.set_absences((emp, day) for emp, day in absences if day.year == year)
+    return data
+
+
+def _get_years(years):
+    years = sorted({int(y) for y in years})
+    version = utils.get_data_version()
+    with _lock:
+        missing = [y for y in years if y not in _years or _years[y].version != version]
+    if missing:
+        try:
+            loaded = _load_years(missing)
+        except Exception as e:
+            print(f"Error loading balances: {e}")
+            return {}
+        with _lock:
+            _years.update(loaded)
+    with _lock:
+        return {y: _years[y] for y in years if y in _years}
+
+
+def _on_month_saved(mitarbeiter, year, month):
+    """Refreshes one employee-month of a cached year instead of reloading the whole year."""
+    version = utils.get_saved_version() or utils.get_data_version()
+    with _lock:
+        year_data = _years.get(year)
+        # Only patch if nothing but this save changed since the cache was built; a cache already
+        # at the save's version was patched for an earlier month of the same batch (or loaded after it)
+        if year_data is None or year_data.version not in (version - 1, version) or mitarbeiter not in year_data.index:
+            _years.pop(year, None)
+            return
+    start = date(year, month, 1)
+    end = date(year + (month == 12), month % 12 + 1, 1)
+    try:
+        with utils.read_engine().connect() as conn:
+            hours = _query_hours(conn, start, end, mitarbeiter)
+            absences = _query_absences(conn, start, end, mitarbeiter)
+    except Exception as e:
+        print(f"Error updating balances: {e}")
+        with _lock:
+            _years.pop(year, None)
+        return
+    with _lock:
+        if _years.get(year) is not year_data or year_data.version not in (version - 1, version):
+            return
+        row = year_data.index[mitarbeiter]
+        month_days = work_calendar.year_calendar(year).month_slice(month)
+        year_data.actual[row, month - 1] = 0.0
+        year_data.set_hours((emp, m, h) for emp, _, m, h in hours)
+        year_data.absent[row, month_days] = False
+        year_data.set_absences(absences)
+        year_data.version = version
+
+
+utils.register_month_save_listener(_on_month_saved)
+
+
+def _compute(year_data, today=None):
+    """Returns (soll, ist) arrays of shape employees x 12."""
+    year = year_data.year
+    regions = utils.get_employee_regions()
+    daily_hours = utils.get_employee_daily_hours()
+
+    # One workday mask per region, broadcast to all employees of that region
+    emp_regions = [regions.get(emp) or utils.DEFAULT_REGION for emp in year_data.employees]
+    region_list = sorted(set(emp_regions))
+    masks = np.array([work_calendar.year_calendar(year, r).day_types == work_calendar.WORKDAY for r in region_list])
+    region_index = np.array([region_list.index(r) for r in emp_regions], dtype=np.intp)
+    workdays = masks[region_index] & ~year_data.absent if len(region_index) else year_data.absent.copy()
+
+    # For the running year only days up to today count towards the target
+    today = today or date.today()
+    if today.year == year:
+        workdays[:, (today - date(year, 1, 1)).days + 1:] = False
+
+    offsets = [work_calendar.year_calendar(year).month_slice(m).start for m in range(1, 13)]
+    days_per_month = np.add.reduceat(workdays.astype(np.int16), offsets, axis=1)
+    hours = np.array([daily_hours.get(emp, 8.0) for emp in year_data.employees])
+    soll = days_per_month * hours[:, None]
+    return soll, year_data.actual.copy()
+
+
+def compute_balances(years, today=None):
+    """
+    Balances for all employees and the given years as a DataFrame with BALANCE_COLUMNS
+    plus 'jahr'. The cumulative balance restarts every year.
+    """
+    frames = []
+    for year, year_data in _get_years(years).items():
+        if not year_data.employees:
+            continue
+        soll, ist = _compute(year_data, today)
+        saldo = ist - soll
+        employees = len(year_data.employees)
+        frames.append(pd.DataFrame({
+            'jahr': year,
+            'mitarbeiter': np.repeat(year_data.employees, 12),
+            'monat': np.tile(np.arange(1, 13), employees),
+            'soll': soll.ravel(),
+            'ist': ist.ravel(),
+            'saldo': saldo.ravel(),
+            'saldo_kumuliert': np.cumsum(saldo, axis=1).ravel(),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=['jahr'] + BALANCE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_balances(year, today=None):
+    """Monthly balances of all employees for one year (see compute_balances)."""
+    return compute_balances([year], today).drop(columns='jahr')
+
+
+def get_year_summary(year, today=None):
+    """Soll, Ist and Saldo per employee for the whole year (year-to-date for the running year)."""
+    df = get_balances(year, today)
+    if df.empty:
+        return pd.DataFrame(columns=['mitarbeiter', 'soll', 'ist', 'saldo'])
+    return df.groupby('mitarbeiter', sort=True)[['soll', 'ist', 'saldo']].sum().reset_index()
+
+
+def get_employee_month(employee, year, month, today=None):
+    """Returns the balance row (dict) of one employee and month, or None."""
+    df = get_balances(year, today)
+    row = df[(df['mitarbeiter'] == employee) & (df['monat'] == int(month))]
+    if row.empty:
+        return None
+    return row.iloc[0].to_dict()
@@ -0,0 +1,391 @@
+"""
+Benchmark suite for the data layer and the UI builders on deterministic synthetic data.
+
+Each scale (N employees x M projects x Y years) seeds the database with editor-like data:
+every assigned project row carries the day codes ("/" weekends, "F" holidays, "U" vacation,
+"KK" sick days) and working days split their hours over one or two projects. Synthetic
+employees, projects and the calendar region are prefixed with BENCH_PREFIX and live in
+years from BENCH_START_YEAR on, so they never collide with real data and are removed again
+after the run. Point DATABASE_URL at a scratch database for numbers that are comparable
+across runs (load_data reads the whole entries table).
+
+Timed operations (cold caches unless noted):
+    load_data        utils.load_data() of the full entries table
+    month_matrix     one employee's 12 editor matrices as built by the app (load_data warm)
+    save_matrix      utils.save_matrix_entries() of one employee-month, listeners included
+    yearly_pivot     utils.monthly_hours() plus the per-project month pivots of the overview
+    pdf_report       utils.generate_pdf_report() of the last benchmark year
+    holidays         utils.populate_holidays_bulk() for all benchmark years
+
+CLI usage:
+    python benchmark.py                                     # small and medium scales
+    python benchmark.py --scales small,200x50x3 -o bench.json
+    python benchmark.py -o bench.json --baseline baseline.json --fail-on-regression
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import utils
+import work_calendar
+# The app registers these month-save listeners; import them so saves cost what they cost in the app
+import balances  # noqa: F401
+import compliance  # noqa: F401
+
+BENCH_PREFIX = "Bench "
+BENCH_REGION = "Bench"
+BENCH_START_YEAR = 2090
+
+# name -> (employees, projects, years)
+SCALES = {
+    "small": (10, 5, 1),
+    "medium": (50, 20, 2),
+    "large": (200, 50, 3),
+}
+DEFAULT_SCALES = ("small", "medium")
+
+OPERATIONS = ('load_data', 'month_matrix', 'save_matrix', 'yearly_pivot', 'pdf_report', 'holidays')
+
+# Matrices / saves are timed for this many employees per repetition
+SAMPLE_EMPLOYEES = 5
+
+# A median this much slower than the baseline counts as a regression
+DEFAULT_THRESHOLD = 1.25
+
+INSERT_BATCH = 10000
+
+ENTRY_COLUMNS = ['datum', 'mitarbeiter', 'projekt', 'stunden', 'beschreibung', 'typ']
+
+_DESCRIPTIONS = np.array(["", "", "", "Entwicklung", "Meeting", "Review", "Kundentermin", "Dokumentation"], dtype=object)
+
+
+def parse_scale(name):
+    """Returns (employees, projects, years) for a preset name or an 'NxMxY' string."""
+    if name in SCALES:
+        return SCALES[name]
+    try:
+        employees, projects, years = (int(part) for part in name.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Unknown scale: {name} (use {', '.join(SCALES)} or NxMxY)")
+    return employees, projects, years
+
+
+def generate(n_employees, n_projects, n_years, seed=0, start_year=BENCH_START_YEAR, state=utils.DEFAULT_STATE):
+    """
+    Deterministic synthetic data set. Returns a dict with employees, projects,
+    assignments ({employee: [projects]}), years and entries (frame with ENTRY_COLUMNS).
+    """
+    rng = np.random.default_rng(seed)
+    employees = [f"{BENCH_PREFIX}MA {i:04d}" for i in range(1, n_employees + 1)]
+    projects = [f"{BENCH_PREFIX}Projekt {i:03d}" for i in range(1, n_projects + 1)]
+    years = list(range(start_year, start_year + n_years))
+
+    days = pd.date_range(date(years[0], 1, 1), date(years[-1], 12, 31)).date
+    day_year = np.array([d.year for d in days])
+    weekend = np.array([d.weekday() >= 5 for d in days])
+    holiday_dates = {d for year in years for d, _ in utils.compute_german_holidays(state, year)}
+    holiday = np.array([d in holiday_dates for d in days]) & ~weekend
+    workday_idx = np.flatnonzero(~weekend & ~holiday)
+
+    assignments = {}
+    frames = []
+    for emp in employees:
+        k = min(n_projects, int(rng.integers(2, 6)))
+        assigned = sorted(rng.choice(projects, size=k, replace=False).tolist())
+        assignments[emp] = assigned
+
+        codes = np.full(len(days), None, dtype=object)
+        codes[weekend] = "/"
+        codes[holiday] = "F"
+        for year in years:
+            year_workdays = workday_idx[day_year[workday_idx] == year]
+            # Two to three vacation blocks of 5-10 days plus a few single sick days
+            for _ in range(int(rng.integers(2, 4))):
+                start = int(rng.integers(0, len(year_workdays) - 10))
+                codes[year_workdays[start:start + int(rng.integers(5, 11))]] = "U"
+            free = year_workdays[codes[year_workdays] == None]  # noqa: E711
+            codes[rng.choice(free, size=min(len(free), int(rng.integers(3, 12))), replace=False)] = "KK"
+
+        # Day codes on every assigned project row, as saved by the matrix editor
+        code_idx = np.flatnonzero(codes != None)  # noqa: E711
+        code_rows = pd.DataFrame({
+            'datum': np.repeat(days[code_idx], k),
+            'projekt': np.tile(assigned, len(code_idx)),
+            'stunden': 0.0,
+            'beschreibung': "",
+            'typ': np.repeat(codes[code_idx], k),
+        })
+
+        # Working days: 8 hours on one project or split over two
+        work_idx = np.flatnonzero(codes == None)  # noqa: E711
+        first = rng.integers(0, k, size=len(work_idx))
+        split = (rng.random(len(work_idx)) < 0.4) & (k > 1)
+        first_hours = np.where(split, rng.choice([2.0, 3.0, 4.0, 5.0, 6.0], size=len(work_idx)), 8.0)
+        second = (first + 1 + rng.integers(0, max(k - 1, 1), size=len(work_idx))) % k
+        assigned_arr = np.array(assigned, dtype=object)
+        work_rows = pd.DataFrame({
+            'datum': np.concatenate([days[work_idx], days[work_idx[split]]]),
+            'projekt': np.concatenate([assigned_arr[first], assigned_arr[second[split]]]),
+            'stunden': np.concatenate([first_hours, 8.0 - first_hours[split]]),
+            'beschreibung': rng.choice(_DESCRIPTIONS, size=len(work_idx) + int(split.sum())),
+            'typ': "Arbeit",
+        })
+        frames.append(pd.concat([code_rows, work_rows], ignore_index=True).assign(mitarbeiter=emp))
+
+    entries = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ENTRY_COLUMNS)
+    entries = entries.sort_values(['mitarbeiter', 'datum', 'projekt'], kind='stable').reset_index(drop=True)
+    return {
+        "employees": employees,
+        "projects": projects,
+        "assignments": assignments,
+        "years": years,
+        "entries": entries[ENTRY_COLUMNS],
+    }
+
+
+def cleanup():
+    """Removes all synthetic benchmark data."""
+    pattern = BENCH_PREFIX + "%"
+    with utils.engine.begin() as conn:
+        conn.execute(text("DELETE FROM entries WHERE mitarbeiter LIKE :p"), {"p": pattern})
+        conn.execute(text("DELETE FROM compliance_findings WHERE mitarbeiter LIKE :p"), {"p": pattern})
+        conn.execute(text("DELETE FROM compliance_scans WHERE mitarbeiter LIKE :p"), {"p": pattern})
+        conn.execute(text("DELETE FROM employees WHERE name LIKE :p"), {"p": pattern})
+        conn.execute(text("DELETE FROM projects WHERE name LIKE :p"), {"p": pattern})
+        conn.execute(text("DELETE FROM holidays WHERE region = :region"), {"region": BENCH_REGION})
+    utils.clear_cache(holidays=True, projects=None, months=None)
+
+
+def seed(data, state=utils.DEFAULT_STATE):
+    """Writes a generated data set to the database in bulk."""
+    with utils.engine.begin() as conn:
+        conn.execute(text("INSERT INTO employees (name, region) VALUES (:name, :region)"),
+                     [{"name": emp, "region": BENCH_REGION} for emp in data["employees"]])
+        conn.execute(text("INSERT INTO projects (name) VALUES (:name)"), [{"name": p} for p in data["projects"]])
+        conn.execute(text("INSERT INTO project_tree (ancestor, descendant, depth) VALUES (:name, :name, 0)"),
+                     [{"name": p} for p in data["projects"]])
+        conn.execute(text("INSERT INTO employee_projects (employee, project) VALUES (:employee, :project)"),
+                     [{"employee": emp, "project": p} for emp, projects in data["assignments"].items() for p in projects])
+        records = data["entries"].to_dict('records')
+        for start in range(0, len(records), INSERT_BATCH):
+            conn.execute(text("""
+                INSERT INTO entries (datum, mitarbeiter, projekt, stunden, beschreibung, typ)
+                VALUES (:datum, :mitarbeiter, :projekt, :stunden, :beschreibung, :typ)
+            """), records[start:start + INSERT_BATCH])
+        conn.execute(text("""
+            INSERT INTO leave_counters (mitarbeiter, jahr, monat, urlaub, krank)
+            SELECT mitarbeiter, EXTRACT(YEAR FROM datum), EXTRACT(MONTH FROM datum),
+                   COUNT(DISTINCT datum) FILTER (WHERE typ = 'U'),
+                   COUNT(DISTINCT datum) FILTER (WHERE typ = 'KK')
+            FROM entries
+            WHERE mitarbeiter LIKE :p
+            GROUP BY 1, 2, 3
+        """), {"p": BENCH_PREFIX + "%"})
+    utils.populate_holidays_bulk(data["years"], state, BENCH_REGION)
+    utils.clear_cache(holidays=True, projects=None, months=None)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def month_matrices(df, employee, year, projects):
+    """The editor matrices of one employee-year, filtered and built as in app.py."""
+    for month in range(1, 13):
+        mask = (df['mitarbeiter'] == employee) & \
+               (df['datum'].apply(lambda x: x.year) == year) & \
+               (df['datum'].apply(lambda x: x.month) == month)
+        work_calendar.month_matrix(year, month, projects, df[mask], BENCH_REGION)
+
+
+def yearly_pivots(year):
+    """monthly_hours plus the per-project pivots of the yearly overview, as in app.py."""
+    hours = utils.monthly_hours(year)
+    for _, df_proj in hours.groupby('projekt'):
+        pivot = df_proj.pivot_table(index='mitarbeiter', columns='monat', values='stunden', aggfunc='sum', fill_value=0)
+        pivot = pivot.reindex(columns=range(1, 13), fill_value=0).rename(columns=utils.MONTH_MAP)
+        pivot['Gesamt'] = pivot.sum(axis=1)
+        pivot.loc['Gesamt'] = pivot.sum(axis=0)
+
+
+def _run_operation(operation, data, sample, year, state):
+    """Runs one repetition of an operation and returns its duration in seconds."""
+    if operation == 'load_data':
+        utils.clear_cache()
+        return _timed(utils.load_data)
+    if operation == 'month_matrix':
+        df = utils.load_data()
+        return _timed(lambda: [month_matrices(df, emp, year, data["assignments"][emp]) for emp in sample]) / len(sample)
+    if operation == 'save_matrix':
+        df = utils.load_data()
+        total = 0.0
+        for i, emp in enumerate(sample):
+            month = i % 12 + 1
+            mask = (df['mitarbeiter'] == emp) & (df['datum'].apply(lambda x: (x.year, x.month)) == (year, month))
+            matrix = work_calendar.month_matrix(year, month, data["assignments"][emp], df[mask], BENCH_REGION)
+            total += _timed(lambda: utils.save_matrix_entries(emp, year, month, matrix))
+        return total / len(sample)
+    if operation == 'yearly_pivot':
+        utils.clear_cache()
+        return _timed(lambda: yearly_pivots(year))
+    if operation == 'pdf_report':
+        utils.clear_cache()
+        return _timed(lambda: utils.generate_pdf_report(year, io.BytesIO()))
+    if operation == 'holidays':
+        with utils.engine.begin() as conn:
+            conn.execute(text("DELETE FROM holidays WHERE region = :region"), {"region": BENCH_REGION})
+        utils.compute_german_holidays.cache_clear()
+        return _timed(lambda: utils.populate_holidays_bulk(data["years"], state, BENCH_REGION))
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+def _stats(runs):
+    return {
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "runs": runs,
+    }
+
+
+def run_scale(n_employees, n_projects, n_years, repeat=3, seed_value=0, operations=OPERATIONS,
+              state=utils.DEFAULT_STATE, keep=False):
+    """Seeds one scale, times each operation `repeat` times and returns the result dict."""
+    cleanup()
+    data = generate(n_employees, n_projects, n_years, seed=seed_value, state=state)
+    seed_seconds = _timed(lambda: seed(data, state))
+    sample = data["employees"][:SAMPLE_EMPLOYEES]
+    year = data["years"][-1]
+    try:
+        timings = {}
+        for operation in operations:
+            runs = [_run_operation(operation, data, sample, year, state) for _ in range(repeat)]
+            timings[operation] = _stats(runs)
+    finally:
+        if not keep:
+            cleanup()
+    return {
+        "employees": n_employees,
+        "projects": n_projects,
+        "years": n_years,
+        "entries": len(data["entries"]),
+        "seed_seconds": seed_seconds,
+        "timings": timings,
+    }
+
+
+def run(scales=DEFAULT_SCALES, repeat=3, seed_value=0, operations=OPERATIONS, keep=False):
+    """Runs all scales and returns the JSON-serializable result document."""
+    with utils.engine.connect() as conn:
+        existing = conn.execute(
+            text("SELECT COUNT(*) FROM entries WHERE mitarbeiter NOT LIKE :p OR mitarbeiter IS NULL"),
+            {"p": BENCH_PREFIX + "%"}
+        ).scalar()
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed_value,
+            "existing_entries": existing,
+        },
+        "scales": {},
+    }
+    for name in scales:
+        employees, projects, years = parse_scale(name)
+        results["scales"][name] = run_scale(employees, projects, years, repeat, seed_value, operations, keep=keep)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the median timings with a baseline document. Returns a frame with one row per
+    (scale, operation) present in both: baseline, current, ratio and regression flag.
+    """
+    rows = []
+    for scale, current in results["scales"].items():
+        base = baseline.get("scales", {}).get(scale)
+        if not base:
+            continue
+        for operation, stats in current["timings"].items():
+            if operation not in base["timings"]:
+                continue
+            before = base["timings"][operation]["median"]
+            after = stats["median"]
+            ratio = after / before if before > 0 else float("inf")
+            rows.append({
+                "scale": scale, "operation": operation, "baseline": before, "current": after,
+                "ratio": ratio, "regression": ratio > threshold,
+            })
+    return pd.DataFrame(rows, columns=['scale', 'operation', 'baseline', 'current', 'ratio', 'regression'])
+
+
+def format_results(results):
+    """Median timings as a table (rows: operations, columns: scales)."""
+    table = pd.DataFrame({
+        f"{scale} ({res['entries']} Zeilen)": {op: stats["median"] for op, stats in res["timings"].items()}
+        for scale, res in results["scales"].items()
+    })
+    return table.to_string(float_format=lambda s: f"{s * 1000:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data layer and UI builders on synthetic data.")
+    parser.add_argument("--scales", default=",".join(DEFAULT_SCALES),
+                        help=f"Comma-separated presets ({', '.join(SCALES)}) or NxMxY (employees x projects x years)")
+    parser.add_argument("--operations", default=",".join(OPERATIONS), help="Comma-separated subset of: " + ", ".join(OPERATIONS))
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per operation")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the data generator")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare with a previous JSON result")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Slowdown ratio that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with 1 if any operation regressed")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data of the last scale")
+    args = parser.parse_args(argv)
+
+    operations = [op.strip() for op in args.operations.split(",") if op.strip()]
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"Unknown operations: {', '.join(sorted(unknown))}")
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    for scale in scales:
+        try:
+            parse_scale(scale)
+        except ValueError as e:
+            parser.error(str(e))
+
+    results = run(scales, args.repeat, args.seed, operations, args.keep)
+    print(format_results(results), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline, args.threshold)
+        if comparison.empty:
+            print("Keine gemeinsamen Messungen mit der Baseline.", file=sys.stderr)
+        else:
+            print(comparison.to_string(index=False, float_format=lambda v: f"{v:.3f}"), file=sys.stderr)
+            if args.fail_on_regression and comparison['regression'].any():
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Costing engine: applies effective-dated hourly rates to the monthly hour aggregates
+(utils.monthly_hours) and returns billable amounts per employee, project and month.
+
+Rates are matched from most to least specific: employee + project, project, employee,
+company default. Within a level, a rate with an explicit end (gueltig_bis) overrides
+open-ended rates for its range; otherwise the latest rate effective on the first of the
+month applies (pd.merge_asof). Rates are month-granular because the engine works on
+monthly aggregates rather than raw entries.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+COST_COLUMNS = ['jahr', 'monat', 'mitarbeiter', 'projekt', 'stunden', 'satz', 'betrag']
+
+# (key columns, rate filter) from most to least specific
+_LEVELS = [
+    (['mitarbeiter', 'projekt'], lambda r: r['mitarbeiter'].notna() & r['projekt'].notna()),
+    (['projekt'], lambda r: r['mitarbeiter'].isna() & r['projekt'].notna()),
+    (['mitarbeiter'], lambda r: r['mitarbeiter'].notna() & r['projekt'].isna()),
+    ([], lambda r: r['mitarbeiter'].isna() & r['projekt'].isna()),
+]
+
+
+def _open_ended(hours, rates, keys):
+    """Latest open-ended rate effective on each row's month (merge_asof per key group)."""
+    rates = rates.sort_values('gueltig_ab')
+    merged = pd.merge_asof(
+        hours[['row', 'stichtag'] + keys].sort_values('stichtag'),
+        rates[keys + ['gueltig_ab', 'satz']],
+        left_on='stichtag', right_on='gueltig_ab',
+        by=keys or None, direction='backward'
+    )
+    return merged.set_index('row')['satz']
+
+
+def _bounded(hours, rates, keys):
+    """Rates with an explicit end date: latest start whose [gueltig_ab, gueltig_bis] contains the month."""
+    if keys:
+        merged = hours[['row', 'stichtag'] + keys].merge(rates[keys + ['gueltig_ab', 'gueltig_bis', 'satz']], on=keys)
+    else:
+        merged = hours[['row', 'stichtag']].merge(rates[['gueltig_ab', 'gueltig_bis', 'satz']], how='cross')
+    merged = merged[(merged['gueltig_ab'] <= merged['stichtag']) & (merged['stichtag'] <= merged['gueltig_bis'])]
+    merged = merged.sort_values('gueltig_ab').drop_duplicates('row', keep='last')
+    return merged.set_index('row')['satz']
+
+
+def apply_rates(hours, rates):
+    """
+    Adds 'satz' and 'betrag' to an hours frame (mitarbeiter, projekt, jahr, monat, stunden).
+    rates: frame like utils.get_rates(). Rows without an applicable rate get NaN.
+    """
+    hours = hours.reset_index(drop=True)
+    keyed = hours.assign(
+        row=np.arange(len(hours)),
+        stichtag=pd.to_datetime(pd.DataFrame({'year': hours['jahr'], 'month': hours['monat'], 'day': 1})).astype('datetime64[ns]'),
+        mitarbeiter=hours['mitarbeiter'].fillna(""),
+        projekt=hours['projekt'].fillna(""),
+    )
+    rates = rates.assign(
+        gueltig_ab=pd.to_datetime(rates['gueltig_ab']).astype('datetime64[ns]'),
+        gueltig_bis=pd.to_datetime(rates['gueltig_bis']).astype('datetime64[ns]'),
+    )
+
+    satz = pd.Series(np.nan, index=keyed['row'])
+    for keys, selector in _LEVELS:
+        level = rates[selector(rates)]
+        if level.empty:
+            continue
+        bounded = level[level['gueltig_bis'].notna()]
+        open_ended = level[level['gueltig_bis'].isna()]
+        if not bounded.empty:
+            satz = satz.combine_first(_bounded(keyed, bounded, keys))
+        if not open_ended.empty:
+            satz = satz.combine_first(_open_ended(keyed, open_ended, keys))
+
+    hours = hours.assign(satz=satz.sort_index().to_numpy())
+    hours['betrag'] = hours['stunden'] * hours['satz']
+    return hours
+
+
+@lru_cache(maxsize=32)
+def _costs(year, data_version):
+    hours = utils.monthly_hours(year)
+    hours = hours[hours['stunden'] > 0].assign(jahr=year)
+    return apply_rates(hours, utils.get_rates())[COST_COLUMNS]
+
+
+def get_costs(year, employee=None, project=None):
+    """Hours, rate and amount per employee, project and month of a year (COST_COLUMNS)."""
+    try:
+        df = _costs(int(year), utils.get_data_version())
+    except Exception as e:
+        print(f"Error computing costs: {e}")
+        return pd.DataFrame(columns=COST_COLUMNS)
+    if employee:
+        df = df[df['mitarbeiter'] == employee]
+    if project:
+        df = df[df['projekt'] == project]
+    return df.copy()
+
+
+def cost_summary(year, by='projekt'):
+    """Amounts of a year pivoted as `by` (projekt or mitarbeiter) x month, with a Gesamt column."""
+    df = get_costs(year)
+    pivot = df.pivot_table(index=by, columns='monat', values='betrag', aggfunc='sum', fill_value=0.0)
+    pivot = pivot.reindex(columns=range(1, 13), fill_value=0.0).rename(columns=utils.MONTH_MAP)
+    pivot['Gesamt'] = pivot.sum(axis=1)
+    return pivot
@@ -0,0 +1,141 @@
+"""
+Project budgets: consumption overview for all projects, burn-down per project and a
+run-rate forecast of when the budget will be used up.
+
+The overview is a single aggregated query over all projects, cached per data version.
+Burn-downs are cached per project and only rebuilt when entries or budgets of that
+project change (see utils.get_project_version).
+"""
+import threading
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import utils
+
+# Months of actuals used for the run-rate forecast
+FORECAST_MONTHS = 3
+
+OVERVIEW_COLUMNS = ['projekt', 'budget', 'ist_gesamt', 'rest', 'verbrauch', 'plan_jahr', 'ist_jahr', 'verbrauch_jahr']
+BURNDOWN_COLUMNS = ['monat', 'plan', 'ist', 'plan_kumuliert', 'ist_kumuliert', 'rest']
+
+
+@lru_cache(maxsize=32)
+def _overview(year, data_version):
+    query = """
+        SELECT p.name AS projekt,
+               p.budget_hours AS budget,
+               COALESCE(a.ist_gesamt, 0) AS ist_gesamt,
+               COALESCE(b.plan_jahr, 0) AS plan_jahr,
+               COALESCE(a.ist_jahr, 0) AS ist_jahr
+        FROM projects p
+        LEFT JOIN (
+            SELECT projekt,
+                   SUM(stunden) AS ist_gesamt,
+                   COALESCE(SUM(stunden) FILTER (WHERE datum >= :start AND datum < :end), 0) AS ist_jahr
+            FROM entries
+            WHERE typ = 'Arbeit'
+            GROUP BY projekt
+        ) a ON a.projekt = p.name
+        LEFT JOIN (
+            SELECT projekt, SUM(stunden) AS plan_jahr
+            FROM project_budgets
+            WHERE jahr = :year
+            GROUP BY projekt
+        ) b ON b.projekt = p.name
+        ORDER BY p.name
+    """
+    df = pd.read_sql(text(query), utils.read_engine(), params={
+        "year": year, "start": date(year, 1, 1), "end": date(year + 1, 1, 1)
+    })
+    df['budget'] = df['budget'].astype(float)
+    df['rest'] = df['budget'] - df['ist_gesamt']
+    df['verbrauch'] = df['ist_gesamt'] / df['budget'].where(df['budget'] > 0) * 100
+    df['verbrauch_jahr'] = df['ist_jahr'] / df['plan_jahr'].where(df['plan_jahr'] > 0) * 100
+    return df[OVERVIEW_COLUMNS]
+
+
+def get_budget_overview(year):
+    """
+    Budget consumption of all projects: total budget vs. all-time actuals and the year's
+    planned vs. actual hours. Percentages are NaN where no budget is set.
+    """
+    try:
+        return _overview(int(year), utils.get_data_version()).copy()
+    except Exception as e:
+        print(f"Error loading budget overview: {e}")
+        return pd.DataFrame(columns=OVERVIEW_COLUMNS)
+
+
+# project -> (project version, total budget, burn-down frame)
+_burndowns = {}
+_lock = threading.Lock()
+
+
+def _load_burndown(project):
+    with utils.read_engine().connect() as conn:
+        budget = conn.execute(text("SELECT budget_hours FROM projects WHERE name = :name"), {"name": project}).scalar()
+        actual = pd.read_sql(text("""
+            SELECT CAST(date_trunc('month', datum) AS DATE) AS monat, SUM(stunden) AS ist
+            FROM entries
+            WHERE projekt = :name AND typ = 'Arbeit'
+            GROUP BY 1
+        """), conn, params={"name": project})
+        plan = pd.read_sql(text("""
+            SELECT make_date(jahr, monat, 1) AS monat, stunden AS plan
+            FROM project_budgets
+            WHERE projekt = :name
+        """), conn, params={"name": project})
+    df = plan.merge(actual, on='monat', how='outer').fillna(0.0).sort_values('monat').reset_index(drop=True)
+    df['plan_kumuliert'] = df['plan'].cumsum()
+    df['ist_kumuliert'] = df['ist'].cumsum()
+    df['rest'] = (budget if budget is not None else np.nan) - df['ist_kumuliert']
+    return budget, df[BURNDOWN_COLUMNS]
+
+
+def get_burndown(project):
+    """
+    Returns (budget, frame) for one project: planned and actual hours per month with
+    cumulative sums and the remaining budget after each month. budget is None if unset.
+    """
+    version = utils.get_project_version(project)
+    with _lock:
+        cached = _burndowns.get(project)
+    if cached is None or cached[0] != version:
+        try:
+            budget, df = _load_burndown(project)
+        except Exception as e:
+            print(f"Error loading burn-down: {e}")
+            return None, pd.DataFrame(columns=BURNDOWN_COLUMNS)
+        cached = (version, budget, df)
+        with _lock:
+            _burndowns[project] = cached
+    return cached[1], cached[2].copy()
+
+
+def get_forecast(project, today=None):
+    """
+    Run-rate forecast from the average actual hours of the last FORECAST_MONTHS full months.
+    Returns a dict with budget, ist, rest, run_rate (hours/month) and erschoepft_am
+    (first day of the month in which the budget runs out, None if no budget or no burn).
+    """
+    today = today or date.today()
+    budget, df = get_burndown(project)
+    current_month = date(today.year, today.month, 1)
+    months = pd.date_range(end=pd.Timestamp(current_month) - pd.DateOffset(months=1), periods=FORECAST_MONTHS, freq='MS').date
+    actual = df.set_index('monat')['ist']
+    run_rate = float(actual.reindex(months, fill_value=0.0).mean())
+    ist = float(df['ist'].sum())
+    result = {"budget": budget, "ist": ist, "rest": None, "run_rate": run_rate, "erschoepft_am": None}
+    if budget is None:
+        return result
+    result["rest"] = budget - ist
+    if result["rest"] <= 0:
+        result["erschoepft_am"] = current_month
+    elif run_rate > 0:
+        months_left = int(np.ceil(result["rest"] / run_rate))
+        result["erschoepft_am"] = (pd.Timestamp(current_month) + pd.DateOffset(months=months_left - 1)).date()
+    return result
@@ -0,0 +1,247 @@
+"""
+Labor-law and data-quality checks over all entries:
+
+- more than 10 hours of work per day (ArbZG §3)
+- breaks: entries store net hours only, so days over 9 hours are flagged for a
+  45-minute break check (ArbZG §4)
+- work on holidays (of the employee's calendar region) or company vacation days
+- duplicate entries per (mitarbeiter, datum, projekt)
+- hours on projects the employee is not assigned to
+
+Checks run as vectorized group-bys on an entries frame. A scan only reloads the
+employee-months whose entries changed since the last scan (md5 fingerprint per
+employee-month, computed in SQL); a change of holidays, vacation days, regions or
+project assignments triggers a full rescan. Saving a month rescans just that month.
+
+CLI usage:
+    python compliance.py            # incremental scan
+    python compliance.py --full     # rescan everything
+"""
+import argparse
+import sys
+from datetime import date
+from functools import lru_cache
+
+import pandas as pd
+from sqlalchemy import text
+
+import utils
+
+MAX_DAILY_HOURS = 10.0
+# Net hours above which a 45-minute break is required
+BREAK_HOURS = 9.0
+
+RULES = {
+    "max_stunden": "Mehr als 10 Std. am Tag",
+    "pause": "Über 9 Std.: 45 Min. Pause nachweisen",
+    "feiertag": "Arbeit an Feiertag",
+    "betriebsurlaub": "Arbeit im Betriebsurlaub",
+    "duplikat": "Doppelter Eintrag (Datum, Projekt)",
+    "nicht_zugewiesen": "Projekt nicht zugewiesen",
+}
+
+FINDING_COLUMNS = ['mitarbeiter', 'datum', 'projekt', 'regel', 'details']
+
+# Row in compliance_scans that holds the fingerprint of holidays, regions and assignments
+_CONTEXT_KEY = {"mitarbeiter": "", "jahr": 0, "monat": 0}
+
+_FINGERPRINT_SQL = """
+    SELECT mitarbeiter,
+           CAST(EXTRACT(YEAR FROM datum) AS INTEGER) AS jahr,
+           CAST(EXTRACT(MONTH FROM datum) AS INTEGER) AS monat,
+           md5(string_agg(concat_ws('|', id, datum, projekt, stunden, typ), ',' ORDER BY id)) AS fingerprint
+    FROM entries
+    WHERE mitarbeiter IS NOT NULL AND datum IS NOT NULL {where}
+    GROUP BY 1, 2, 3
+"""
+
+_CONTEXT_SQL = """
+    SELECT md5(concat_ws('#',
+        (SELECT string_agg(region || '|' || datum, ',' ORDER BY region, datum) FROM holidays),
+        (SELECT string_agg(CAST(datum AS TEXT), ',' ORDER BY datum) FROM vacation_days),
+        (SELECT string_agg(employee || '|' || project, ',' ORDER BY employee, project) FROM employee_projects),
+        (SELECT string_agg(name || '|' || COALESCE(region, ''), ',' ORDER BY name) FROM employees)
+    ))
+"""
+
+
+def find_issues(entries, holidays, vacation_days, assignments, regions):
+    """
+    Runs all checks on an entries frame and returns the findings (FINDING_COLUMNS).
+    holidays: frame with columns region, datum; vacation_days: iterable of dates;
+    assignments: {employee: [projects]}; regions: {employee: region}.
+    """
+    if entries.empty:
+        return pd.DataFrame(columns=FINDING_COLUMNS)
+    findings = []
+    work = entries[(entries['typ'] == 'Arbeit') & (entries['stunden'] > 0)]
+
+    daily = work.groupby(['mitarbeiter', 'datum'], as_index=False)['stunden'].sum()
+    over = daily[daily['stunden'] > MAX_DAILY_HOURS]
+    findings.append(over.assign(projekt=None, regel="max_stunden", details=over['stunden'].map(lambda h: f"{h:g} Std.")))
+    long_days = daily[(daily['stunden'] > BREAK_HOURS) & (daily['stunden'] <= MAX_DAILY_HOURS)]
+    findings.append(long_days.assign(projekt=None, regel="pause", details=long_days['stunden'].map(lambda h: f"{h:g} Std.")))
+
+    work = work.assign(region=work['mitarbeiter'].map(regions).fillna(utils.DEFAULT_REGION))
+    on_holiday = work.merge(holidays[['region', 'datum']], on=['region', 'datum'])
+    findings.append(on_holiday.assign(regel="feiertag", details=on_holiday['stunden'].map(lambda h: f"{h:g} Std.")))
+    on_vacation = work[work['datum'].isin(set(vacation_days))]
+    findings.append(on_vacation.assign(regel="betriebsurlaub", details=on_vacation['stunden'].map(lambda h: f"{h:g} Std.")))
+
+    keyed = entries[entries['projekt'].notna()]
+    dupes = keyed.groupby(['mitarbeiter', 'datum', 'projekt'], as_index=False).size()
+    dupes = dupes[dupes['size'] > 1]
+    findings.append(dupes.assign(regel="duplikat", details=dupes['size'].map(lambda n: f"{n} Einträge")))
+
+    assigned = pd.DataFrame(
+        [(emp, proj) for emp, projects in assignments.items() for proj in projects],
+        columns=['mitarbeiter', 'projekt']
+    )
+    unassigned = work[work['projekt'].notna()].merge(assigned, on=['mitarbeiter', 'projekt'], how='left', indicator=True)
+    unassigned = unassigned[unassigned['_merge'] == 'left_only']
+    unassigned = unassigned.groupby(['mitarbeiter', 'datum', 'projekt'], as_index=False)['stunden'].sum()
+    findings.append(unassigned.assign(regel="nicht_zugewiesen", details=unassigned['stunden'].map(lambda h: f"{h:g} Std.")))
+
+    result = pd.concat([f[FINDING_COLUMNS] for f in findings], ignore_index=True)
+    return result.sort_values(['mitarbeiter', 'datum', 'regel'], kind='stable').reset_index(drop=True)
+
+
+def _load_entries(conn, months):
+    """Loads the entries of the given (mitarbeiter, jahr, monat) groups in one query."""
+    if not months:
+        return pd.DataFrame(columns=['mitarbeiter', 'datum', 'projekt', 'stunden', 'typ'])
+    emps, years, month_nums = (list(col) for col in zip(*months))
+    query = """
+        SELECT e.mitarbeiter, e.datum, e.projekt, e.stunden, e.typ
+        FROM entries e
+        JOIN unnest(CAST(:emps AS TEXT[]), CAST(:years AS INTEGER[]), CAST(:months AS INTEGER[])) AS c(mitarbeiter, jahr, monat)
+          ON e.mitarbeiter = c.mitarbeiter
+         AND e.datum >= make_date(c.jahr, c.monat, 1)
+         AND e.datum < make_date(c.jahr, c.monat, 1) + INTERVAL '1 month'
+    """
+    return pd.read_sql(text(query), conn, params={"emps": emps, "years": years, "months": month_nums})
+
+
+def _context():
+    holidays = utils.load_region_holidays()
+    holidays_df = pd.DataFrame(
+        [(region, d) for region, dates in holidays.items() for d in dates],
+        columns=['region', 'datum']
+    )
+    return holidays_df, utils.load_vacation_days(), utils.get_all_assigned_projects(), utils.get_employee_regions()
+
+
+def _store(conn, months, findings, fingerprints):
+    """Replaces the findings and fingerprints of the given months."""
+    if months:
+        emps, years, month_nums = (list(col) for col in zip(*months))
+        params = {"emps": emps, "years": years, "months": month_nums}
+        for table in ("compliance_findings", "compliance_scans"):
+            conn.execute(text(f"""
+                DELETE FROM {table} t
+                USING unnest(CAST(:emps AS TEXT[]), CAST(:years AS INTEGER[]), CAST(:months AS INTEGER[])) AS c(mitarbeiter, jahr, monat)
+                WHERE t.mitarbeiter = c.mitarbeiter AND t.jahr = c.jahr AND t.monat = c.monat
+            """), params)
+    if not findings.empty:
+        rows = findings.assign(
+            jahr=findings['datum'].map(lambda d: d.year),
+            monat=findings['datum'].map(lambda d: d.month),
+        ).astype(object)
+        rows = rows.where(rows.notna(), None).to_dict('records')
+        conn.execute(text("""
+            INSERT INTO compliance_findings (mitarbeiter, jahr, monat, datum, projekt, regel, details)
+            VALUES (:mitarbeiter, :jahr, :monat, :datum, :projekt, :regel, :details)
+        """), rows)
+    if fingerprints:
+        conn.execute(text("""
+            INSERT INTO compliance_scans (mitarbeiter, jahr, monat, fingerprint)
+            VALUES (:mitarbeiter, :jahr, :monat, :fingerprint)
+            ON CONFLICT (mitarbeiter, jahr, monat) DO UPDATE SET fingerprint = EXCLUDED.fingerprint
+        """), [{"mitarbeiter": m[0], "jahr": m[1], "monat": m[2], "fingerprint": fp} for m, fp in fingerprints.items()])
+
+
+def scan(full=False):
+    """
+    Rescans all employee-months whose entries changed since the last scan (or everything
+    if full=True or holidays / assignments changed). Returns (months scanned, findings found).
+    """
+    try:
+        with utils.engine.begin() as conn:
+            current = {
+                (r[0], r[1], r[2]): r[3]
+                for r in conn.execute(text(_FINGERPRINT_SQL.format(where=""))).fetchall()
+            }
+            previous = {
+                (r[0], r[1], r[2]): r[3]
+                for r in conn.execute(text("SELECT mitarbeiter, jahr, monat, fingerprint FROM compliance_scans")).fetchall()
+            }
+            context = conn.execute(text(_CONTEXT_SQL)).scalar()
+            context_key = tuple(_CONTEXT_KEY.values())
+            if full or previous.pop(context_key, None) != context:
+                conn.execute(text("DELETE FROM compliance_findings"))
+                conn.execute(text("DELETE FROM compliance_scans"))
+                previous = {}
+            changed = [m for m, fp in current.items() if previous.get(m) != fp]
+            removed = [m for m in previous if m not in current]
+
+            findings = find_issues(_load_entries(conn, changed), *_context())
+            fingerprints = {m: current[m] for m in changed}
+            fingerprints[context_key] = context
+            _store(conn, changed + removed, findings, fingerprints)
+        get_findings.cache_clear()
+        return len(changed), len(findings)
+    except Exception as e:
+        print(f"Error scanning entries: {e}")
+        return 0, 0
+
+
+def scan_month(mitarbeiter, year, month):
+    """Rescans a single employee-month (e.g. right after it was saved)."""
+    key = (mitarbeiter, int(year), int(month))
+    start = date(key[1], key[2], 1)
+    end = date(key[1] + 1, 1, 1) if key[2] == 12 else date(key[1], key[2] + 1, 1)
+    try:
+        with utils.engine.begin() as conn:
+            row = conn.execute(
+                text(_FINGERPRINT_SQL.format(where="AND mitarbeiter = :mitarbeiter AND datum >= :start AND datum < :end")),
+                {"mitarbeiter": mitarbeiter, "start": start, "end": end}
+            ).fetchone()
+            findings = find_issues(_load_entries(conn, [key]), *_context())
+            _store(conn, [key], findings, {key: row[3]} if row else {})
+        get_findings.cache_clear()
+        return len(findings)
+    except Exception as e:
+        print(f"Error scanning month: {e}")
+        return 0
+
+
+utils.register_month_save_listener(scan_month)
+
+
+@lru_cache(maxsize=32)
+def get_findings(year=None):
+    """Returns the stored findings (optionally of one year) with a 'regel_text' label column."""
+    try:
+        where = "WHERE jahr = :year" if year else ""
+        df = pd.read_sql(
+            text(f"SELECT mitarbeiter, datum, projekt, regel, details FROM compliance_findings {where} ORDER BY datum, mitarbeiter, regel"),
+            utils.read_engine(), params={"year": int(year) if year else None}
+        )
+        df['regel_text'] = df['regel'].map(RULES)
+        return df.copy()
+    except Exception as e:
+        print(f"Error loading findings: {e}")
+        return pd.DataFrame(columns=FINDING_COLUMNS + ['regel_text'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan all entries for labor-law and data-quality issues.")
+    parser.add_argument("--full", action="store_true", help="Rescan all months, not only changed ones")
+    args = parser.parse_args(argv)
+    scanned, found = scan(full=args.full)
+    print(f"{scanned} Mitarbeiter-Monate geprüft, {found} Auffälligkeiten gefunden.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+"""
+Connection management for utils.engine: pool sizing, liveness checks, pooler modes and
+pool metrics.
+
+Configuration (environment):
+    DB_POOL_SIZE           persistent connections (default 5; 0 = no client-side pool)
+    DB_MAX_OVERFLOW        extra connections under load (default 10)
+    DB_POOL_TIMEOUT        seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE        replace connections older than this many seconds (default 1800, -1 = never)
+    DB_PRE_PING            always | idle | off (default idle: ping only connections that were
+                           unused for DB_PING_IDLE_SECONDS, default 60)
+    DB_POOL_MODE           session | transaction (default: transaction for PgBouncer /
+                           Supabase pooler URLs on port 6543, otherwise session)
+
+    REPLICA_MAX_LAG_SECONDS   reads fall back to the primary while the replica lags more (default 30)
+    REPLICA_CHECK_SECONDS     interval of the replica lag check (default 5)
+
+Transaction mode (PgBouncer / Supabase transaction pooler): every transaction may run on a
+different server connection, so drivers are configured without server-side prepared
+statements (psycopg 3 prepare_threshold, asyncpg statement caches; psycopg2 never prepares)
+and no session state is set on connect.
+
+Read replica (ReplicaRouter): reads go to a streaming replica while it is reachable, within
+REPLICA_MAX_LAG_SECONDS and has replayed the WAL of every write committed through the
+primary engine (read-your-writes); otherwise they go to the primary.
+"""
+import os
+import re
+import threading
+import time
+import weakref
+from collections import deque
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+PRE_PING = os.getenv("DB_PRE_PING", "idle").lower()
+PING_IDLE_SECONDS = float(os.getenv("DB_PING_IDLE_SECONDS", "60"))
+POOL_MODE = os.getenv("DB_POOL_MODE", "").lower()
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+
+CONNECT_TIMEOUT = 10
+
+PRE_PING_STRATEGIES = ("always", "idle", "off")
+POOL_MODES = ("session", "transaction")
+
+TRANSACTION_POOLER_PORT = 6543
+
+# Recent checkout wait times kept for percentiles
+WAIT_SAMPLES = 10000
+
+# While the replica has not yet replayed a recent write, it is polled at most this often
+REPLICA_CATCHUP_POLL_SECONDS = 0.2
+
+_READ_ONLY_PREFIXES = ("SELECT", "SHOW", "EXPLAIN", "SET", "BEGIN", "COMMIT", "ROLLBACK")
+_WRITE_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+# engine -> {"mode", "pre_ping", "metrics"}
+_engines = weakref.WeakKeyDictionary()
+# Called with every engine created here (e.g. to register instrumentation listeners)
+_engine_hooks = []
+
+
+class _Metrics:
+    """Checkout counts, wait times and pings of one engine's pool."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.pings = 0
+        self.ping_failures = 0
+
+    def wait(self, seconds):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.waits.append(seconds)
+
+
+class _TimedPool:
+    """Records how long each checkout waited for a connection in the pool's metrics."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    """QueuePool with checkout wait times."""
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    """asyncio pool (for create_async_pooled_engine) with checkout wait times."""
+
+
+def detect_mode(url):
+    """transaction for PgBouncer / Supabase transaction-pooler URLs, otherwise session."""
+    if POOL_MODE in POOL_MODES:
+        return POOL_MODE
+    url = make_url(url)
+    if url.port == TRANSACTION_POOLER_PORT or url.query.get("pgbouncer") == "true":
+        return "transaction"
+    return "session"
+
+
+def _connect_args(url, mode, connect_timeout=CONNECT_TIMEOUT):
+    url = make_url(url)
+    driver = url.get_driver_name()
+    args = {}
+    if driver in ("psycopg2", "psycopg"):
+        args["connect_timeout"] = connect_timeout
+    elif driver == "asyncpg":
+        args["timeout"] = connect_timeout
+    if mode == "transaction":
+        if driver == "psycopg":
+            args["prepare_threshold"] = None
+        elif driver == "asyncpg":
+            args["statement_cache_size"] = 0
+            args["prepared_statement_cache_size"] = 0
+    return args
+
+
+def _install_idle_ping(engine, metrics, idle_seconds):
+    """Pings a connection on checkout only if it sat unused in the pool for idle_seconds."""
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        with metrics.lock:
+            metrics.pings += 1
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            with metrics.lock:
+                metrics.ping_failures += 1
+            # Makes the pool discard this connection and retry with a fresh one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def add_engine_hook(hook):
+    """Calls hook(engine) for every engine created so far and every future one (sync engines)."""
+    _engine_hooks.append(hook)
+    for engine in list(_engines):
+        hook(engine)
+
+
+def to_async_url(url):
+    """The URL with the asyncpg driver; libpq-only query options are translated or dropped."""
+    url = make_url(url)
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    for option in ("connect_timeout", "application_name", "options"):
+        query.pop(option, None)
+    return url.set(drivername="postgresql+asyncpg", query=query)
+
+
+def _build(create, timed_pool, url, pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping, mode,
+           connect_timeout=None):
+    pool_size = POOL_SIZE if pool_size is None else pool_size
+    max_overflow = MAX_OVERFLOW if max_overflow is None else max_overflow
+    pool_timeout = POOL_TIMEOUT if pool_timeout is None else pool_timeout
+    pool_recycle = POOL_RECYCLE if pool_recycle is None else pool_recycle
+    pre_ping = (pre_ping or PRE_PING).lower()
+    if pre_ping not in PRE_PING_STRATEGIES:
+        raise ValueError(f"Unknown pre-ping strategy: {pre_ping}")
+    mode = mode or detect_mode(url)
+    # pgbouncer=true only selects the mode here; the driver would reject it as a connection option
+    url = make_url(url).difference_update_query(["pgbouncer"])
+
+    metrics = _Metrics()
+    kwargs = {
+        "connect_args": _connect_args(url, mode, CONNECT_TIMEOUT if connect_timeout is None else connect_timeout),
+        "pool_pre_ping": pre_ping == "always",
+    }
+    if pool_size > 0:
+        pool_class = type(timed_pool.__name__, (timed_pool,), {"metrics": metrics})
+        kwargs.update(poolclass=pool_class, pool_size=pool_size, max_overflow=max_overflow,
+                      pool_timeout=pool_timeout, pool_recycle=pool_recycle)
+    else:
+        kwargs["poolclass"] = NullPool
+    engine = create(url, **kwargs)
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if pre_ping == "idle" and pool_size > 0:
+        _install_idle_ping(sync_engine, metrics, PING_IDLE_SECONDS)
+    _engines[sync_engine] = {"mode": mode, "pre_ping": pre_ping, "metrics": metrics}
+    for hook in _engine_hooks:
+        hook(sync_engine)
+    return engine
+
+
+def create_pooled_engine(url, pool_size=None, max_overflow=None, pool_timeout=None,
+                         pool_recycle=None, pre_ping=None, mode=None, connect_timeout=None):
+    """Creates the engine with the configured pool; arguments override the environment."""
+    return _build(create_engine, TimedQueuePool, url, pool_size, max_overflow,
+                  pool_timeout, pool_recycle, pre_ping, mode, connect_timeout)
+
+
+def create_async_pooled_engine(url, pool_size=None, max_overflow=None, pool_timeout=None,
+                               pool_recycle=None, pre_ping=None, mode=None):
+    """
+    Creates an asyncpg AsyncEngine with the same pool settings (for async_utils). The mode is
+    detected from the original URL, so transaction-pooler URLs disable asyncpg's statement caches.
+    """
+    mode = mode or detect_mode(url)
+    return _build(create_async_engine, TimedAsyncQueuePool, to_async_url(url),
+                  pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping, mode)
+
+
+def pool_metrics(engine):
+    """Current pool state and checkout statistics of an engine created by create_pooled_engine."""
+    engine = getattr(engine, "sync_engine", engine)
+    pool = engine.pool
+    info = _engines[engine]
+    metrics = info["metrics"]
+    with metrics.lock:
+        waits = sorted(metrics.waits)
+        result = {
+            "modus": info["mode"],
+            "pre_ping": info["pre_ping"],
+            "groesse": pool.size() if isinstance(pool, QueuePool) else 0,
+            "ausgeliehen": pool.checkedout() if isinstance(pool, QueuePool) else None,
+            "frei": pool.checkedin() if isinstance(pool, QueuePool) else None,
+            "overflow": max(pool.overflow(), 0) if isinstance(pool, QueuePool) else None,
+            "checkouts": metrics.checkouts,
+            "wartezeit_summe_s": metrics.wait_seconds,
+            "wartezeit_max_s": metrics.wait_max,
+            "wartezeit_p95_s": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "pings": metrics.pings,
+            "ping_fehler": metrics.ping_failures,
+        }
+    return result
+
+
+def reset_metrics(engine):
+    """Clears the checkout statistics of an engine."""
+    metrics = _engines[getattr(engine, "sync_engine", engine)]["metrics"]
+    with metrics.lock:
+        metrics.reset()
+
+
+def _lsn(value):
+    """pg_lsn text ('16/B374D848') as an integer, None stays None."""
+    if value is None:
+        return None
+    high, _, low = str(value).partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine for reads: the replica while it is healthy and has caught up with the
+    primary's writes, otherwise the primary.
+
+    Writes are detected on the primary engine: a connection that ran a modifying statement
+    pins reads to the primary when it commits (before the writer clears the caches) and again
+    when it is returned to the pool (after the commit is durable). The check after a write
+    fetches the primary's current WAL position; until the replica has replayed up to it,
+    reads go to the primary. Because the utils readers share one lru_cache across sessions,
+    this also keeps a stale replica result from being cached right after a save.
+
+    Checks run in a background thread, requested by reads when one is due; reads never wait
+    for them and route on the last known state (the primary until the first check succeeded),
+    so a down replica does not stall readers.
+
+    A replica server that is not in recovery (e.g. the primary itself in a local test) has
+    no lag and counts as caught up.
+    """
+
+    def __init__(self, primary, replica, max_lag_seconds=None, check_seconds=None):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag_seconds = REPLICA_MAX_LAG_SECONDS if max_lag_seconds is None else max_lag_seconds
+        self.check_seconds = REPLICA_CHECK_SECONDS if check_seconds is None else check_seconds
+        self.lock = threading.Lock()
+        # mark_write() increments write_seq; handled_seq is the last one covered by target_lsn
+        self.write_seq = 0
+        self.handled_seq = 0
+        self.checking = False
+        self.target_lsn = 0
+        self.replayed_lsn = None
+        self.lag_seconds = None
+        self.healthy = False
+        self.next_check = 0.0
+        self.last_error = None
+        self.reads = {"replica": 0, "primary": 0}
+        # Completed checks (for refresh)
+        self.checks = 0
+        self._checked = threading.Condition(self.lock)
+        self._wake = threading.Event()
+        self._checker = None
+        self._wrote_key = f"replica_router_wrote_{id(self)}"
+        event.listen(primary, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(primary, "commit", self._commit)
+        event.listen(primary, "checkin", self._checkin)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        head = statement.lstrip()[:8].upper()
+        if head.startswith("WITH"):
+            writes = bool(_WRITE_KEYWORDS.search(statement))
+        else:
+            writes = not head.startswith(_READ_ONLY_PREFIXES)
+        if writes:
+            conn.info[self._wrote_key] = True
+
+    def _commit(self, conn):
+        if conn.info.get(self._wrote_key):
+            self.mark_write()
+
+    def _checkin(self, dbapi_connection, connection_record):
+        if connection_record is not None and connection_record.info.pop(self._wrote_key, False):
+            self.mark_write()
+
+    def mark_write(self):
+        """Pins reads to the primary until the replica has replayed the writes committed so far."""
+        with self.lock:
+            self.write_seq += 1
+
+    def _primary_lsn(self):
+        with self.primary.connect() as conn:
+            return _lsn(conn.exec_driver_sql("SELECT pg_current_wal_lsn()").scalar())
+
+    def _replica_position(self):
+        """(replayed LSN, lag in seconds) of the replica; (None, 0.0) if it is not a standby."""
+        with self.replica.connect() as conn:
+            in_recovery, replayed, lag = conn.exec_driver_sql("""
+                SELECT pg_is_in_recovery(),
+                       pg_last_wal_replay_lsn(),
+                       CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+            """).one()
+        if not in_recovery:
+            return None, 0.0
+        return _lsn(replayed), float(lag or 0.0)
+
+    def _caught_up(self):
+        return self.write_seq == self.handled_seq and (self.replayed_lsn is None or self.replayed_lsn >= self.target_lsn)
+
+    def _check(self, write_seq):
+        """Fetches the primary's WAL position (if writes are pending) and the replica's state."""
+        target_lsn = position = error = None
+        try:
+            if write_seq != self.handled_seq:
+                target_lsn = self._primary_lsn()
+            position = self._replica_position()
+        except Exception as e:
+            print(f"Error checking read replica: {e}")
+            error = str(e)
+        with self.lock:
+            self.checking = False
+            if target_lsn is not None:
+                self.target_lsn = max(self.target_lsn, target_lsn)
+                self.handled_seq = max(self.handled_seq, write_seq)
+            if position is not None:
+                self.replayed_lsn, self.lag_seconds = position
+                self.healthy = self.lag_seconds <= self.max_lag_seconds
+            else:
+                self.healthy = False
+            self.last_error = error
+            poll = self.check_seconds
+            if self.healthy and not self._caught_up():
+                poll = min(poll, REPLICA_CATCHUP_POLL_SECONDS)
+            self.next_check = time.monotonic() + poll
+            self.checks += 1
+            self._checked.notify_all()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self.lock:
+                self.checking = True
+                write_seq = self.write_seq
+            self._check(write_seq)
+
+    def _request_check(self):
+        # Caller holds self.lock
+        if self._checker is None:
+            self._checker = threading.Thread(target=self._run, name="replica-check", daemon=True)
+            self._checker.start()
+        self._wake.set()
+
+    def read_engine(self):
+        """The engine the next read should use, from the last known state; a due check is started in the background."""
+        with self.lock:
+            if not self.checking and (self.write_seq != self.handled_seq or time.monotonic() >= self.next_check):
+                self._request_check()
+            target = "replica" if self.healthy and self._caught_up() else "primary"
+            self.reads[target] += 1
+        return self.replica if target == "replica" else self.primary
+
+    def refresh(self, timeout=None):
+        """Runs a check now and waits for it. Returns False if it did not finish within timeout."""
+        with self.lock:
+            # A check already running may predate the latest state; wait for the next one
+            target = self.checks + (2 if self.checking else 1)
+            self._request_check()
+            return self._checked.wait_for(lambda: self.checks >= target, timeout)
+
+    def status(self):
+        """Replica health, lag and read counts (for the debug panel)."""
+        with self.lock:
+            return {
+                "gesund": self.healthy,
+                "aufgeholt": self._caught_up(),
+                "verzoegerung_s": self.lag_seconds,
+                "lesezugriffe_replica": self.reads["replica"],
+                "lesezugriffe_primary": self.reads["primary"],
+                "fehler": self.last_error,
+            }
@@ -0,0 +1,4 @@
+#!/bin/bash
+# Runs once on a fresh data volume: lets the db-replica container stream the WAL.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
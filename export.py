@@ -0,0 +1,245 @@
+"""
+Streaming export of entries and monthly aggregates as CSV or Parquet.
+
+Rows are read from a server-side cursor in chunks, so memory use stays
+constant regardless of how much history is exported.
+
+Cost exports (hours x hourly rates, see billing.py) are computed from the monthly
+aggregates and written the same way.
+
+CLI usage:
+    python export.py entries --year 2026 --format csv -o 2026_stunden.csv
+    python export.py aggregates --employee "Max Mustermann" --format parquet -o max.parquet
+    python export.py costs --year 2026 -o 2026_kosten.csv
+"""
+import argparse
+import csv
+import io
+import sys
+import tempfile
+from datetime import date
+
+from sqlalchemy import text
+
+import utils
+
+CHUNK_SIZE = 5000
+
+# Keep spooled exports in RAM up to this size, then spill to a temp file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+ENTRY_COLUMNS = ['datum', 'mitarbeiter', 'projekt', 'stunden', 'beschreibung', 'typ']
+AGGREGATE_COLUMNS = ['jahr', 'monat', 'mitarbeiter', 'projekt', 'stunden']
+COST_COLUMNS = ['jahr', 'monat', 'mitarbeiter', 'projekt', 'stunden', 'satz', 'betrag']
+
+EXPORT_KINDS = ('entries', 'aggregates', 'costs')
+EXPORT_FORMATS = ('csv', 'parquet')
+
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def _build_query(kind, year=None, employee=None, project=None):
+    """Returns (sql, params, columns) for the requested export."""
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown export kind: {kind}")
+    if kind == 'costs':
+        return None, None, COST_COLUMNS
+
+    conditions = []
+    params = {}
+    if year:
+        # Date range instead of EXTRACT(YEAR ...) so an index on datum can be used
+        conditions.append("datum >= :start AND datum < :end")
+        params["start"] = date(int(year), 1, 1)
+        params["end"] = date(int(year) + 1, 1, 1)
+    if employee:
+        conditions.append("mitarbeiter = :employee")
+        params["employee"] = employee
+    if project:
+        conditions.append("projekt = :project")
+        params["project"] = project
+
+    if kind == 'entries':
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"""
+            SELECT datum, mitarbeiter, projekt, stunden, beschreibung, typ
+            FROM entries
+            {where}
+            ORDER BY datum, mitarbeiter, projekt, id
+        """
+        return sql, params, ENTRY_COLUMNS
+
+    conditions.insert(0, "typ = 'Arbeit'")
+    sql = f"""
+        SELECT CAST(EXTRACT(YEAR FROM datum) AS INTEGER) AS jahr,
+               CAST(EXTRACT(MONTH FROM datum) AS INTEGER) AS monat,
+               mitarbeiter, projekt, SUM(stunden) AS stunden
+        FROM entries
+        WHERE {' AND '.join(conditions)}
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+    """
+    return sql, params, AGGREGATE_COLUMNS
+
+
+def iter_chunks(kind='entries', year=None, employee=None, project=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields lists of row tuples for the export, read from a server-side cursor.
+    Only one chunk is held in memory at a time.
+    """
+    if kind == 'costs':
+        yield from _iter_cost_chunks(year, employee, project, chunk_size)
+        return
+    sql, params, _ = _build_query(kind, year, employee, project)
+    with utils.read_engine().connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=chunk_size)
+        result = conn.execute(text(sql), params)
+        for partition in result.partitions(chunk_size):
+            yield [tuple(row) for row in partition]
+
+
+def _iter_cost_chunks(year=None, employee=None, project=None, chunk_size=CHUNK_SIZE):
+    """Yields cost rows per year; costs are computed in memory from the (small) monthly aggregates."""
+    import billing
+
+    if year:
+        years = [int(year)]
+    else:
+        with utils.read_engine().connect() as conn:
+            years = [row[0] for row in conn.execute(text(
+                "SELECT DISTINCT CAST(EXTRACT(YEAR FROM datum) AS INTEGER) FROM entries WHERE datum IS NOT NULL ORDER BY 1"
+            ))]
+    for y in years:
+        df = billing.get_costs(y, employee, project).sort_values(['monat', 'mitarbeiter', 'projekt'])
+        # NaN (no rate) -> None so CSV cells stay empty and Parquet gets nulls
+        df = df.astype(object).where(df.notna(), None)
+        rows = list(df[COST_COLUMNS].itertuples(index=False, name=None))
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+
+def write_csv(out, kind='entries', year=None, employee=None, project=None, chunk_size=CHUNK_SIZE):
+    """Writes the export as UTF-8 CSV to the binary stream `out`. Returns the row count."""
+    _, _, columns = _build_query(kind, year, employee, project)
+    wrapper = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    count = 0
+    try:
+        writer = csv.writer(wrapper, lineterminator='\n')
+        writer.writerow(columns)
+        for rows in iter_chunks(kind, year, employee, project, chunk_size):
+            writer.writerows(rows)
+            count += len(rows)
+        wrapper.flush()
+    finally:
+        # Don't let the wrapper close the caller's stream
+        wrapper.detach()
+    return count
+
+
+def _parquet_schema(kind):
+    import pyarrow as pa
+    if kind == 'costs':
+        return pa.schema([
+            ('jahr', pa.int32()),
+            ('monat', pa.int32()),
+            ('mitarbeiter', pa.string()),
+            ('projekt', pa.string()),
+            ('stunden', pa.float64()),
+            ('satz', pa.float64()),
+            ('betrag', pa.float64()),
+        ])
+    if kind == 'entries':
+        return pa.schema([
+            ('datum', pa.date32()),
+            ('mitarbeiter', pa.string()),
+            ('projekt', pa.string()),
+            ('stunden', pa.float64()),
+            ('beschreibung', pa.string()),
+            ('typ', pa.string()),
+        ])
+    return pa.schema([
+        ('jahr', pa.int32()),
+        ('monat', pa.int32()),
+        ('mitarbeiter', pa.string()),
+        ('projekt', pa.string()),
+        ('stunden', pa.float64()),
+    ])
+
+
+def write_parquet(out, kind='entries', year=None, employee=None, project=None, chunk_size=CHUNK_SIZE):
+    """Writes the export as Parquet to the binary stream `out`, one row group per chunk. Returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(kind)
+    count = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in iter_chunks(kind, year, employee, project, chunk_size):
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_batch(batch)
+            count += len(rows)
+    return count
+
+
+def write_export(out, fmt='csv', kind='entries', year=None, employee=None, project=None, chunk_size=CHUNK_SIZE):
+    """Writes an export in the given format to `out`. Returns the row count."""
+    if fmt == 'csv':
+        return write_csv(out, kind, year, employee, project, chunk_size)
+    if fmt == 'parquet':
+        return write_parquet(out, kind, year, employee, project, chunk_size)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_file(fmt='csv', kind='entries', year=None, employee=None, project=None):
+    """
+    Returns a rewound spooled temp file containing the export.
+    Small exports stay in memory, large ones spill to disk. Suitable as data for st.download_button.
+    """
+    tmp = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    write_export(tmp, fmt, kind, year, employee, project)
+    tmp.seek(0)
+    return tmp
+
+
+def export_filename(fmt='csv', kind='entries', year=None, employee=None, project=None):
+    """Builds a descriptive download filename for an export."""
+    parts = [str(year) if year else "alle_jahre"]
+    if employee:
+        parts.append(employee)
+    if project:
+        parts.append(project)
+    parts.append({"entries": "stunden", "aggregates": "monatssummen", "costs": "kosten"}[kind])
+    name = "_".join(parts).replace(" ", "_").replace("/", "-")
+    return f"{name}.{fmt}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export entries or monthly aggregates as CSV or Parquet.")
+    parser.add_argument("kind", choices=EXPORT_KINDS, help="entries (raw rows), aggregates (hours per month/employee/project) or costs (hours x rates)")
+    parser.add_argument("--year", type=int, help="Only export this year")
+    parser.add_argument("--employee", help="Only export this employee")
+    parser.add_argument("--project", help="Only export this project")
+    parser.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, "wb") as out:
+            count = write_export(out, args.fmt, args.kind, args.year, args.employee, args.project, args.chunk_size)
+    else:
+        count = write_export(sys.stdout.buffer, args.fmt, args.kind, args.year, args.employee, args.project, args.chunk_size)
+        sys.stdout.buffer.flush()
+    print(f"{count} Zeilen exportiert.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
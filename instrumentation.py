@@ -0,0 +1,284 @@
+"""
+Call and query instrumentation for the data layer.
+
+Every public function of utils is wrapped with a decorator that records call count, wall
+time, rows returned (length of the returned frame / list / dict), lru-cache hits and misses
+and the number of SQL round trips issued while it was the innermost instrumented call.
+SQLAlchemy engine events record every SQL statement with its count, time and row count.
+
+Stats are kept twice: process-wide totals (exported in Prometheus text format) and a
+per-thread window (a context variable, inherited by async_utils coroutines) that app.py
+restarts on each rerun for its debug panel.
+
+Disabled unless INSTRUMENTATION=1 is set (or enable() is called); when disabled nothing is
+wrapped and no engine events are registered.
+"""
+import contextvars
+import os
+import threading
+import time
+from functools import wraps
+
+import pandas as pd
+from sqlalchemy import event
+
+import db_pool
+import utils
+
+ENABLED = os.getenv("INSTRUMENTATION", "").lower() in ("1", "true", "yes")
+
+# Optional path of a Prometheus textfile-collector file, rewritten by app.py after each rerun
+PROMETHEUS_FILE = os.getenv("INSTRUMENTATION_PROM_FILE")
+
+# Statements are grouped by their whitespace-normalized text, cut to this length
+STATEMENT_MAX_LENGTH = 200
+
+FUNCTION_COLUMNS = ['funktion', 'aufrufe', 'sekunden', 'zeilen', 'cache_treffer', 'cache_fehlschlaege', 'abfragen']
+STATEMENT_COLUMNS = ['statement', 'aufrufe', 'sekunden', 'zeilen']
+
+# Not data functions: connection setup, cache plumbing and the (hot, trivial) version getters
+_EXCLUDED = {
+    "get_db_url", "get_replica_url", "read_engine", "test_db_connection", "init_db", "clear_cache", "register_month_save_listener",
+    "get_data_version", "get_holiday_version", "get_project_version", "get_month_version", "get_saved_version",
+}
+
+
+_POOL_METRICS = [
+    ("hourtracking_db_pool_size", "gauge", "Persistent connections of the pool", "groesse"),
+    ("hourtracking_db_pool_checked_out", "gauge", "Connections currently checked out", "ausgeliehen"),
+    ("hourtracking_db_pool_overflow", "gauge", "Overflow connections currently open", "overflow"),
+    ("hourtracking_db_pool_checkouts_total", "counter", "Connection checkouts", "checkouts"),
+    ("hourtracking_db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection", "wartezeit_summe_s"),
+    ("hourtracking_db_pool_pings_total", "counter", "Liveness pings on checkout", "pings"),
+    ("hourtracking_db_pool_ping_failures_total", "counter", "Failed liveness pings", "ping_fehler"),
+]
+
+
+class Stats:
+    """Counters per function and per SQL statement."""
+
+    def __init__(self):
+        self.functions = {}
+        self.statements = {}
+        self._lock = threading.Lock()
+
+    def record_call(self, name, seconds, rows, cache_hit):
+        with self._lock:
+            f = self.functions.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0, "hits": 0, "misses": 0, "queries": 0})
+            f["calls"] += 1
+            f["seconds"] += seconds
+            f["rows"] += rows or 0
+            if cache_hit is True:
+                f["hits"] += 1
+            elif cache_hit is False:
+                f["misses"] += 1
+
+    def record_query(self, statement, seconds, rows, function):
+        with self._lock:
+            s = self.statements.setdefault(statement, {"calls": 0, "seconds": 0.0, "rows": 0})
+            s["calls"] += 1
+            s["seconds"] += seconds
+            s["rows"] += max(rows, 0)
+            if function is not None:
+                f = self.functions.setdefault(function, {"calls": 0, "seconds": 0.0, "rows": 0, "hits": 0, "misses": 0, "queries": 0})
+                f["queries"] += 1
+
+    @property
+    def query_count(self):
+        with self._lock:
+            return sum(s["calls"] for s in self.statements.values())
+
+    @property
+    def query_seconds(self):
+        with self._lock:
+            return sum(s["seconds"] for s in self.statements.values())
+
+
+totals = Stats()
+# Context variables rather than thread-locals, so async_utils coroutines report into the
+# window and call stack of the caller that started them
+_window = contextvars.ContextVar("instrumentation_window", default=None)
+_calls = contextvars.ContextVar("instrumentation_calls", default=())
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _targets():
+    window = _window.get()
+    return (totals, window) if window is not None else (totals,)
+
+
+def _row_count(result):
+    if isinstance(result, (pd.DataFrame, pd.Series, list, tuple, dict, set)):
+        return len(result)
+    return None
+
+
+def instrument(func, name=None):
+    """Wraps a function so its calls are recorded; lru_cache attributes stay available."""
+    name = name or func.__name__
+    cache_info = getattr(func, "cache_info", None)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        hits_before = cache_info().hits if cache_info else None
+        token = _calls.set(_calls.get() + (name,))
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            _calls.reset(token)
+        cache_hit = cache_info().hits > hits_before if cache_info else None
+        rows = _row_count(result)
+        for stats in _targets():
+            stats.record_call(name, seconds, rows, cache_hit)
+        return result
+
+    if cache_info:
+        wrapper.cache_info = func.cache_info
+        wrapper.cache_clear = func.cache_clear
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_module(module, names=None):
+    """Replaces the public functions of a module (or the given names) with instrumented wrappers."""
+    if names is None:
+        names = [
+            n for n, obj in vars(module).items()
+            if callable(obj) and not n.startswith("_") and n not in _EXCLUDED
+            and getattr(obj, "__module__", None) == module.__name__ and not isinstance(obj, type)
+        ]
+    for n in names:
+        obj = getattr(module, n)
+        if not getattr(obj, "__instrumented__", False):
+            setattr(module, n, instrument(obj, n))
+    return names
+
+
+def _normalize(statement):
+    return " ".join(statement.split())[:STATEMENT_MAX_LENGTH]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("instrumentation_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["instrumentation_start"].pop()
+    calls = _calls.get()
+    function = calls[-1] if calls else None
+    rows = cursor.rowcount if cursor.rowcount is not None else 0
+    key = _normalize(statement)
+    for stats in _targets():
+        stats.record_query(key, seconds, rows, function)
+
+
+def _listen(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def enable(engine=None):
+    """
+    Installs the wrappers on utils and the event listeners on the given engine, or on every
+    engine of db_pool (primary, replica, async engines created later). Idempotent.
+    """
+    global _installed, ENABLED
+    with _install_lock:
+        if _installed:
+            return
+        if engine is not None:
+            _listen(engine)
+        else:
+            db_pool.add_engine_hook(_listen)
+        instrument_module(utils)
+        _installed = True
+        ENABLED = True
+
+
+def start_window():
+    """Starts a fresh window for the current thread or context (e.g. at the beginning of a Streamlit rerun) and returns it."""
+    window = Stats()
+    _window.set(window)
+    return window
+
+
+def current_window():
+    """The current thread's (or context's) window, or None if none was started."""
+    return _window.get()
+
+
+def reset():
+    """Clears the process-wide totals."""
+    global totals
+    totals = Stats()
+
+
+def function_table(stats=None):
+    """Per-function stats as a frame (FUNCTION_COLUMNS), slowest first."""
+    stats = stats or totals
+    with stats._lock:
+        rows = [
+            (name, f["calls"], f["seconds"], f["rows"], f["hits"], f["misses"], f["queries"])
+            for name, f in stats.functions.items()
+        ]
+    return pd.DataFrame(rows, columns=FUNCTION_COLUMNS).sort_values('sekunden', ascending=False).reset_index(drop=True)
+
+
+def statement_table(stats=None):
+    """Per-statement stats as a frame (STATEMENT_COLUMNS), slowest first."""
+    stats = stats or totals
+    with stats._lock:
+        rows = [(sql, s["calls"], s["seconds"], s["rows"]) for sql, s in stats.statements.items()]
+    return pd.DataFrame(rows, columns=STATEMENT_COLUMNS).sort_values('sekunden', ascending=False).reset_index(drop=True)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", " ")
+
+
+def prometheus_text(stats=None):
+    """The stats in Prometheus text exposition format."""
+    stats = stats or totals
+    functions = function_table(stats)
+    statements = statement_table(stats)
+    metrics = [
+        ("hourtracking_function_calls_total", "counter", "Calls per data function", functions, 'funktion', 'function', 'aufrufe'),
+        ("hourtracking_function_seconds_total", "counter", "Wall time per data function", functions, 'funktion', 'function', 'sekunden'),
+        ("hourtracking_function_rows_total", "counter", "Rows returned per data function", functions, 'funktion', 'function', 'zeilen'),
+        ("hourtracking_function_cache_hits_total", "counter", "lru_cache hits per data function", functions, 'funktion', 'function', 'cache_treffer'),
+        ("hourtracking_function_cache_misses_total", "counter", "lru_cache misses per data function", functions, 'funktion', 'function', 'cache_fehlschlaege'),
+        ("hourtracking_function_queries_total", "counter", "SQL round trips per data function", functions, 'funktion', 'function', 'abfragen'),
+        ("hourtracking_sql_queries_total", "counter", "Executions per SQL statement", statements, 'statement', 'statement', 'aufrufe'),
+        ("hourtracking_sql_seconds_total", "counter", "Execution time per SQL statement", statements, 'statement', 'statement', 'sekunden'),
+        ("hourtracking_sql_rows_total", "counter", "Rows returned or affected per SQL statement", statements, 'statement', 'statement', 'zeilen'),
+    ]
+    lines = []
+    for metric, kind, help_text, df, column, label, value in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for key, v in zip(df[column], df[value]):
+            lines.append(f'{metric}{{{label}="{_label(key)}"}} {v:g}')
+
+    pool = db_pool.pool_metrics(utils.engine)
+    for metric, kind, help_text, key in _POOL_METRICS:
+        if pool[key] is None:
+            continue
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f'{metric}{{mode="{pool["modus"]}"}} {pool[key]:g}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, stats=None):
+    """Writes prometheus_text() atomically to path (for the node_exporter textfile collector)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text(stats))
+    os.replace(tmp, path)
+
+
+if ENABLED:
+    enable()
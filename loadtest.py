@@ -0,0 +1,328 @@
+"""
+Load harness: N concurrent simulated users running the app's flows directly against the
+utils API, in threads of one process sharing utils.engine and the lru_cache readers, just
+like Streamlit sessions.
+
+Flows (weighted random choice per step, see DEFAULT_MIX):
+    year_view     load_data, employees, projects and the per-project month pivots
+    month_view    one employee's 12 editor matrices (the single-employee view)
+    save_month    edit one cell and save_matrix_entries
+    rename        rename a project and back on the next turn
+
+Reported per run: throughput, latency percentiles per flow, errors, connection-pool wait
+(time spent in the pool's checkout, including opening new connections) and cache stampedes
+(an lru_cache reader computing a key that another thread is already computing).
+
+Runs on the synthetic data of benchmark.py (seeded once, removed afterwards). Point
+DATABASE_URL at the docker-compose Postgres (or another scratch database).
+
+CLI usage:
+    python loadtest.py --users 5,10,25 --duration 20
+    python loadtest.py --users 50 --scale medium --mix year_view=5,save_month=5 -o load.json
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import benchmark
+import utils
+import work_calendar
+
+DEFAULT_MIX = {"year_view": 4, "month_view": 3, "save_month": 2, "rename": 1}
+FLOWS = tuple(DEFAULT_MIX)
+
+DEFAULT_USERS = (5, 10, 25)
+DEFAULT_DURATION = 20.0
+DEFAULT_SCALE = "small"
+
+PERCENTILES = (50, 90, 95, 99)
+
+RENAME_SUFFIX = " (umbenannt)"
+
+
+class _Recorder:
+    """Latencies, errors, pool waits and stampedes of one run (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {flow: [] for flow in FLOWS}
+        self.errors = {flow: 0 for flow in FLOWS}
+        self.pool_waits = []
+        self.stampedes = {}
+        self.computations = {}
+
+    def flow(self, flow, seconds, ok):
+        with self.lock:
+            self.latencies[flow].append(seconds)
+            if not ok:
+                self.errors[flow] += 1
+
+    def pool_wait(self, seconds):
+        with self.lock:
+            self.pool_waits.append(seconds)
+
+    def computation(self, name, stampede):
+        with self.lock:
+            self.computations[name] = self.computations.get(name, 0) + 1
+            if stampede:
+                self.stampedes[name] = self.stampedes.get(name, 0) + 1
+
+
+def _track_cached_readers(recorder):
+    """
+    Rebuilds every lru_cache reader of utils around a body that reports each computation and
+    whether the same key was already being computed by another thread. Returns a restore function.
+    """
+    originals = {}
+    inflight = {}
+    inflight_lock = threading.Lock()
+
+    def tracked(name, body):
+        def compute(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            with inflight_lock:
+                stampede = inflight.get(key, 0) > 0
+                inflight[key] = inflight.get(key, 0) + 1
+            recorder.computation(name, stampede)
+            try:
+                return body(*args, **kwargs)
+            finally:
+                with inflight_lock:
+                    inflight[key] -= 1
+        return compute
+
+    for name, obj in list(vars(utils).items()):
+        if hasattr(obj, "cache_parameters") and hasattr(obj, "__wrapped__"):
+            originals[name] = obj
+            params = obj.cache_parameters()
+            setattr(utils, name, lru_cache(maxsize=params["maxsize"], typed=params["typed"])(tracked(name, obj.__wrapped__)))
+
+    def restore():
+        for name, obj in originals.items():
+            setattr(utils, name, obj)
+    return restore
+
+
+def _track_pool_waits(recorder, engine=None):
+    """Times every connection checkout of the engine's pool. Returns a restore function."""
+    pool = (engine or utils.engine).pool
+    original = pool._do_get
+
+    def timed_get():
+        start = time.perf_counter()
+        try:
+            return original()
+        finally:
+            recorder.pool_wait(time.perf_counter() - start)
+
+    pool._do_get = timed_get
+
+    def restore():
+        del pool._do_get
+    return restore
+
+
+class _User:
+    """One simulated session."""
+
+    def __init__(self, index, data, rng, rename_locks):
+        self.data = data
+        self.rng = rng
+        self.employee = data["employees"][index % len(data["employees"])]
+        self.project = data["projects"][index % len(data["projects"])]
+        self.year = data["years"][-1]
+        self.rename_locks = rename_locks
+
+    def year_view(self):
+        utils.load_data()
+        utils.get_employees()
+        utils.get_projects()
+        benchmark.yearly_pivots(self.year)
+        return True
+
+    def month_view(self):
+        df = utils.load_data()
+        benchmark.month_matrices(df, self.employee, self.year, utils.get_assigned_projects(self.employee))
+        return True
+
+    def save_month(self):
+        month = self.rng.randint(1, 12)
+        df = utils.load_data()
+        df = df[df['mitarbeiter'] == self.employee]
+        df = df[pd.to_datetime(df['datum']).dt.month.eq(month) & pd.to_datetime(df['datum']).dt.year.eq(self.year)]
+        projects = utils.get_assigned_projects(self.employee)
+        if not projects:
+            return True
+        matrix = work_calendar.month_matrix(self.year, month, projects, df, benchmark.BENCH_REGION)
+        workdays = np.flatnonzero(work_calendar.day_types(self.year, month, benchmark.BENCH_REGION) == work_calendar.WORKDAY) + 1
+        if len(workdays):
+            matrix.at[self.rng.choice(projects), int(self.rng.choice(list(workdays)))] = float(self.rng.randint(1, 8))
+        return utils.save_matrix_entries(self.employee, self.year, month, matrix)
+
+    def rename(self):
+        with self.rename_locks[self.project]:
+            current = set(utils.get_projects())
+            renamed = self.project + RENAME_SUFFIX
+            if self.project in current:
+                return utils.rename_project(self.project, renamed)
+            return utils.rename_project(renamed, self.project)
+
+
+def _percentiles(values):
+    if not values:
+        return {f"p{p}": None for p in PERCENTILES} | {"max": None}
+    result = {f"p{p}": float(np.percentile(values, p)) * 1000 for p in PERCENTILES}
+    result["max"] = max(values) * 1000
+    return result
+
+
+def run_load(data, users, duration=DEFAULT_DURATION, mix=None, think_ms=0, seed_value=0):
+    """
+    Runs `users` concurrent simulated users for `duration` seconds on seeded data and returns
+    the report dict (latencies in milliseconds).
+    """
+    mix = mix or DEFAULT_MIX
+    flows = [flow for flow in FLOWS if mix.get(flow)]
+    weights = [mix[flow] for flow in flows]
+    recorder = _Recorder()
+    rename_locks = {p: threading.Lock() for p in data["projects"]}
+    restore_readers = _track_cached_readers(recorder)
+    restore_pool = _track_pool_waits(recorder)
+    utils.clear_cache()
+    stop_at = time.perf_counter() + duration
+    start_barrier = threading.Barrier(users)
+
+    def session(index):
+        rng = random.Random(seed_value * 1000 + index)
+        user = _User(index, data, rng, rename_locks)
+        start_barrier.wait()
+        while time.perf_counter() < stop_at:
+            flow = rng.choices(flows, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = bool(getattr(user, flow)())
+            except Exception as e:
+                print(f"Error in load flow {flow}: {e}")
+                ok = False
+            recorder.flow(flow, time.perf_counter() - start, ok)
+            if think_ms:
+                time.sleep(rng.uniform(0, 2 * think_ms) / 1000)
+
+    threads = [threading.Thread(target=session, args=(i,), name=f"load-user-{i}") for i in range(users)]
+    started = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        restore_pool()
+        restore_readers()
+        utils.clear_cache(projects=None, months=None)
+    elapsed = time.perf_counter() - started
+
+    pool = utils.engine.pool
+    total = sum(len(v) for v in recorder.latencies.values())
+    return {
+        "users": users,
+        "sekunden": elapsed,
+        "operationen": total,
+        "durchsatz_ops_s": total / elapsed if elapsed else 0.0,
+        "fehler": sum(recorder.errors.values()),
+        "flows": {
+            flow: {
+                "anzahl": len(recorder.latencies[flow]),
+                "fehler": recorder.errors[flow],
+                "ops_s": len(recorder.latencies[flow]) / elapsed if elapsed else 0.0,
+                **_percentiles(recorder.latencies[flow]),
+            }
+            for flow in flows
+        },
+        "pool": {
+            "groesse": pool.size() if hasattr(pool, "size") else None,
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "checkouts": len(recorder.pool_waits),
+            "wartezeit_summe_ms": sum(recorder.pool_waits) * 1000,
+            **{f"wartezeit_{k}_ms": v for k, v in _percentiles(recorder.pool_waits).items()},
+        },
+        "cache": {
+            "berechnungen": dict(sorted(recorder.computations.items())),
+            "stampedes": dict(sorted(recorder.stampedes.items())),
+            "stampedes_gesamt": sum(recorder.stampedes.values()),
+        },
+    }
+
+
+def format_report(reports):
+    """One line per user count plus per-flow p95 latencies."""
+    rows = []
+    for r in reports:
+        row = {
+            "Nutzer": r["users"],
+            "Ops/s": round(r["durchsatz_ops_s"], 1),
+            "Fehler": r["fehler"],
+            "Pool-Wartezeit p95 (ms)": round(r["pool"]["wartezeit_p95_ms"] or 0.0, 1),
+            "Stampedes": r["cache"]["stampedes_gesamt"],
+        }
+        for flow, stats in r["flows"].items():
+            row[f"{flow} p95 (ms)"] = round(stats["p95"], 1) if stats["p95"] is not None else None
+        rows.append(row)
+    return pd.DataFrame(rows).to_string(index=False)
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        flow, _, weight = part.partition("=")
+        flow = flow.strip()
+        if flow not in FLOWS:
+            raise ValueError(f"Unknown flow: {flow} (use {', '.join(FLOWS)})")
+        mix[flow] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent users against the utils API.")
+    parser.add_argument("--users", default=",".join(str(u) for u in DEFAULT_USERS), help="Comma-separated numbers of concurrent users")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds per user count")
+    parser.add_argument("--scale", default=DEFAULT_SCALE, help=f"Data scale ({', '.join(benchmark.SCALES)} or NxMxY)")
+    parser.add_argument("--mix", help="Flow weights, e.g. year_view=4,month_view=3,save_month=2,rename=1")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between steps of a user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the reports as JSON to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        users = [int(u) for u in args.users.split(",") if u.strip()]
+        mix = _parse_mix(args.mix) if args.mix else None
+        scale = benchmark.parse_scale(args.scale)
+    except ValueError as e:
+        parser.error(str(e))
+
+    benchmark.cleanup()
+    data = benchmark.generate(*scale, seed=args.seed)
+    benchmark.seed(data)
+    reports = []
+    try:
+        for n in users:
+            reports.append(run_load(data, n, args.duration, mix, args.think_ms, args.seed))
+            print(format_report(reports[-1:]), file=sys.stderr)
+    finally:
+        benchmark.cleanup()
+
+    print(format_report(reports), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scale": args.scale, "reports": reports}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
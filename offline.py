@@ -0,0 +1,512 @@
+"""
+Offline mode for when the database is unreachable (e.g. a paused Supabase project).
+
+A failed connection attempt of utils.engine switches the process to offline mode: further
+attempts fail immediately instead of each waiting out the connect timeout, and a monitor
+thread probes the database every OFFLINE_RETRY_SECONDS with a short timeout.
+
+Reads: the utils readers store their latest results as snapshots in a local SQLite file and
+return the snapshot while offline, also after a restart.
+
+Writes: month saves go to an append-only journal in the same file (journal_month /
+journal_matrix); journaled_entries() returns a month's not yet transferred entries for the
+editor. When the database is back, the journal is replayed in one transaction
+(utils.save_month_batch). Each journaled month carries a fingerprint of the month as the user
+saw it, compared inside that transaction with the month locked; if the month was changed in
+the database meanwhile, it is not overwritten but kept as a conflict for the user to resolve
+(conflicts() / resolve()).
+
+Configuration (environment):
+    OFFLINE_DIR              directory of the journal / snapshot file (default: offline)
+    OFFLINE_RETRY_SECONDS    probe interval while offline (default 15)
+    OFFLINE_PROBE_TIMEOUT    connect timeout of a probe in seconds (default 3)
+"""
+import hashlib
+import json
+import math
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import event, exc, text
+
+import db_pool
+import utils
+import write_queue
+
+OFFLINE_DIR = os.getenv("OFFLINE_DIR", "offline")
+RETRY_SECONDS = float(os.getenv("OFFLINE_RETRY_SECONDS", "15"))
+PROBE_TIMEOUT = int(os.getenv("OFFLINE_PROBE_TIMEOUT", "3"))
+
+STATUSES = ("offen", "uebertragen", "konflikt", "verworfen")
+CONFLICT_COLUMNS = ['mitarbeiter', 'jahr', 'monat', 'gespeichert', 'meldung']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    erstellt TEXT NOT NULL,
+    mitarbeiter TEXT NOT NULL,
+    jahr INTEGER NOT NULL,
+    monat INTEGER NOT NULL,
+    eintraege TEXT NOT NULL,
+    basis TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'offen',
+    meldung TEXT
+);
+CREATE INDEX IF NOT EXISTS journal_status_idx ON journal (status, mitarbeiter, jahr, monat);
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT PRIMARY KEY,
+    gespeichert TEXT NOT NULL,
+    wert BLOB NOT NULL
+);
+"""
+
+
+class DatabaseOffline(ConnectionError):
+    """Raised instead of a connection attempt while the database is known to be unreachable."""
+
+
+class _Store:
+    """The local SQLite file: journal and snapshots (autocommit, one connection per process)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            if self._conn is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._conn = conn
+            return self._conn.execute(sql, params).fetchall()
+
+
+_store = _Store(os.path.join(OFFLINE_DIR, "offline.sqlite3"))
+
+_lock = threading.Lock()
+_online = True
+_offline_since = None
+_last_error = None
+_monitor = None
+_wake = threading.Event()
+_replay_lock = threading.Lock()
+_probe_engine = None
+_installed = False
+
+# Snapshots waiting for the writer thread: key -> result (latest wins)
+_snapshot_queue = OrderedDict()
+_snapshot_cond = threading.Condition()
+_snapshot_writer = None
+
+
+def is_online():
+    """False while the database is known to be unreachable."""
+    return _online
+
+
+def mark_offline(error):
+    """Switches to offline mode (if not already) and starts the reconnect monitor."""
+    global _online, _offline_since, _last_error, _monitor
+    with _lock:
+        _last_error = str(error)
+        if _online:
+            _online = False
+            _offline_since = datetime.now()
+            print(f"Database offline, retrying every {RETRY_SECONDS:g}s: {error}")
+        if _monitor is None or not _monitor.is_alive():
+            _monitor = threading.Thread(target=_run_monitor, name="offline-monitor", daemon=True)
+            _monitor.start()
+
+
+def retry_now():
+    """Makes the monitor probe the database right away instead of at the next interval."""
+    _wake.set()
+
+
+def _probe():
+    global _probe_engine, _last_error
+    if _probe_engine is None:
+        _probe_engine = db_pool.create_pooled_engine(utils.DB_URL, pool_size=0, pre_ping="off",
+                                                     connect_timeout=PROBE_TIMEOUT)
+    try:
+        with _probe_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        with _lock:
+            _last_error = str(e)
+        return False
+
+
+def _run_monitor():
+    global _monitor
+    while True:
+        with _lock:
+            if _online:
+                _monitor = None
+                return
+        _wake.wait(RETRY_SECONDS)
+        _wake.clear()
+        if _probe():
+            _reconnected()
+
+
+def _reconnected():
+    global _online, _offline_since
+    with _lock:
+        _online = True
+        _offline_since = None
+    print("Database reachable again, replaying the offline journal")
+    replay()
+    # Everything read while offline came from snapshots
+    utils.clear_cache(projects=None, months=None)
+
+
+def _on_error(context):
+    if isinstance(context.original_exception, DatabaseOffline):
+        return
+    # Only failed connection attempts; a dropped connection is replaced by the pool
+    if context.connection is None:
+        mark_offline(context.original_exception)
+
+
+def _on_connect(dialect, conn_rec, cargs, cparams):
+    if not _online:
+        raise DatabaseOffline(f"Database offline (retrying every {RETRY_SECONDS:g}s): {_last_error}")
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    # Pooled connections are not used while offline; the pool then tries to connect (_on_connect)
+    if not _online:
+        raise exc.DisconnectionError()
+
+
+# --- Snapshots ---------------------------------------------------------------
+
+_MISSING = object()
+
+
+def _snapshot_key(func, args, kwargs):
+    return f"{func.__name__}:{json.dumps([list(args), kwargs], default=str, sort_keys=True)}"
+
+
+def _load_snapshot(key):
+    try:
+        rows = _store.execute("SELECT wert FROM snapshots WHERE key = ?", (key,))
+        return pickle.loads(rows[0][0]) if rows else _MISSING
+    except Exception as e:
+        print(f"Error loading snapshot {key}: {e}")
+        return _MISSING
+
+
+def _queue_snapshot(key, value):
+    global _snapshot_writer
+    with _snapshot_cond:
+        _snapshot_queue[key] = value
+        _snapshot_queue.move_to_end(key)
+        _snapshot_cond.notify_all()
+        if _snapshot_writer is None or not _snapshot_writer.is_alive():
+            _snapshot_writer = threading.Thread(target=_run_snapshot_writer, name="offline-snapshots", daemon=True)
+            _snapshot_writer.start()
+
+
+def _write_pending_snapshots():
+    """Writes the queued snapshots (normally done by the writer thread)."""
+    with _snapshot_cond:
+        items = list(_snapshot_queue.items())
+        _snapshot_queue.clear()
+    now = datetime.now().isoformat(timespec="seconds")
+    for key, value in items:
+        try:
+            _store.execute("INSERT OR REPLACE INTO snapshots (key, gespeichert, wert) VALUES (?, ?, ?)",
+                           (key, now, pickle.dumps(value)))
+        except Exception as e:
+            print(f"Error saving snapshot {key}: {e}")
+
+
+def _run_snapshot_writer():
+    while True:
+        with _snapshot_cond:
+            while not _snapshot_queue:
+                _snapshot_cond.wait()
+        _write_pending_snapshots()
+
+
+class _Snapshots:
+    """The utils._snapshot_store hook."""
+
+    def read(self, func, args, kwargs):
+        key = _snapshot_key(func, args, kwargs)
+        if not _online:
+            value = _load_snapshot(key)
+            return func(*args, **kwargs) if value is _MISSING else value
+        result = func(*args, **kwargs)
+        if not _online:
+            # The connection failed during this call: the reader returned its empty default
+            value = _load_snapshot(key)
+            return result if value is _MISSING else value
+        _queue_snapshot(key, result)
+        return result
+
+
+def has_snapshot():
+    """True if data can be shown while offline (a snapshot of load_data exists)."""
+    try:
+        return bool(_store.execute("SELECT 1 FROM snapshots WHERE key LIKE 'load_data:%'"))
+    except Exception as e:
+        print(f"Error reading snapshots: {e}")
+        return False
+
+
+# --- Journal -----------------------------------------------------------------
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value).strip()
+
+
+def _fingerprint(rows):
+    """Order-independent hash of a month's entries: rows of (datum, projekt, stunden, beschreibung, typ)."""
+    normalized = sorted(
+        (pd.Timestamp(datum).date().isoformat(), _text(projekt), f"{float(stunden or 0):.2f}", _text(beschreibung), _text(typ))
+        for datum, projekt, stunden, beschreibung, typ in rows
+    )
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+def _month_range(year, month):
+    start = date(int(year), int(month), 1)
+    end = date(int(year) + 1, 1, 1) if int(month) == 12 else date(int(year), int(month) + 1, 1)
+    return start, end
+
+
+def _shown_fingerprint(mitarbeiter, year, month):
+    """Fingerprint of the month as the app shows it (load_data, i.e. the snapshot while offline)."""
+    df = utils.load_data()
+    rows = []
+    if not df.empty:
+        datum = pd.to_datetime(df['datum'])
+        month_df = df[(df['mitarbeiter'] == mitarbeiter) & (datum.dt.year == int(year)) & (datum.dt.month == int(month))]
+        rows = month_df[['datum', 'projekt', 'stunden', 'beschreibung', 'typ']].itertuples(index=False)
+    return _fingerprint(rows)
+
+
+def _current_fingerprint(conn, mitarbeiter, year, month):
+    start, end = _month_range(year, month)
+    rows = conn.execute(text("""
+        SELECT datum, projekt, stunden, beschreibung, typ FROM entries
+        WHERE mitarbeiter = :mitarbeiter AND datum >= :start AND datum < :end
+    """), {"mitarbeiter": mitarbeiter, "start": start, "end": end}).fetchall()
+    return _fingerprint(rows)
+
+
+def _encode(entries):
+    return json.dumps([
+        {**e, "datum": pd.Timestamp(e["datum"]).date().isoformat(), "stunden": float(e.get("stunden") or 0)}
+        for e in entries
+    ])
+
+
+def _decode(payload):
+    return [{**e, "datum": date.fromisoformat(e["datum"])} for e in json.loads(payload)]
+
+
+def journal_month(mitarbeiter, year, month, entries):
+    """
+    Appends a month save (see utils.save_month_entries) to the local journal; it is replayed
+    when the database is reachable again. Returns False if the save is invalid.
+    """
+    error = write_queue.validate(mitarbeiter, year, month, entries)
+    if error:
+        print(f"Error journaling month save: {error}")
+        return False
+    try:
+        mitarbeiter = mitarbeiter.strip()
+        _store.execute(
+            "INSERT INTO journal (erstellt, mitarbeiter, jahr, monat, eintraege, basis) VALUES (?, ?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(timespec="seconds"), mitarbeiter, int(year), int(month),
+             _encode(entries), _shown_fingerprint(mitarbeiter, year, month)),
+        )
+        return True
+    except Exception as e:
+        print(f"Error journaling month save: {e}")
+        return False
+
+
+def journal_matrix(mitarbeiter, year, month, df_matrix):
+    """Journals a save_matrix_entries call (see journal_month)."""
+    return journal_month(mitarbeiter, year, month, utils.matrix_to_entries(mitarbeiter, year, month, df_matrix))
+
+
+def journaled_entries(mitarbeiter, year, month):
+    """The latest not yet transferred entries of an employee-month, or None."""
+    try:
+        rows = _store.execute(
+            "SELECT eintraege FROM journal WHERE status = 'offen' AND mitarbeiter = ? AND jahr = ? AND monat = ? "
+            "ORDER BY id DESC LIMIT 1",
+            (mitarbeiter.strip(), int(year), int(month)),
+        )
+        return _decode(rows[0][0]) if rows else None
+    except Exception as e:
+        print(f"Error reading offline journal: {e}")
+        return None
+
+
+def _set_status(ids, status, meldung=None):
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        _store.execute(
+            f"UPDATE journal SET status = ?, meldung = ? WHERE id IN ({','.join('?' * len(chunk))})",
+            (status, meldung, *chunk),
+        )
+
+
+def replay():
+    """
+    Transfers the open journal entries: per employee-month the latest save, unless the month
+    was changed in the database since the user saw it (then it becomes a conflict). The check
+    and the write run in one transaction with the months locked, so no change slips in between.
+    Returns {"uebertragen", "konflikte", "fehler"} month counts.
+    """
+    result = {"uebertragen": 0, "konflikte": 0, "fehler": 0}
+    with _replay_lock:
+        try:
+            rows = _store.execute(
+                "SELECT id, mitarbeiter, jahr, monat, eintraege, basis FROM journal WHERE status = 'offen' ORDER BY id")
+            conflicted = {tuple(r) for r in _store.execute(
+                "SELECT DISTINCT mitarbeiter, jahr, monat FROM journal WHERE status = 'konflikt'")}
+        except Exception as e:
+            print(f"Error reading offline journal: {e}")
+            return result
+        if not rows:
+            return result
+        groups = OrderedDict()
+        for row_id, mitarbeiter, year, month, payload, basis in rows:
+            group = groups.setdefault((mitarbeiter, year, month), {"ids": [], "basis": basis})
+            group["ids"].append(row_id)
+            group["entries"] = payload
+        apply = []
+        for key, group in groups.items():
+            if key in conflicted:
+                _set_status(group["ids"], "konflikt", "Ältere Offline-Änderung noch nicht entschieden")
+                result["konflikte"] += 1
+            else:
+                apply.append((key, group))
+        if not apply:
+            return result
+
+        def transfer(batch):
+            """Writes the months whose database state still matches their base, in one transaction."""
+            changed = []
+
+            def unchanged(conn, mitarbeiter, year, month):
+                key = (mitarbeiter, year, month)
+                if _current_fingerprint(conn, *key) == groups[key]["basis"]:
+                    return True
+                changed.append(key)
+                return False
+
+            if not utils.save_month_batch([(*key, _decode(group["entries"])) for key, group in batch], check=unchanged):
+                return False
+            for key, group in batch:
+                if key in changed:
+                    _set_status(group["ids"], "konflikt", "Monat wurde zwischenzeitlich in der Datenbank geändert")
+                    result["konflikte"] += 1
+                else:
+                    _set_status(group["ids"], "uebertragen")
+                    result["uebertragen"] += 1
+            return True
+
+        if not transfer(apply):
+            # One month at a time, so one bad month does not hold back the others
+            for item in apply:
+                if not transfer([item]):
+                    result["fehler"] += 1
+    return result
+
+
+def conflicts():
+    """Journaled months that conflict with a change in the database (CONFLICT_COLUMNS)."""
+    try:
+        rows = _store.execute("""
+            SELECT mitarbeiter, jahr, monat, MAX(erstellt), MAX(meldung) FROM journal
+            WHERE status = 'konflikt' GROUP BY mitarbeiter, jahr, monat ORDER BY mitarbeiter, jahr, monat
+        """)
+        return pd.DataFrame(rows, columns=CONFLICT_COLUMNS)
+    except Exception as e:
+        print(f"Error reading offline journal: {e}")
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+
+
+def resolve(mitarbeiter, year, month, keep_local):
+    """
+    Resolves a conflict: keep_local=True saves the latest journaled version over the database,
+    otherwise the journaled versions are discarded.
+    """
+    try:
+        rows = _store.execute(
+            "SELECT id, eintraege FROM journal WHERE status = 'konflikt' AND mitarbeiter = ? AND jahr = ? AND monat = ? ORDER BY id",
+            (mitarbeiter.strip(), int(year), int(month)),
+        )
+        if not rows:
+            return False
+        ids = [row_id for row_id, _ in rows]
+        if keep_local:
+            if not utils.save_month_entries(mitarbeiter.strip(), int(year), int(month), _decode(rows[-1][1])):
+                return False
+            _set_status(ids, "uebertragen", "Lokale Version übernommen")
+        else:
+            _set_status(ids, "verworfen", "Verworfen")
+        return True
+    except Exception as e:
+        print(f"Error resolving offline conflict: {e}")
+        return False
+
+
+def status():
+    """Connection state and journal counters (for the banner and the debug panel)."""
+    counts = {s: 0 for s in STATUSES}
+    try:
+        for state, count in _store.execute(
+                "SELECT status, COUNT(DISTINCT mitarbeiter || '|' || jahr || '|' || monat) FROM journal GROUP BY status"):
+            counts[state] = count
+    except Exception as e:
+        print(f"Error reading offline journal: {e}")
+    with _lock:
+        return {
+            "online": _online,
+            "offline_seit": _offline_since,
+            "fehler": _last_error,
+            "offen": counts["offen"],
+            "konflikte": counts["konflikt"],
+            "uebertragen": counts["uebertragen"],
+        }
+
+
+def install():
+    """Registers the connection listeners on utils.engine and the snapshot hook. Idempotent."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    event.listen(utils.engine, "handle_error", _on_error)
+    event.listen(utils.engine, "do_connect", _on_connect)
+    event.listen(utils.engine, "checkout", _on_checkout)
+    utils._snapshot_store = _Snapshots()
+    if utils._init_error is not None:
+        mark_offline(utils._init_error)
+    elif status()["offen"]:
+        # Saves journaled by an earlier run
+        threading.Thread(target=replay, name="offline-replay", daemon=True).start()
+
+
+install()
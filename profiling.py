@@ -0,0 +1,227 @@
+"""
+Opt-in per-rerun profiler for app.py.
+
+Each profiled rerun records either sampled call stacks of the script thread (written as
+folded stacks, one "frame;frame;frame count" line per stack, for flamegraph.pl or
+speedscope) or a cProfile dump (.prof, for snakeviz / flameprof), plus the top allocating
+lines from tracemalloc. A JSON file next to it holds duration, peak memory, the top
+allocators and the tags (view, year, employee) set by the app.
+
+Streamlit has no end-of-run hook: a rerun that ends early (st.rerun / st.stop) is finished
+at the start of the session's next rerun and marked as incomplete.
+
+Configuration (environment):
+    PROFILING          1 = profile every rerun, query = only reruns opened with ?profile=1
+    PROFILE_MODE       sample (default, low overhead) or cprofile
+    PROFILE_DIR        output directory (default: profiles)
+    PROFILE_MAX_RUNS   number of profiled reruns kept on disk (default 200)
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+PROFILING = os.getenv("PROFILING", "").lower()
+MODE = os.getenv("PROFILE_MODE", "sample").lower()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_RUNS = int(os.getenv("PROFILE_MAX_RUNS", "200"))
+
+SAMPLE_INTERVAL = 0.005
+# A sampler stops by itself after this long (e.g. if the session never reruns), and the
+# session's tracemalloc tracing is released
+MAX_SAMPLE_SECONDS = 300
+TOP_ALLOCATORS = 25
+
+_STATE_KEY = "_profiling_session"
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_tracing_sessions = 0
+_tracing_lock = threading.Lock()
+
+
+def enabled_for(query_params=None):
+    """True if this rerun should be profiled (PROFILING=1, or PROFILING=query with ?profile=1)."""
+    if PROFILING in ("1", "true", "yes"):
+        return True
+    if PROFILING == "query" and query_params is not None:
+        return str(query_params.get("profile", "")).lower() in ("1", "true", "yes")
+    return False
+
+
+class _Sampler(threading.Thread):
+    """Samples the call stack of one thread at a fixed interval into folded-stack counts."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(name="rerun-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        deadline = time.monotonic() + MAX_SAMPLE_SECONDS
+        while not self._stop_event.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"))
+                frame = frame.f_back
+            stack.reverse()
+            # Drop the Streamlit runner frames above the script
+            start = next((i for i, (filename, _) in enumerate(stack) if os.path.abspath(filename).startswith(_APP_DIR)), 0)
+            self.stacks[";".join(name.replace(";", ",") for _, name in stack[start:])] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Session:
+    """One profiled rerun."""
+
+    def __init__(self, mode=None):
+        global _tracing_sessions
+        self.mode = mode or MODE
+        self.tags = {}
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        with _tracing_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _tracing_sessions += 1
+            tracemalloc.reset_peak()
+        self._tracing = True
+        self._snapshot = tracemalloc.take_snapshot()
+        # A rerun ending in st.stop() or a session that never reruns is not finished
+        self._expiry = threading.Timer(MAX_SAMPLE_SECONDS, self._release_tracing)
+        self._expiry.daemon = True
+        self._expiry.start()
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = _Sampler(threading.get_ident())
+            self._profiler.start()
+
+    def _release_tracing(self):
+        """Ends this session's use of tracemalloc; tracing stops with the last session."""
+        global _tracing_sessions
+        with _tracing_lock:
+            if not self._tracing:
+                return
+            self._tracing = False
+            _tracing_sessions -= 1
+            if _tracing_sessions == 0:
+                tracemalloc.stop()
+
+    def finish(self, completed=True, directory=None):
+        """Stops profiling and writes the output files. Returns the path of the JSON summary."""
+        duration = time.perf_counter() - self._start
+        self._expiry.cancel()
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        allocators, peak = [], 0
+        with _tracing_lock:
+            if self._tracing:
+                allocators = tracemalloc.take_snapshot().compare_to(self._snapshot, 'lineno')[:TOP_ALLOCATORS]
+                peak = tracemalloc.get_traced_memory()[1]
+        self._release_tracing()
+
+        directory = directory or PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, _stem(self.started, self.tags))
+        if self.mode == "cprofile":
+            profile_path = stem + ".prof"
+            self._profiler.dump_stats(profile_path)
+        else:
+            profile_path = stem + ".folded"
+            with open(profile_path, "w", encoding="utf-8") as f:
+                for stack, count in self._profiler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        summary = {
+            "start": self.started.isoformat(timespec="milliseconds"),
+            "sekunden": duration,
+            "vollstaendig": completed,
+            "modus": self.mode,
+            "tags": self.tags,
+            "profil": os.path.basename(profile_path),
+            "speicher_peak_kb": peak / 1024,
+            "top_allokationen": [
+                {
+                    "zeile": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "kb": stat.size_diff / 1024,
+                    "anzahl": stat.count_diff,
+                }
+                for stat in allocators if stat.size_diff > 0
+            ],
+        }
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False, default=str)
+        _prune(directory)
+        return stem + ".json"
+
+
+def _stem(started, tags):
+    parts = [started.strftime("%Y%m%d-%H%M%S-%f")] + [str(v) for v in tags.values() if v is not None]
+    return "_".join(parts).replace(" ", "_").replace("/", "-")
+
+
+def _prune(directory):
+    """Keeps the files of the newest MAX_RUNS profiled reruns."""
+    summaries = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    for name in summaries[:max(len(summaries) - MAX_RUNS, 0)]:
+        stem = name[:-len(".json")]
+        for ext in (".json", ".folded", ".prof"):
+            path = os.path.join(directory, stem + ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def start(state, query_params=None):
+    """
+    Starts profiling the current rerun if enabled; state is a per-session mapping
+    (st.session_state) that holds the running session. An unfinished session of the
+    previous rerun is written first.
+    """
+    previous = state.get(_STATE_KEY)
+    if previous is not None:
+        state[_STATE_KEY] = None
+        try:
+            previous.finish(completed=False)
+        except Exception as e:
+            print(f"Error writing profile: {e}")
+    if not enabled_for(query_params):
+        return None
+    session = Session()
+    state[_STATE_KEY] = session
+    return session
+
+
+def tag(state, **tags):
+    """Adds tags (e.g. view, year, employee) to the running session, if any."""
+    session = state.get(_STATE_KEY)
+    if session is not None:
+        session.tags.update(tags)
+
+
+def finish(state):
+    """Finishes the running session, if any, and returns the path of its JSON summary."""
+    session = state.get(_STATE_KEY)
+    if session is None:
+        return None
+    state[_STATE_KEY] = None
+    try:
+        return session.finish()
+    except Exception as e:
+        print(f"Error writing profile: {e}")
+        return None
@@ -0,0 +1,82 @@
+"""
+Search over entry descriptions (beschreibung), evaluated entirely in Postgres.
+
+Words are matched with German full-text search (stemming and websearch syntax such as
+kunde -intern or "exakte phrase"), and, where pg_trgm is installed, as a
+case-insensitive substring via the trigram index. Both are backed by GIN indexes
+(see utils.init_db); only the requested page is fetched.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+import utils
+
+PAGE_SIZE = 50
+
+RESULT_COLUMNS = ['id', 'datum', 'mitarbeiter', 'projekt', 'stunden', 'typ', 'beschreibung']
+
+
+# Result of the pg_trgm lookup; stays None until a lookup succeeded
+_trigram = None
+
+
+def has_trigram():
+    """True if the pg_trgm extension is installed (False while the lookup fails, which is retried)."""
+    global _trigram
+    if _trigram is None:
+        try:
+            with utils.read_engine().connect() as conn:
+                _trigram = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).fetchone() is not None
+        except Exception:
+            return False
+    return _trigram
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_entries(query, employee=None, project=None, start=None, end=None, page=1, page_size=PAGE_SIZE):
+    """
+    Returns (DataFrame with RESULT_COLUMNS, total number of matches) for one page of results,
+    newest first. start / end are inclusive dates; page starts at 1.
+    """
+    query = (query or "").strip()
+    if not query:
+        return pd.DataFrame(columns=RESULT_COLUMNS), 0
+
+    match = "to_tsvector('german', COALESCE(beschreibung, '')) @@ websearch_to_tsquery('german', :query)"
+    params = {"query": query, "limit": int(page_size), "offset": (max(int(page), 1) - 1) * int(page_size)}
+    if has_trigram():
+        match = f"({match} OR beschreibung ILIKE :pattern)"
+        params["pattern"] = f"%{_escape_like(query)}%"
+
+    conditions = [match]
+    if employee:
+        conditions.append("mitarbeiter = :employee")
+        params["employee"] = employee
+    if project:
+        conditions.append("projekt = :project")
+        params["project"] = project
+    if start:
+        conditions.append("datum >= :start")
+        params["start"] = start
+    if end:
+        conditions.append("datum <= :end")
+        params["end"] = end
+
+    sql = f"""
+        SELECT id, datum, mitarbeiter, projekt, stunden, typ, beschreibung,
+               COUNT(*) OVER () AS total
+        FROM entries
+        WHERE {' AND '.join(conditions)}
+        ORDER BY datum DESC, id DESC
+        LIMIT :limit OFFSET :offset
+    """
+    try:
+        df = pd.read_sql(text(sql), utils.read_engine(), params=params)
+    except Exception as e:
+        print(f"Error searching entries: {e}")
+        return pd.DataFrame(columns=RESULT_COLUMNS), 0
+    total = int(df['total'].iat[0]) if not df.empty else 0
+    return df[RESULT_COLUMNS], total
@@ -0,0 +1,317 @@
+"""
+Slow-query log for utils.engine.
+
+Every statement slower than the threshold is logged with its duration, parameters and the
+calling function (innermost frame of one of the app modules, e.g. utils.get_holidays_df).
+Entries go to the slow_queries table, or as JSON lines to a rotating file when
+SLOW_QUERY_LOG_FILE is set. EXPLAIN (ANALYZE, BUFFERS) plans are captured on demand from the
+Einstellungen tab (statements that modify data are explained in a rolled-back transaction),
+or automatically for slow SELECTs with SLOW_QUERY_EXPLAIN=1. Entries and automatic plans
+are written by a background thread, so a slow statement never costs its caller a second
+connection. Locking reads (SELECT ... FOR
+UPDATE / SHARE) are only explained on demand: EXPLAIN ANALYZE would take their row locks
+again while the logging transaction may still hold them.
+
+Configuration (environment):
+    SLOW_QUERY_MS          threshold in milliseconds (default 500, 0 disables the log)
+    SLOW_QUERY_LOG_FILE    log to this rotating file instead of the table
+    SLOW_QUERY_EXPLAIN     1 = capture plans of slow SELECTs immediately
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+from sqlalchemy import event, text
+
+import db_pool
+import utils
+
+DEFAULT_THRESHOLD_MS = 500.0
+
+LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE")
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+AUTO_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "").lower() in ("1", "true", "yes")
+
+# Rows kept in the slow_queries table (older ones are pruned on insert)
+MAX_LOG_ROWS = 10000
+
+# Stored parameter text is cut to this length
+MAX_PARAMETER_LENGTH = 4000
+
+# Row-locking clauses; EXPLAIN ANALYZE would acquire these locks again
+_LOCKING_CLAUSE = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|KEY\s+SHARE|UPDATE|SHARE)\b", re.IGNORECASE)
+
+LOG_COLUMNS = ['id', 'zeitpunkt', 'dauer_ms', 'funktion', 'statement', 'parameter', 'plan']
+OFFENDER_COLUMNS = ['statement', 'anzahl', 'summe_ms', 'mittel_ms', 'max_ms', 'funktion', 'letzte_id']
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(_APP_DIR, "instrumentation.py")}
+
+_threshold_ms = float(os.getenv("SLOW_QUERY_MS", DEFAULT_THRESHOLD_MS)) or None
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+_logger = None
+# Writes the log entries (and automatic plans) off the thread that ran the statement
+_log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-log")
+
+
+def get_threshold():
+    """Current threshold in milliseconds (None = disabled)."""
+    return _threshold_ms
+
+
+def set_threshold(ms):
+    """Changes the threshold for this process; 0 or None disables the log."""
+    global _threshold_ms
+    _threshold_ms = float(ms) if ms else None
+
+
+def _file_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("hourtracking.slow_queries")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def _caller():
+    """'module.function' of the innermost app frame that issued the statement."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_APP_DIR) and filename not in _SKIP_FILES and frame.f_code.co_name != "<module>":
+            return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _serialize(parameters, executemany):
+    if executemany and isinstance(parameters, (list, tuple)):
+        parameters = {"executemany": len(parameters), "first": list(parameters[:3])}
+    try:
+        value = json.dumps(parameters, default=str, ensure_ascii=False)
+    except (TypeError, ValueError):
+        value = repr(parameters)
+    return value[:MAX_PARAMETER_LENGTH]
+
+
+def _explain_sql(conn, statement, parameters):
+    """Runs EXPLAIN (ANALYZE, BUFFERS); modifying statements are rolled back."""
+    trans = conn.begin()
+    try:
+        rows = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters or {}).fetchall()
+    finally:
+        trans.rollback()
+    return "\n".join(row[0] for row in rows)
+
+
+def _is_select(statement):
+    """True for plain reads; locking reads (FOR UPDATE / SHARE ...) are left to explain()."""
+    return statement.lstrip().upper().startswith(("SELECT", "WITH")) and not _LOCKING_CLAUSE.search(statement)
+
+
+def _write(entry):
+    if LOG_FILE:
+        entry["id"] = time.time_ns()
+        _file_logger().info(json.dumps(entry, default=str, ensure_ascii=False))
+        return
+    with utils.engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO slow_queries (zeitpunkt, dauer_ms, funktion, statement, parameter, plan)
+            VALUES (:zeitpunkt, :dauer_ms, :funktion, :statement, :parameter, :plan)
+        """), entry)
+        conn.execute(text("DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - :keep"), {"keep": MAX_LOG_ROWS})
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+def flush():
+    """Waits until all entries logged so far are written."""
+    _log_executor.submit(lambda: None).result()
+
+
+def _log(entry, parameters, explain):
+    _local.busy = True  # the log's own statements are never logged
+    try:
+        if explain:
+            try:
+                with utils.engine.connect() as explain_conn:
+                    entry["plan"] = _explain_sql(explain_conn, entry["statement"], parameters)
+            except Exception as e:
+                print(f"Error explaining slow query: {e}")
+        _write(entry)
+    except Exception as e:
+        print(f"Error logging slow query: {e}")
+    finally:
+        _local.busy = False
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+    if _threshold_ms is None or duration_ms < _threshold_ms or getattr(_local, "busy", False):
+        return
+    try:
+        entry = {
+            "zeitpunkt": datetime.now(),
+            "dauer_ms": duration_ms,
+            "funktion": _caller(),
+            "statement": statement,
+            "parameter": _serialize(parameters, executemany),
+            "plan": None,
+        }
+    except Exception as e:
+        print(f"Error logging slow query: {e}")
+        return
+    explain = AUTO_EXPLAIN and not executemany and _is_select(statement)
+    # Written in the background: the request thread (or event loop) never waits for a second connection
+    _log_executor.submit(_log, entry, parameters, explain)
+
+
+def _listen(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def install(engine=None):
+    """Registers the event listeners on the given engine, or on every engine of db_pool (idempotent)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        if engine is not None:
+            _listen(engine)
+        else:
+            db_pool.add_engine_hook(_listen)
+        _installed = True
+
+
+def _read_file():
+    paths = [f"{LOG_FILE}.{i}" for i in range(LOG_FILE_BACKUPS, 0, -1)] + [LOG_FILE]
+    rows = []
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                rows.extend(json.loads(line) for line in f if line.strip())
+    df = pd.DataFrame(rows, columns=LOG_COLUMNS)
+    df['zeitpunkt'] = pd.to_datetime(df['zeitpunkt'])
+    return df
+
+
+def get_log(limit=200):
+    """The most recent slow statements (LOG_COLUMNS), newest first."""
+    try:
+        flush()
+        if LOG_FILE:
+            return _read_file().sort_values('id', ascending=False).head(limit).reset_index(drop=True)
+        return pd.read_sql(
+            text(f"SELECT {', '.join(LOG_COLUMNS)} FROM slow_queries ORDER BY id DESC LIMIT :limit"),
+            utils.engine, params={"limit": int(limit)}
+        )
+    except Exception as e:
+        print(f"Error loading slow-query log: {e}")
+        return pd.DataFrame(columns=LOG_COLUMNS)
+
+
+def top_offenders(limit=20):
+    """Logged statements grouped by text, by total time (OFFENDER_COLUMNS)."""
+    try:
+        flush()
+        if LOG_FILE:
+            df = _read_file().sort_values('id')
+            if df.empty:
+                return pd.DataFrame(columns=OFFENDER_COLUMNS)
+            grouped = df.groupby('statement').agg(
+                anzahl=('id', 'size'), summe_ms=('dauer_ms', 'sum'), mittel_ms=('dauer_ms', 'mean'),
+                max_ms=('dauer_ms', 'max'), funktion=('funktion', 'last'), letzte_id=('id', 'last'),
+            ).reset_index()
+            return grouped.sort_values('summe_ms', ascending=False).head(limit)[OFFENDER_COLUMNS].reset_index(drop=True)
+        return pd.read_sql(text("""
+            SELECT statement,
+                   COUNT(*) AS anzahl,
+                   SUM(dauer_ms) AS summe_ms,
+                   AVG(dauer_ms) AS mittel_ms,
+                   MAX(dauer_ms) AS max_ms,
+                   (ARRAY_AGG(funktion ORDER BY id DESC))[1] AS funktion,
+                   MAX(id) AS letzte_id
+            FROM slow_queries
+            GROUP BY statement
+            ORDER BY summe_ms DESC
+            LIMIT :limit
+        """), utils.engine, params={"limit": int(limit)})
+    except Exception as e:
+        print(f"Error loading slow-query offenders: {e}")
+        return pd.DataFrame(columns=OFFENDER_COLUMNS)
+
+
+def explain(entry_id):
+    """
+    Captures the EXPLAIN (ANALYZE, BUFFERS) plan of a logged statement with its logged
+    parameters, stores it with the entry (table log only) and returns it (None on error).
+    """
+    _local.busy = True
+    try:
+        flush()
+        if LOG_FILE:
+            df = _read_file()
+            match = df[df['id'] == entry_id]
+            if match.empty:
+                return None
+            statement, parameter = match['statement'].iat[0], match['parameter'].iat[0]
+        else:
+            with utils.engine.connect() as conn:
+                row = conn.execute(text("SELECT statement, parameter FROM slow_queries WHERE id = :id"), {"id": int(entry_id)}).fetchone()
+            if row is None:
+                return None
+            statement, parameter = row
+        parameters = json.loads(parameter) if parameter else {}
+        if isinstance(parameters, dict) and "executemany" in parameters:
+            parameters = parameters["first"][0] if parameters["first"] else {}
+        with utils.engine.connect() as conn:
+            plan = _explain_sql(conn, statement, parameters)
+        if not LOG_FILE:
+            with utils.engine.begin() as conn:
+                conn.execute(text("UPDATE slow_queries SET plan = :plan WHERE id = :id"), {"plan": plan, "id": int(entry_id)})
+        return plan
+    except Exception as e:
+        print(f"Error explaining query: {e}")
+        return None
+    finally:
+        _local.busy = False
+
+
+def clear_log():
+    """Deletes all logged statements."""
+    try:
+        flush()
+        if LOG_FILE:
+            for path in [LOG_FILE] + [f"{LOG_FILE}.{i}" for i in range(1, LOG_FILE_BACKUPS + 1)]:
+                if os.path.exists(path):
+                    open(path, "w").close()
+        else:
+            with utils.engine.begin() as conn:
+                conn.execute(text("DELETE FROM slow_queries"))
+        return True
+    except Exception as e:
+        print(f"Error clearing slow-query log: {e}")
+        return False
+
+
+install()
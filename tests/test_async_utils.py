@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import utils
+from sqlalchemy import event
+import async_utils
+
+def test_async_readers():
+    print("Testing Async Readers...")
+    emp = "Async User"
+
+    async def scenario():
+        utils.clear_cache()
+        view = await async_utils.load_view()
+        assert set(view) == {"employees", "projects", "regions", "daily_hours", "holidays", "vacation_days", "entries", "assignments"}
+        assert view["employees"] == utils.get_employees()
+        assert len(view["entries"]) == len(utils.load_data())
+        assert utils.read_engine() in (utils.engine, utils.replica_engine)  # the engine swap stays inside the reader
+
+        # Writes run in a worker thread and invalidate the shared caches
+        assert await async_utils.save_employee(emp)
+        assert emp in await async_utils.get_employees()
+        assert await async_utils.get_assigned_projects(emp) == []
+        assert await async_utils.remove_employee(emp)
+        assert emp not in await async_utils.get_employees()
+
+        try:
+            async_utils.run(async_utils.get_employees())
+            assert False, "run() inside an event loop must fail"
+        except RuntimeError:
+            pass
+        await async_utils.dispose()
+
+    asyncio.run(scenario())
+    print("Async Readers: OK")
+
+def test_prefetch():
+    print("Testing Sync Prefetch...")
+    utils.clear_cache()
+    view = async_utils.prefetch()
+    assert "assignments" not in view
+    hits = utils.load_data.cache_info().hits
+    assert len(utils.load_data()) == len(view["entries"])
+    assert utils.load_data.cache_info().hits == hits + 1
+    assert async_utils.run(async_utils.get_projects()) == utils.get_projects()
+    print("Prefetch: OK")
+
+def test_no_sync_io_on_loop():
+    print("Testing Event Loop Thread...")
+    loop_threads = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread().name == "async-utils":
+            loop_threads.append(statement)
+
+    event.listen(utils.engine, "before_cursor_execute", on_execute)
+    try:
+        utils.clear_cache()
+        async_utils.prefetch()
+    finally:
+        event.remove(utils.engine, "before_cursor_execute", on_execute)
+    assert loop_threads == [], loop_threads
+    print("No Sync I/O: OK")
+
+if __name__ == "__main__":
+    test_async_readers()
+    test_prefetch()
+    test_no_sync_io_on_loop()
@@ -0,0 +1,61 @@
+import utils
+import availability
+from availability import AVAILABLE, WEEKEND, HOLIDAY, COMPANY_VACATION, VACATION, SICK
+from datetime import date
+
+def test_availability_grid():
+    print("Testing Availability Grid...")
+
+    emp = "Availability User"
+    utils.save_employee(emp)
+    utils.add_project("Availability Proj")
+    utils.save_holiday(date(2040, 3, 1), "Testfeiertag")
+    utils.save_vacation_day(date(2040, 3, 2), "Brückentag")
+
+    utils.save_month_entries(emp, 2040, 3, [
+        {"datum": date(2040, 3, 5), "mitarbeiter": emp, "projekt": "Availability Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"},
+        {"datum": date(2040, 3, 6), "mitarbeiter": emp, "projekt": "Availability Proj", "stunden": 0.0, "beschreibung": "", "typ": "KK"},
+        # Two codes on one day: sick wins
+        {"datum": date(2040, 3, 7), "mitarbeiter": emp, "projekt": "Availability Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"},
+        {"datum": date(2040, 3, 7), "mitarbeiter": emp, "projekt": "Availability Proj", "stunden": 0.0, "beschreibung": "", "typ": "KK"},
+        {"datum": date(2040, 3, 8), "mitarbeiter": emp, "projekt": "Availability Proj", "stunden": 8.0, "beschreibung": "", "typ": "Arbeit"},
+    ])
+
+    start, end = availability.period(2040, quarter=1)
+    assert (start, end) == (date(2040, 1, 1), date(2040, 3, 31))
+    grid = availability.get_availability(start, end)
+    assert grid.shape[1] == 91
+    row = grid.loc[emp]
+    assert row[date(2040, 3, 1)] == HOLIDAY
+    assert row[date(2040, 3, 2)] == COMPANY_VACATION
+    assert row[date(2040, 3, 3)] == WEEKEND  # Saturday
+    assert row[date(2040, 3, 5)] == VACATION
+    assert row[date(2040, 3, 6)] == SICK
+    assert row[date(2040, 3, 7)] == SICK
+    assert row[date(2040, 3, 8)] == AVAILABLE
+    print("Status Grid: OK")
+
+    labels = availability.label_grid(grid, availability.STATUS_LABELS)
+    assert labels.shape == grid.shape
+    assert labels[list(grid.index).index(emp), 64] == "U"  # 5 March (leap year)
+    print("Labels: OK")
+
+    # Cached until a month of the period changes
+    cached = availability._grids[(start, end)]
+    availability.get_availability(start, end)
+    assert availability._grids[(start, end)] is cached
+    utils.save_month_entries(emp, 2040, 5, [])
+    availability.get_availability(start, end)
+    assert availability._grids[(start, end)] is cached
+    utils.save_month_entries(emp, 2040, 3, [])
+    grid = availability.get_availability(start, end)
+    assert availability._grids[(start, end)] is not cached
+    assert grid.loc[emp, date(2040, 3, 5)] == AVAILABLE
+    print("Cache Invalidation: OK")
+
+    utils.delete_holiday(date(2040, 3, 1))
+    utils.delete_vacation_day(date(2040, 3, 2))
+    print("Availability Grid Test Passed!")
+
+if __name__ == "__main__":
+    test_availability_grid()
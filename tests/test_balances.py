@@ -0,0 +1,105 @@
+import utils
+import balances
+import work_calendar
+from datetime import date
+
+def test_balances():
+    print("Testing Overtime Balances...")
+
+    emp = "Balance User"
+    utils.save_employee(emp)
+    utils.add_project("Balance Proj")
+    utils.set_employee_daily_hours(emp, 6.0)
+
+    # March 2033: absence on a working day, 10 hours of work
+    entries = [
+        {"datum": date(2033, 3, 1), "mitarbeiter": emp, "projekt": "Balance Proj", "stunden": 7.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2033, 3, 2), "mitarbeiter": emp, "projekt": "Balance Proj", "stunden": 3.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2033, 3, 3), "mitarbeiter": emp, "projekt": "Balance Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"},
+    ]
+    utils.save_month_entries(emp, 2033, 3, entries)
+
+    region = utils.get_employee_region(emp)
+    workdays = work_calendar.working_days_in_month(2033, 3, region)
+    row = balances.get_employee_month(emp, 2033, 3)
+    assert row["ist"] == 10.0
+    assert row["soll"] == (workdays - 1) * 6.0
+    assert row["saldo"] == 10.0 - (workdays - 1) * 6.0
+    print("Month Balance: OK")
+
+    # Saving a month patches the cached year instead of reloading it
+    cached = balances._years[2033]
+    entries[0]["stunden"] = 9.0
+    utils.save_month_entries(emp, 2033, 3, entries)
+    assert balances._years[2033] is cached
+    row = balances.get_employee_month(emp, 2033, 3)
+    assert row["ist"] == 12.0
+    print("Incremental Update: OK")
+
+    # Cumulative balance and year-to-date cut-off
+    df = balances.get_balances(2033, today=date(2033, 3, 31))
+    emp_df = df[df["mitarbeiter"] == emp].set_index("monat")
+    jan_feb = work_calendar.working_days(date(2033, 1, 1), date(2033, 2, 28), region) * 6.0
+    assert emp_df.loc[3, "saldo_kumuliert"] == 12.0 - jan_feb - (workdays - 1) * 6.0
+    assert emp_df.loc[4, "soll"] == 0.0
+    print("Cumulative / YTD: OK")
+
+    summary = balances.get_year_summary(2033, today=date(2033, 3, 31))
+    assert summary.set_index("mitarbeiter").loc[emp, "saldo"] == emp_df.loc[3, "saldo_kumuliert"]
+    print("Year Summary: OK")
+
+    print("Overtime Balances Test Passed!")
+
+def test_failing_listener():
+    print("Testing Failing Save Listener...")
+    emp = "Balance User"
+    utils.save_employee(emp)
+    utils.add_project("Balance Proj")
+    notified = []
+
+    def failing(mitarbeiter, year, month):
+        raise RuntimeError("listener failed")
+
+    def recording(mitarbeiter, year, month):
+        notified.append((mitarbeiter, year, month))
+
+    utils.register_month_save_listener(failing)
+    utils.register_month_save_listener(recording)
+    try:
+        entry = {"datum": date(2033, 5, 2), "mitarbeiter": emp, "projekt": "Balance Proj", "stunden": 4.0, "beschreibung": "", "typ": "Arbeit"}
+        assert utils.save_month_entries(emp, 2033, 5, [entry])
+        assert notified == [(emp, 2033, 5)]
+        assert balances.get_employee_month(emp, 2033, 5)["ist"] == 4.0
+    finally:
+        utils._month_save_listeners.remove(failing)
+        utils._month_save_listeners.remove(recording)
+        utils.save_month_entries(emp, 2033, 5, [])
+    print("Failing Listener: OK")
+
+def test_batch_patch():
+    print("Testing Batch Save Patch...")
+    emp = "Balance User"
+    utils.save_employee(emp)
+    utils.add_project("Balance Proj")
+
+    def entry(month, hours):
+        return {"datum": date(2033, month, 2), "mitarbeiter": emp, "projekt": "Balance Proj", "stunden": hours, "beschreibung": "", "typ": "Arbeit"}
+
+    try:
+        balances.get_balances(2033)
+        cached = balances._years[2033]
+        # One batch, one data version bump, one listener call per month: both months are patched
+        assert utils.save_month_batch([(emp, 2033, 6, [entry(6, 3.0)]), (emp, 2033, 7, [entry(7, 5.0)])])
+        assert balances._years.get(2033) is cached
+        assert cached.version == utils.get_data_version()
+        assert balances.get_employee_month(emp, 2033, 6)["ist"] == 3.0
+        assert balances.get_employee_month(emp, 2033, 7)["ist"] == 5.0
+        assert balances._years.get(2033) is cached
+    finally:
+        utils.save_month_batch([(emp, 2033, 6, []), (emp, 2033, 7, [])])
+    print("Batch Patch: OK")
+
+if __name__ == "__main__":
+    test_balances()
+    test_failing_listener()
+    test_batch_patch()
@@ -0,0 +1,54 @@
+import utils
+import benchmark
+from sqlalchemy import text
+
+def test_generator():
+    print("Testing Synthetic Data Generator...")
+
+    a = benchmark.generate(4, 3, 1, seed=7)
+    b = benchmark.generate(4, 3, 1, seed=7)
+    assert a["entries"].equals(b["entries"])
+    assert a["assignments"] == b["assignments"]
+    print("Deterministic: OK")
+
+    entries = a["entries"]
+    assert list(entries.columns) == benchmark.ENTRY_COLUMNS
+    assert set(entries["typ"]) == {"Arbeit", "/", "F", "U", "KK"}
+    assert set(entries["mitarbeiter"]) == set(a["employees"])
+    # Every working day adds up to 8 hours
+    work = entries[entries["typ"] == "Arbeit"]
+    assert (work.groupby(["mitarbeiter", "datum"])["stunden"].sum() == 8.0).all()
+    # Only assigned projects are used
+    for emp, projects in a["assignments"].items():
+        assert set(entries.loc[entries["mitarbeiter"] == emp, "projekt"]) <= set(projects)
+    print("Shape: OK")
+
+    assert benchmark.parse_scale("small") == benchmark.SCALES["small"]
+    assert benchmark.parse_scale("12x4x2") == (12, 4, 2)
+    print("Scales: OK")
+
+def test_run_and_compare():
+    print("Testing Benchmark Run...")
+
+    result = benchmark.run_scale(2, 2, 1, repeat=1)
+    assert set(result["timings"]) == set(benchmark.OPERATIONS)
+    assert all(t["min"] > 0 for t in result["timings"].values())
+    with utils.engine.connect() as conn:
+        left = conn.execute(text("SELECT COUNT(*) FROM entries WHERE mitarbeiter LIKE :p"), {"p": benchmark.BENCH_PREFIX + "%"}).scalar()
+    assert left == 0
+    print("Run and Cleanup: OK")
+
+    results = {"scales": {"tiny": result}}
+    baseline = {"scales": {"tiny": {"timings": {
+        "load_data": {"median": result["timings"]["load_data"]["median"] / 2},
+        "holidays": {"median": result["timings"]["holidays"]["median"] * 2},
+    }}}}
+    comparison = benchmark.compare(results, baseline, threshold=1.25).set_index("operation")
+    assert list(comparison.index) == ["load_data", "holidays"]
+    assert comparison.at["load_data", "regression"]
+    assert not comparison.at["holidays", "regression"]
+    print("Baseline Comparison: OK")
+
+if __name__ == "__main__":
+    test_generator()
+    test_run_and_compare()
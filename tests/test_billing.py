@@ -0,0 +1,73 @@
+import utils
+import billing
+import export
+import io
+import csv
+import pandas as pd
+from datetime import date
+
+def test_apply_rates():
+    print("Testing Rate Resolution...")
+
+    hours = pd.DataFrame({
+        "jahr": [2026] * 5,
+        "monat": [1, 6, 6, 6, 9],
+        "mitarbeiter": ["Anna", "Anna", "Anna", "Ben", "Ben"],
+        "projekt": ["P1", "P1", "P2", "P2", "P2"],
+        "stunden": [10.0, 10.0, 10.0, 10.0, 10.0],
+    })
+    rates = pd.DataFrame([
+        # company default, raised in May
+        {"id": 1, "mitarbeiter": None, "projekt": None, "gueltig_ab": date(2020, 1, 1), "gueltig_bis": None, "satz": 50.0},
+        {"id": 2, "mitarbeiter": None, "projekt": None, "gueltig_ab": date(2026, 5, 1), "gueltig_bis": None, "satz": 60.0},
+        # project rate
+        {"id": 3, "mitarbeiter": None, "projekt": "P1", "gueltig_ab": date(2026, 1, 1), "gueltig_bis": None, "satz": 80.0},
+        # employee + project, but only for June-July
+        {"id": 4, "mitarbeiter": "Ben", "projekt": "P2", "gueltig_ab": date(2026, 6, 1), "gueltig_bis": date(2026, 7, 1), "satz": 100.0},
+    ])
+    result = billing.apply_rates(hours, rates)
+    assert result["satz"].tolist() == [80.0, 80.0, 60.0, 100.0, 60.0]
+    assert result["betrag"].tolist() == [800.0, 800.0, 600.0, 1000.0, 600.0]
+    print("Rate Resolution: OK")
+
+    # No applicable rate -> NaN
+    result = billing.apply_rates(hours, rates[rates["id"] == 4])
+    assert result["satz"].isna().sum() == 4
+    print("Missing Rates: OK")
+
+def test_costs_and_export():
+    print("Testing Costs and Export...")
+
+    emp = "Billing User"
+    proj = "Billing Proj"
+    utils.save_employee(emp)
+    utils.add_project(proj)
+    for rate in utils.get_rates().itertuples():
+        if rate.mitarbeiter == emp:
+            utils.delete_rate(rate.id)
+    utils.save_rate(emp, None, date(2038, 1, 15), 70)
+    utils.save_rate(emp, None, date(2038, 3, 1), 90)
+
+    for month, hours in [(2, 10.0), (3, 5.0)]:
+        utils.save_month_entries(emp, 2038, month, [
+            {"datum": date(2038, month, 2), "mitarbeiter": emp, "projekt": proj, "stunden": hours, "beschreibung": "", "typ": "Arbeit"},
+        ])
+
+    costs = billing.get_costs(2038, employee=emp).set_index("monat")
+    assert costs.loc[2, "betrag"] == 700.0
+    assert costs.loc[3, "betrag"] == 450.0
+    print("Costs: OK")
+
+    out = io.BytesIO()
+    count = export.write_csv(out, "costs", year=2038, employee=emp)
+    rows = list(csv.reader(io.StringIO(out.getvalue().decode("utf-8"))))
+    assert count == 2
+    assert rows[0] == export.COST_COLUMNS
+    assert rows[1] == ["2038", "2", emp, proj, "10.0", "70.0", "700.0"]
+    print("Cost Export: OK")
+
+    print("Billing Test Passed!")
+
+if __name__ == "__main__":
+    test_apply_rates()
+    test_costs_and_export()
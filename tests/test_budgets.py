@@ -0,0 +1,68 @@
+import utils
+import budgets
+from datetime import date
+
+def test_project_budgets():
+    print("Testing Project Budgets...")
+
+    emp = "Budget User"
+    proj = "Budget Proj"
+    utils.save_employee(emp)
+    utils.add_project(proj)
+    utils.add_project("Budget Other")
+    utils.set_project_budget(proj, 100)
+    utils.set_monthly_budgets(proj, 2037, {1: 20, 2: 20, 3: 0, 4: float("nan")})  # NaN = cleared editor cell
+    utils.save_month_entries(emp, 2037, 3, [])
+
+    entries = [
+        {"datum": date(2037, 1, 5), "mitarbeiter": emp, "projekt": proj, "stunden": 8.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2037, 1, 6), "mitarbeiter": emp, "projekt": proj, "stunden": 7.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2037, 1, 7), "mitarbeiter": emp, "projekt": proj, "stunden": 0.0, "beschreibung": "", "typ": "U"},
+    ]
+    utils.save_month_entries(emp, 2037, 1, entries)
+    utils.save_month_entries(emp, 2037, 2, [
+        {"datum": date(2037, 2, 2), "mitarbeiter": emp, "projekt": proj, "stunden": 15.0, "beschreibung": "", "typ": "Arbeit"},
+    ])
+
+    # 1. Overview for all projects in one query
+    overview = budgets.get_budget_overview(2037).set_index("projekt")
+    row = overview.loc[proj]
+    assert row["budget"] == 100 and row["plan_jahr"] == 40 and row["ist_jahr"] == 30
+    assert row["verbrauch_jahr"] == 75
+    assert row["rest"] == 100 - row["ist_gesamt"]
+    print("Overview: OK")
+
+    # 2. Burn-down, cached per project
+    budget, df = budgets.get_burndown(proj)
+    assert budget == 100
+    df_2037 = df[df["monat"].map(lambda d: d.year) == 2037].set_index("monat")
+    assert df_2037.loc[date(2037, 1, 1), "ist"] == 15
+    assert df_2037.loc[date(2037, 2, 1), "plan"] == 20
+    cached = budgets._burndowns[proj]
+    utils.save_entry(date(2037, 3, 1), emp, "Budget Other", 1.0, "", "Arbeit")
+    budgets.get_burndown(proj)
+    assert budgets._burndowns[proj] is cached
+    print("Burn-down Cache: OK")
+
+    # Changing this project's entries rebuilds it
+    utils.save_month_entries(emp, 2037, 3, [
+        {"datum": date(2037, 3, 2), "mitarbeiter": emp, "projekt": proj, "stunden": 30.0, "beschreibung": "", "typ": "Arbeit"},
+    ])
+    _, df = budgets.get_burndown(proj)
+    assert budgets._burndowns[proj] is not cached
+    assert df.set_index("monat").loc[date(2037, 3, 1), "ist"] == 30
+    print("Invalidation by Project: OK")
+
+    # 3. Forecast: last 3 months burned 15 + 15 + 30 = 60 -> 20 / month
+    forecast = budgets.get_forecast(proj, today=date(2037, 4, 15))
+    assert forecast["run_rate"] == 20
+    rest = 100 - forecast["ist"]
+    assert forecast["rest"] == rest
+    if rest > 0:
+        assert forecast["erschoepft_am"] >= date(2037, 4, 1)
+    print("Forecast: OK")
+
+    print("Project Budgets Test Passed!")
+
+if __name__ == "__main__":
+    test_project_budgets()
@@ -0,0 +1,69 @@
+import utils
+import compliance
+from datetime import date
+
+def test_compliance_scan():
+    print("Testing Compliance Scanner...")
+
+    emp = "Compliance User"
+    utils.save_employee(emp)
+    utils.add_project("Compliance Proj")
+    utils.add_project("Foreign Proj")
+    utils.update_assigned_projects(emp, ["Compliance Proj"])
+    utils.save_holiday(date(2036, 5, 1), "Tag der Arbeit")
+    utils.save_vacation_day(date(2036, 5, 7), "Betriebsurlaub")
+
+    entries = [
+        # 11 hours on one day
+        {"datum": date(2036, 5, 4), "mitarbeiter": emp, "projekt": "Compliance Proj", "stunden": 11.0, "beschreibung": "", "typ": "Arbeit"},
+        # 9.5 hours: break check
+        {"datum": date(2036, 5, 5), "mitarbeiter": emp, "projekt": "Compliance Proj", "stunden": 9.5, "beschreibung": "", "typ": "Arbeit"},
+        # Work on a holiday and on a company vacation day
+        {"datum": date(2036, 5, 1), "mitarbeiter": emp, "projekt": "Compliance Proj", "stunden": 2.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2036, 5, 7), "mitarbeiter": emp, "projekt": "Compliance Proj", "stunden": 3.0, "beschreibung": "", "typ": "Arbeit"},
+        # Duplicate (datum, projekt)
+        {"datum": date(2036, 5, 6), "mitarbeiter": emp, "projekt": "Compliance Proj", "stunden": 1.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2036, 5, 6), "mitarbeiter": emp, "projekt": "Compliance Proj", "stunden": 2.0, "beschreibung": "", "typ": "Arbeit"},
+        # Unassigned project
+        {"datum": date(2036, 5, 8), "mitarbeiter": emp, "projekt": "Foreign Proj", "stunden": 4.0, "beschreibung": "", "typ": "Arbeit"},
+    ]
+    utils.save_month_entries(emp, 2036, 5, entries)
+
+    # The month save already rescanned the month
+    findings = compliance.get_findings(2036)
+    found = set(zip(findings["datum"], findings["regel"]))
+    assert (date(2036, 5, 4), "max_stunden") in found
+    assert (date(2036, 5, 5), "pause") in found
+    assert (date(2036, 5, 1), "feiertag") in found
+    assert (date(2036, 5, 7), "betriebsurlaub") in found
+    assert (date(2036, 5, 6), "duplikat") in found
+    assert (date(2036, 5, 8), "nicht_zugewiesen") in found
+    assert len(findings[findings["mitarbeiter"] == emp]) == 6
+    print("Month Save Scan: OK")
+
+    # Incremental scan: nothing changed after a full scan
+    compliance.scan(full=True)
+    scanned, _ = compliance.scan()
+    assert scanned == 0
+    print("Incremental No-op: OK")
+
+    # Fixing the month is picked up by the incremental scan
+    utils.save_entry(date(2036, 6, 2), emp, "Compliance Proj", 12.0, "", "Arbeit")
+    scanned, _ = compliance.scan()
+    assert scanned == 1
+    findings = compliance.get_findings(2036)
+    assert (date(2036, 6, 2), "max_stunden") in set(zip(findings["datum"], findings["regel"]))
+    print("Incremental Rescan: OK")
+
+    utils.save_month_entries(emp, 2036, 6, [])
+    utils.save_month_entries(emp, 2036, 5, [])
+    utils.delete_holiday(date(2036, 5, 1))
+    utils.delete_vacation_day(date(2036, 5, 7))
+    compliance.scan()
+    assert compliance.get_findings(2036).query("mitarbeiter == @emp").empty
+    print("Cleanup: OK")
+
+    print("Compliance Scanner Test Passed!")
+
+if __name__ == "__main__":
+    test_compliance_scan()
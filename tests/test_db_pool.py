@@ -0,0 +1,79 @@
+import threading
+import time
+import utils
+import db_pool
+import instrumentation
+from sqlalchemy import text
+
+def test_modes():
+    print("Testing Pooler Modes...")
+    assert db_pool.detect_mode("postgresql://u:p@aws-0-eu-central-1.pooler.supabase.com:6543/postgres") == "transaction"
+    assert db_pool.detect_mode("postgresql://u:p@aws-0-eu-central-1.pooler.supabase.com:5432/postgres") == "session"
+    assert db_pool.detect_mode("postgresql://u:p@localhost/db?pgbouncer=true") == "transaction"
+    assert db_pool._connect_args("postgresql+psycopg://u:p@h:6543/db", "transaction")["prepare_threshold"] is None
+    assert db_pool._connect_args("postgresql+asyncpg://u:p@h:6543/db", "transaction")["statement_cache_size"] == 0
+    assert "prepare_threshold" not in db_pool._connect_args("postgresql+psycopg://u:p@h/db", "session")
+    engine = db_pool.create_pooled_engine(utils.DB_URL + ("&" if "?" in utils.DB_URL else "?") + "pgbouncer=true", pool_size=1)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    assert db_pool.pool_metrics(engine)["modus"] == "transaction"
+    engine.dispose()
+    print("Modes: OK")
+
+def test_pool_metrics():
+    print("Testing Pool Metrics...")
+    assert db_pool.pool_metrics(utils.engine)["groesse"] == db_pool.POOL_SIZE
+    assert 'hourtracking_db_pool_checkouts_total{mode="session"}' in instrumentation.prometheus_text()
+
+    engine = db_pool.create_pooled_engine(utils.DB_URL, pool_size=1, max_overflow=0, pool_timeout=5, pre_ping="off")
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            holding.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait()
+    assert db_pool.pool_metrics(engine)["ausgeliehen"] == 1
+    threading.Timer(0.3, release.set).start()
+    with engine.connect() as conn:  # waits until the other thread returns its connection
+        conn.execute(text("SELECT 1"))
+    thread.join()
+
+    metrics = db_pool.pool_metrics(engine)
+    assert metrics["checkouts"] == 2 and metrics["ausgeliehen"] == 0
+    assert metrics["wartezeit_max_s"] >= 0.2
+    db_pool.reset_metrics(engine)
+    assert db_pool.pool_metrics(engine)["checkouts"] == 0
+    engine.dispose()
+    print("Metrics: OK")
+
+def test_idle_ping():
+    print("Testing Idle Ping...")
+    previous = db_pool.PING_IDLE_SECONDS
+    db_pool.PING_IDLE_SECONDS = 0.05
+    try:
+        engine = db_pool.create_pooled_engine(utils.DB_URL, pool_size=1, max_overflow=0, pre_ping="idle")
+    finally:
+        db_pool.PING_IDLE_SECONDS = previous
+    with engine.connect() as conn:
+        pid = conn.execute(text("SELECT pg_backend_pid()")).scalar()
+    # Kill the pooled connection behind the pool's back
+    with utils.engine.connect() as conn:
+        conn.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": pid})
+    time.sleep(0.1)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT pg_backend_pid()")).scalar() != pid
+    metrics = db_pool.pool_metrics(engine)
+    assert metrics["pings"] >= 1 and metrics["ping_fehler"] == 1
+    engine.dispose()
+    print("Idle Ping: OK")
+
+if __name__ == "__main__":
+    test_modes()
+    test_pool_metrics()
+    test_idle_ping()
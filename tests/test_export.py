@@ -0,0 +1,49 @@
+import utils
+import export
+import io
+import csv
+from datetime import date
+
+def test_streaming_export():
+    print("Testing Streaming Export...")
+
+    emp = "Export User"
+    utils.save_employee(emp)
+    utils.add_project("Export Proj")
+
+    entries = [
+        {"datum": date(2025, 3, 3), "mitarbeiter": emp, "projekt": "Export Proj", "stunden": 6.0, "beschreibung": "A", "typ": "Arbeit"},
+        {"datum": date(2025, 3, 4), "mitarbeiter": emp, "projekt": "Export Proj", "stunden": 2.5, "beschreibung": "B", "typ": "Arbeit"},
+        {"datum": date(2025, 3, 5), "mitarbeiter": emp, "projekt": "Export Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"},
+    ]
+    utils.save_month_entries(emp, 2025, 3, entries)
+
+    # 1. Entries as CSV, small chunks to force several server-side fetches
+    out = io.BytesIO()
+    count = export.write_csv(out, 'entries', year=2025, employee=emp, chunk_size=1)
+    assert count == 3
+    rows = list(csv.reader(io.StringIO(out.getvalue().decode('utf-8'))))
+    assert rows[0] == export.ENTRY_COLUMNS
+    assert len(rows) == 4
+    print("CSV Entries: OK")
+
+    # 2. Aggregates only sum work hours
+    out = io.BytesIO()
+    count = export.write_csv(out, 'aggregates', year=2025, employee=emp)
+    rows = list(csv.reader(io.StringIO(out.getvalue().decode('utf-8'))))
+    assert count == 1
+    assert rows[1] == ['2025', '3', emp, 'Export Proj', '8.5']
+    print("CSV Aggregates: OK")
+
+    # 3. Parquet
+    import pyarrow.parquet as pq
+    f = export.export_file('parquet', 'entries', year=2025, employee=emp)
+    table = pq.read_table(f)
+    assert table.num_rows == 3
+    assert table.column_names == export.ENTRY_COLUMNS
+    print("Parquet Entries: OK")
+
+    print("Streaming Export Test Passed!")
+
+if __name__ == "__main__":
+    test_streaming_export()
@@ -0,0 +1,46 @@
+import utils
+import work_calendar
+from datetime import date
+
+def test_bulk_holiday_population():
+    print("Testing Bulk Holiday Population...")
+    
+    years = [2040, 2041, 2042]
+    for year in years:
+        for d in utils.get_holidays_df(year=year)['Datum']:
+            utils.delete_holiday(d)
+    
+    # 1. Computed once per (state, year)
+    bavaria = utils.compute_german_holidays("Bayern", 2040)
+    assert utils.compute_german_holidays("Bayern", 2040) is bavaria
+    assert date(2040, 1, 6) in [d for d, _ in bavaria]  # Epiphany (Bavaria only)
+    assert date(2040, 1, 6) not in [d for d, _ in utils.compute_german_holidays("Thüringen", 2040)]
+    print("Compute: OK")
+    
+    # 2. Bulk insert for several years
+    version = utils.get_holiday_version()
+    count, error = utils.populate_holidays_bulk(years, "Thüringen")
+    assert error is None
+    expected = sum(len(utils.compute_german_holidays("Thüringen", y)) for y in years)
+    assert count == expected
+    assert utils.get_holiday_version() == version + 1  # one invalidation for the whole batch
+    assert len(utils.get_holidays_df(year=2041)) == len(utils.compute_german_holidays("Thüringen", 2041))
+    assert work_calendar.default_row(2041, 1)[0] == "F"
+    print("Bulk Insert: OK")
+    
+    # 3. Re-running inserts nothing and does not invalidate
+    count, error = utils.populate_holidays_bulk(years, "Thüringen")
+    assert error is None
+    assert count == 0
+    assert utils.get_holiday_version() == version + 1
+    
+    # Single-year wrapper still works
+    count, error = utils.populate_german_holidays(2042)
+    assert (count, error) == (0, None)
+    
+    count, error = utils.populate_holidays_bulk(years, "Atlantis")
+    assert count == 0 and error
+    print("Bulk Holiday Population Test Passed!")
+
+if __name__ == "__main__":
+    test_bulk_holiday_population()
@@ -0,0 +1,73 @@
+import os
+import utils
+import instrumentation
+from streamlit.testing.v1 import AppTest
+
+# SQL round trips allowed per page render; raise only together with a justification
+MAX_QUERIES_COLD = 40
+MAX_QUERIES_WARM = 5
+MAX_QUERIES_EMPLOYEE_VIEW = 10
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def test_function_stats():
+    print("Testing Function Instrumentation...")
+    instrumentation.enable()
+    assert hasattr(utils.get_employees, "cache_clear")
+
+    utils.clear_cache()
+    instrumentation.reset()
+    window = instrumentation.start_window()
+    employees = utils.get_employees()
+    utils.get_employees()
+
+    stats = instrumentation.totals.functions["get_employees"]
+    assert stats["calls"] == 2
+    assert stats["misses"] == 1 and stats["hits"] == 1
+    assert stats["rows"] == 2 * len(employees)
+    assert stats["queries"] >= 1
+    assert window.functions["get_employees"]["calls"] == 2
+    print("Calls and Cache: OK")
+
+    statements = instrumentation.statement_table()
+    row = statements[statements["statement"].str.startswith("SELECT name FROM employees")]
+    assert len(row) == 1 and row["zeilen"].iat[0] == len(employees)
+    print("Statements: OK")
+
+    text = instrumentation.prometheus_text()
+    assert "# TYPE hourtracking_function_calls_total counter" in text
+    assert 'hourtracking_function_calls_total{function="get_employees"} 2' in text
+    print("Prometheus: OK")
+
+def test_round_trips_per_page():
+    print("Testing Round Trips per Page Render...")
+    instrumentation.enable()
+
+    at = AppTest.from_file(APP_FILE, default_timeout=120)
+    utils.clear_cache(holidays=True, projects=None, months=None)
+    instrumentation.reset()
+    at.run()
+    assert not at.exception
+    cold = instrumentation.totals.query_count
+    print(f"Cold render: {cold} queries")
+    assert cold <= MAX_QUERIES_COLD, instrumentation.statement_table().to_string()
+
+    instrumentation.reset()
+    at.run()
+    warm = instrumentation.totals.query_count
+    print(f"Warm render: {warm} queries")
+    assert warm <= MAX_QUERIES_WARM, instrumentation.statement_table().to_string()
+
+    employee = next((e for e in utils.get_employees() if e != "System"), None)
+    if employee:
+        instrumentation.reset()
+        at.selectbox[1].select(employee).run()
+        assert not at.exception
+        queries = instrumentation.totals.query_count
+        print(f"Employee view: {queries} queries")
+        assert queries <= MAX_QUERIES_EMPLOYEE_VIEW, instrumentation.statement_table().to_string()
+    print("Round Trips: OK")
+
+if __name__ == "__main__":
+    test_function_stats()
+    test_round_trips_per_page()
@@ -0,0 +1,64 @@
+import utils
+from datetime import date
+
+def test_leave_balances():
+    print("Testing Leave Balances...")
+
+    emp = "Leave User"
+    utils.save_employee(emp)
+    utils.add_project("Leave Proj")
+    utils.set_leave_entitlement(emp, 2034, 28, 2)
+    utils.save_month_entries(emp, 2034, 6, [])
+
+    # Vacation on two days (one of them on two projects), one sick day
+    entries = [
+        {"datum": date(2034, 5, 2), "mitarbeiter": emp, "projekt": "Leave Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"},
+        {"datum": date(2034, 5, 3), "mitarbeiter": emp, "projekt": "Leave Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"},
+        {"datum": date(2034, 5, 3), "mitarbeiter": emp, "projekt": "Other Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"},
+        {"datum": date(2034, 5, 4), "mitarbeiter": emp, "projekt": "Leave Proj", "stunden": 0.0, "beschreibung": "", "typ": "KK"},
+        {"datum": date(2034, 5, 5), "mitarbeiter": emp, "projekt": "Leave Proj", "stunden": 8.0, "beschreibung": "", "typ": "Arbeit"},
+    ]
+    utils.add_project("Other Proj")
+    utils.save_month_entries(emp, 2034, 5, entries)
+
+    row = utils.get_leave_balances(2034).set_index("mitarbeiter").loc[emp]
+    assert row["anspruch"] == 28 and row["uebertrag"] == 2
+    assert row["urlaub"] == 2
+    assert row["krank"] == 1
+    assert row["rest"] == 28
+    print("Month Save Counters: OK")
+
+    # Re-saving the month replaces (not adds to) its counters
+    utils.save_month_entries(emp, 2034, 5, entries[:1])
+    row = utils.get_leave_balances(2034).set_index("mitarbeiter").loc[emp]
+    assert row["urlaub"] == 1 and row["krank"] == 0
+    print("Re-save: OK")
+
+    # Single-entry edits keep the counters in sync
+    utils.save_entry(date(2034, 6, 1), emp, "Leave Proj", 0.0, "", "KK")
+    row = utils.get_leave_balances(2034).set_index("mitarbeiter").loc[emp]
+    assert row["krank"] == 1
+    print("Single Entry: OK")
+
+    # Carry-over into the next year
+    assert utils.carry_over_leave(2034) > 0
+    row = utils.get_leave_balances(2035).set_index("mitarbeiter").loc[emp]
+    assert row["uebertrag"] == 29
+    assert row["anspruch"] == utils.DEFAULT_LEAVE_DAYS
+    print("Carry-over: OK")
+
+    # Deleting a project recounts the months its entries were in
+    utils.add_project("Leave Delete Proj")
+    utils.save_month_entries(emp, 2034, 7, [
+        {"datum": date(2034, 7, d), "mitarbeiter": emp, "projekt": "Leave Delete Proj", "stunden": 0.0, "beschreibung": "", "typ": "U"}
+        for d in (1, 2, 3)
+    ])
+    assert utils.get_leave_balances(2034).set_index("mitarbeiter").loc[emp]["urlaub"] == 4
+    assert utils.delete_project("Leave Delete Proj")
+    assert utils.get_leave_balances(2034).set_index("mitarbeiter").loc[emp]["urlaub"] == 1
+    print("Project Delete: OK")
+
+    print("Leave Balances Test Passed!")
+
+if __name__ == "__main__":
+    test_leave_balances()
@@ -0,0 +1,43 @@
+import utils
+import benchmark
+import loadtest
+
+def test_load_harness():
+    print("Testing Load Harness...")
+
+    benchmark.cleanup()
+    data = benchmark.generate(3, 3, 1, seed=1)
+    benchmark.seed(data)
+    load_data = utils.load_data
+    try:
+        report = loadtest.run_load(data, users=4, duration=1.5)
+    finally:
+        benchmark.cleanup()
+
+    assert report["users"] == 4 and report["operationen"] > 0
+    assert report["durchsatz_ops_s"] > 0
+    assert set(report["flows"]) == set(loadtest.FLOWS)
+    for stats in report["flows"].values():
+        if stats["anzahl"]:
+            assert stats["p50"] <= stats["p95"] <= stats["max"]
+    assert report["pool"]["checkouts"] > 0
+    assert report["cache"]["berechnungen"].get("load_data", 0) >= 1
+    print("Report: OK")
+
+    # Readers and pool are restored afterwards
+    assert utils.load_data is load_data
+    assert "_do_get" not in vars(utils.engine.pool)
+    print("Restore: OK")
+
+def test_mix():
+    assert loadtest._parse_mix("year_view=3,rename") == {"year_view": 3.0, "rename": 1.0}
+    try:
+        loadtest._parse_mix("unknown=1")
+        assert False
+    except ValueError:
+        pass
+    print("Mix: OK")
+
+if __name__ == "__main__":
+    test_load_harness()
+    test_mix()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+import time
+import utils
+import db_pool
+import offline
+from datetime import date
+from sqlalchemy import text
+
+def _entries(emp, year, month, hours, project):
+    return [{"datum": date(year, month, d), "mitarbeiter": emp, "projekt": project, "stunden": hours,
+             "beschreibung": "", "typ": "Arbeit"} for d in (3, 4, 5)]
+
+def _hours(emp, year, month):
+    df = utils.get_month_entries(year, month)
+    return sorted(df[df['mitarbeiter'] == emp]['stunden'].tolist())
+
+def test_offline_journal():
+    print("Testing Offline Journal...")
+    emp = "Offline User"
+    proj = "Offline Proj"
+    utils.save_employee(emp)
+    utils.add_project(proj)
+    store, retry = offline._store, offline.RETRY_SECONDS
+    offline._store = offline._Store(os.path.join(tempfile.mkdtemp(), "offline.sqlite3"))
+    offline.RETRY_SECONDS = 3600
+    try:
+        utils.save_month_entries(emp, 2042, 3, _entries(emp, 2042, 3, 1.0, proj))
+        utils.save_month_entries(emp, 2042, 4, _entries(emp, 2042, 4, 1.0, proj))
+        utils.clear_cache()
+        employees = utils.get_employees()
+        utils.load_data()
+        offline._write_pending_snapshots()
+        assert offline.has_snapshot()
+
+        # Offline: connection attempts fail immediately, reads come from the snapshot
+        offline.mark_offline("test outage")
+        start = time.perf_counter()
+        success, error = utils.test_db_connection()
+        assert not success and "test outage" in error
+        assert time.perf_counter() - start < 1
+        utils.clear_cache()
+        assert utils.get_employees() == employees
+        print("Fast Fail & Snapshot: OK")
+
+        # Saves go to the journal, the latest save of a month wins
+        assert not offline.journal_month("Offline Nobody", 2042, 3, [])
+        assert offline.journal_month(emp, 2042, 3, _entries(emp, 2042, 3, 2.0, proj))
+        assert offline.journal_month(emp, 2042, 3, _entries(emp, 2042, 3, 3.0, proj))
+        assert offline.journal_month(emp, 2042, 4, _entries(emp, 2042, 4, 5.0, proj))
+        assert [e["stunden"] for e in offline.journaled_entries(emp, 2042, 3)] == [3.0, 3.0, 3.0]
+        assert offline.status()["offen"] == 2
+
+        # Meanwhile another client changes April
+        other = db_pool.create_pooled_engine(utils.DB_URL, pool_size=0)
+        with other.begin() as conn:
+            conn.execute(text("UPDATE entries SET stunden = 7 WHERE mitarbeiter = :m AND datum = :d"),
+                         {"m": emp, "d": date(2042, 4, 3)})
+        other.dispose()
+
+        # Reconnect: March is replayed, April becomes a conflict instead of being overwritten
+        offline.retry_now()
+        deadline = time.monotonic() + 30
+        while (not offline.is_online() or offline.status()["offen"]) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert offline.is_online()
+        assert offline.status()["offen"] == 0
+        assert _hours(emp, 2042, 3) == [3.0, 3.0, 3.0]
+        assert _hours(emp, 2042, 4) == [1.0, 1.0, 7.0]
+        assert offline.journaled_entries(emp, 2042, 3) is None
+        conflicts = offline.conflicts()
+        assert len(conflicts) == 1 and conflicts.iloc[0]['monat'] == 4
+        print("Replay & Conflict Detection: OK")
+
+        assert offline.resolve(emp, 2042, 4, keep_local=True)
+        assert _hours(emp, 2042, 4) == [5.0, 5.0, 5.0]
+        assert offline.conflicts().empty
+        print("Conflict Resolution: OK")
+
+        # A writer racing the replay waits for its transaction instead of being overwritten
+        assert offline.journal_month(emp, 2042, 3, _entries(emp, 2042, 3, 4.0, proj))
+        fingerprint, racer = offline._current_fingerprint, []
+
+        def fingerprint_with_race(conn, *key):
+            result = fingerprint(conn, *key)
+            racer.append(threading.Thread(target=utils.save_entry, args=(date(2042, 3, 6), emp, proj, 8.0, "", "Arbeit")))
+            racer[0].start()
+            racer[0].join(0.5)
+            assert racer[0].is_alive()  # blocked by the month lock
+            return result
+
+        offline._current_fingerprint = fingerprint_with_race
+        try:
+            assert offline.replay() == {"uebertragen": 1, "konflikte": 0, "fehler": 0}
+        finally:
+            offline._current_fingerprint = fingerprint
+        racer[0].join(10)
+        assert _hours(emp, 2042, 3) == [4.0, 4.0, 4.0, 8.0]
+        print("Replay Lock: OK")
+    finally:
+        offline.RETRY_SECONDS = retry
+        if not offline.is_online():
+            offline._reconnected()
+        offline._store = store
+        for month in (3, 4):
+            utils.save_month_entries(emp, 2042, month, [])
+        utils.remove_employee(emp)
+        utils.delete_project(proj)
+
+if __name__ == "__main__":
+    test_offline_journal()
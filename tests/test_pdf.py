@@ -2,6 +2,7 @@ import utils
 import pandas as pd
 from datetime import date
 import os
+import io
 
 def test_pdf_generation():
     print("Testing PDF Generation...")
@@ -27,5 +28,61 @@ def test_pdf_generation():
     assert os.path.exists(filename)
     print("PDF Generated: OK")
 
+def test_report_tables():
+    print("Testing Report Table Rows...")
+    
+    agg = pd.DataFrame({
+        "mitarbeiter": ["Emp B", "Emp A", "Emp A", "Emp A"],
+        "projekt": ["Proj A", "Proj B", "Proj A", "Proj A"],
+        "monat": [1, 1, 2, 1],
+        "stunden": [1.0, 2.0, 3.0, 4.0],
+    })
+    
+    tables = utils._report_tables(agg, 'mitarbeiter', 'projekt')
+    rows, total = tables["Emp A"]
+    assert rows == [["Proj A", "Januar", "4.0"], ["", "Februar", "3.0"], ["Proj B", "Januar", "2.0"]]
+    assert total == 9.0
+    
+    # Inner name is repeated when a new outer group starts
+    tables = utils._report_tables(agg, 'projekt', 'mitarbeiter')
+    assert tables["Proj A"][0] == [["Emp A", "Januar", "4.0"], ["", "Februar", "3.0"], ["Emp B", "Januar", "1.0"]]
+    assert tables["Proj B"][0] == [["Emp A", "Januar", "2.0"]]
+    print("Report Table Rows: OK")
+
+def test_pdf_report_cache():
+    print("Testing PDF Report Cache...")
+    
+    emp = "PDF User"
+    utils.save_employee(emp)
+    utils.add_project("Proj A")
+    utils.save_month_entries(emp, 2026, 3, [
+        {"datum": date(2026, 3, 2), "mitarbeiter": emp, "projekt": "Proj A", "stunden": 7.0, "beschreibung": "Test", "typ": "Arbeit"},
+    ])
+    
+    # In-memory rendering, served from cache on the second call
+    pdf = utils.get_pdf_report(2026)
+    assert pdf.startswith(b"%PDF")
+    assert utils.get_pdf_report(2026) is pdf
+    assert utils.get_cached_pdf_report(2026) is pdf
+    print("Cache Hit: OK")
+    
+    # Any mutation invalidates the cached report
+    utils.clear_cache()
+    assert utils.get_cached_pdf_report(2026) is None
+    
+    # Background pre-rendering fills the cache
+    future = utils.prerender_pdf_report(2026)
+    assert future.result().startswith(b"%PDF")
+    assert utils.get_cached_pdf_report(2026) is not None
+    print("Invalidation & Prerender: OK")
+    
+    # Writing to a file object still works
+    buffer = io.BytesIO()
+    assert utils.generate_pdf_report(2026, buffer)
+    assert buffer.getvalue().startswith(b"%PDF")
+    print("PDF Report Cache Test Passed!")
+
 if __name__ == "__main__":
     test_pdf_generation()
+    test_report_tables()
+    test_pdf_report_cache()
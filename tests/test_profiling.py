@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import profiling
+
+def _busy_work():
+    data = [list(range(200)) for _ in range(2000)]
+    end = time.perf_counter() + 0.1
+    while time.perf_counter() < end:
+        sum(len(row) for row in data)
+    return data
+
+def test_rerun_profiles():
+    print("Testing Rerun Profiler...")
+
+    previous = profiling.PROFILING, profiling.PROFILE_DIR, profiling.MODE
+    with tempfile.TemporaryDirectory() as tmp:
+        profiling.PROFILING, profiling.PROFILE_DIR = "1", tmp
+        try:
+            state = {}
+            assert profiling.start(state) is not None
+            profiling.tag(state, ansicht="mitarbeiter", jahr=2026, mitarbeiter="Max Mustermann")
+            _busy_work()
+            summary_path = profiling.finish(state)
+            with open(summary_path) as f:
+                summary = json.load(f)
+            assert summary["vollstaendig"] and summary["tags"]["jahr"] == 2026
+            assert "Max_Mustermann" in os.path.basename(summary_path)
+            assert summary["top_allokationen"] and summary["speicher_peak_kb"] > 0
+            with open(os.path.join(tmp, summary["profil"])) as f:
+                lines = f.read().splitlines()
+            stack, count = lines[0].rsplit(" ", 1)
+            assert int(count) > 0
+            assert any("_busy_work" in line for line in lines)
+            print("Sampling: OK")
+
+            # cProfile mode; a rerun that never finished is written at the next start
+            profiling.MODE = "cprofile"
+            profiling.start(state)
+            _busy_work()
+            profiling.start(state)
+            profiling.finish(state)
+            summaries = []
+            for name in sorted(os.listdir(tmp)):
+                if name.endswith(".json"):
+                    with open(os.path.join(tmp, name)) as f:
+                        summaries.append(json.load(f))
+            assert [s["vollstaendig"] for s in summaries] == [True, False, True]
+            assert summaries[1]["profil"].endswith(".prof")
+            print("cProfile and Incomplete Reruns: OK")
+
+            # A session that is never finished (st.stop, no further rerun) stops tracing by itself
+            max_seconds, profiling.MAX_SAMPLE_SECONDS = profiling.MAX_SAMPLE_SECONDS, 0.2
+            try:
+                profiling.start(state)
+                assert tracemalloc.is_tracing()
+                time.sleep(0.5)
+                assert not tracemalloc.is_tracing()
+                assert profiling.finish(state) is not None
+            finally:
+                profiling.MAX_SAMPLE_SECONDS = max_seconds
+            print("Expiry: OK")
+
+            # Query-parameter mode
+            profiling.PROFILING = "query"
+            assert profiling.start(state, {}) is None
+            assert profiling.start(state, {"profile": "1"}) is not None
+            profiling.finish(state)
+            print("Query Parameter: OK")
+        finally:
+            profiling.PROFILING, profiling.PROFILE_DIR, profiling.MODE = previous
+
+if __name__ == "__main__":
+    test_rerun_profiles()
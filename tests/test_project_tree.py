@@ -0,0 +1,69 @@
+import utils
+from datetime import date
+
+def test_project_hierarchy():
+    print("Testing Project Hierarchy...")
+
+    emp = "Tree User"
+    utils.save_employee(emp)
+    for name in ["Tree Kunde", "Tree Projekt", "Tree AP1", "Tree AP2", "Tree Kunde B"]:
+        utils.delete_project(name)
+    utils.add_project("Tree Kunde")
+    utils.add_project("Tree Projekt", "Tree Kunde")
+    utils.add_project("Tree AP1", "Tree Projekt")
+    utils.add_project("Tree AP2", "Tree Projekt")
+    utils.add_project("Tree Kunde B")
+
+    tree = utils.get_project_tree().set_index("projekt")
+    assert tree.loc["Tree AP1", "ebene"] == 2
+    assert list(tree.loc["Tree AP1", "pfad"]) == ["Tree Kunde", "Tree Projekt", "Tree AP1"]
+    print("Tree: OK")
+
+    # Cycles are refused
+    assert not utils.set_project_parent("Tree Kunde", "Tree AP1")
+    assert not utils.add_project("Tree Kunde", "Tree AP1")
+    assert utils.get_project_tree().set_index("projekt").loc["Tree Kunde", "ebene"] == 0
+    print("Cycle Check: OK")
+
+    utils.save_month_entries(emp, 2039, 4, [
+        {"datum": date(2039, 4, 1), "mitarbeiter": emp, "projekt": "Tree AP1", "stunden": 3.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2039, 4, 2), "mitarbeiter": emp, "projekt": "Tree AP2", "stunden": 4.0, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2039, 4, 3), "mitarbeiter": emp, "projekt": "Tree Projekt", "stunden": 1.0, "beschreibung": "", "typ": "Arbeit"},
+    ])
+    rollup = utils.project_rollup(2039).groupby("projekt")["stunden"].sum()
+    assert rollup["Tree Kunde"] == 8.0
+    assert rollup["Tree Projekt"] == 8.0
+    assert rollup["Tree AP1"] == 3.0
+    print("Rollup: OK")
+
+    # Moving a subtree re-rolls it up under the new parent
+    assert utils.set_project_parent("Tree Projekt", "Tree Kunde B")
+    rollup = utils.project_rollup(2039).groupby("projekt")["stunden"].sum()
+    assert rollup["Tree Kunde B"] == 8.0
+    assert rollup.get("Tree Kunde", 0.0) == 0.0
+    assert utils.get_project_tree().set_index("projekt").loc["Tree AP2", "ebene"] == 2
+    print("Move Subtree: OK")
+
+    # Collapsed table only shows the top level
+    table = utils.project_rollup_table(2039, max_depth=0, indent="  ")
+    assert "Tree Kunde B" in table.index and "Tree Projekt" not in table.index
+    assert table.loc["Tree Kunde B", "April"] == 8.0
+    print("Collapse Levels: OK")
+
+    # PDF report with the structure section, collapsed to the top level
+    assert utils.get_pdf_report(2039, max_depth=0) is not None
+    print("PDF Structure: OK")
+
+    # Deleting a middle node moves its children up
+    utils.delete_project("Tree Projekt")
+    tree = utils.get_project_tree().set_index("projekt")
+    assert tree.loc["Tree AP1", "parent"] == "Tree Kunde B"
+    assert tree.loc["Tree AP1", "ebene"] == 1
+    print("Delete Node: OK")
+
+    for name in ["Tree AP1", "Tree AP2", "Tree Kunde", "Tree Kunde B"]:
+        utils.delete_project(name)
+    print("Project Hierarchy Test Passed!")
+
+if __name__ == "__main__":
+    test_project_hierarchy()
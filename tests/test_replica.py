@@ -0,0 +1,143 @@
+import time
+import utils
+import db_pool
+import budgets
+import availability
+from datetime import date
+from sqlalchemy import event, text
+
+def _router(position):
+    """Router whose replica reports the given (replayed LSN, lag) instead of asking the server."""
+    replica = db_pool.create_pooled_engine(utils.DB_URL, pool_size=1, max_overflow=0)
+    router = db_pool.ReplicaRouter(utils.engine, replica, max_lag_seconds=10, check_seconds=0)
+
+    def replica_position():
+        if isinstance(position["value"], Exception):
+            raise position["value"]
+        return position["value"]
+
+    router._replica_position = replica_position
+    return router, replica
+
+def _write():
+    with utils.engine.connect() as conn:
+        conn.execute(text("UPDATE employees SET name = name WHERE false"))
+        conn.commit()
+
+def test_lsn():
+    print("Testing LSN parsing...")
+    assert db_pool._lsn("0/16B3748") == 0x16B3748
+    assert db_pool._lsn("16/B374D848") == (0x16 << 32) + 0xB374D848
+    assert db_pool._lsn(None) is None
+    print("LSN: OK")
+
+def test_default_primary():
+    print("Testing Reads Without Replica...")
+    if utils.replica_router is None:
+        assert utils.read_engine() is utils.engine
+    print("Default: OK")
+
+def test_same_server_counts_as_caught_up():
+    print("Testing Non-Standby Replica...")
+    replica = db_pool.create_pooled_engine(utils.DB_URL, pool_size=1, max_overflow=0)
+    router = db_pool.ReplicaRouter(utils.engine, replica)
+    # Until the first check, reads stay on the primary
+    assert router.read_engine() is utils.engine
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is replica
+    _write()
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is replica
+    assert router.status()["lesezugriffe_replica"] == 2
+    replica.dispose()
+    print("Non-Standby: OK")
+
+def test_read_your_writes():
+    print("Testing Read-Your-Writes...")
+    with utils.engine.connect() as conn:
+        current = db_pool._lsn(conn.execute(text("SELECT pg_current_wal_lsn()")).scalar())
+    position = {"value": (current, 0.0)}
+    router, replica = _router(position)
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is replica
+
+    # Pinned at the commit, before the connection goes back to the pool
+    with utils.engine.connect() as conn:
+        conn.execute(text("UPDATE employees SET name = name WHERE false"))
+        conn.commit()
+        assert router.read_engine() is utils.engine
+    with utils.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))  # reads alone do not pin
+    assert router.write_seq != router.handled_seq
+    position["value"] = (current - 1, 0.0)
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is utils.engine
+    assert not router.status()["aufgeholt"]
+    position["value"] = (router.target_lsn, 0.0)
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is replica
+    replica.dispose()
+    print("Read-Your-Writes: OK")
+
+def test_lag_and_failure_fallback():
+    print("Testing Lag Fallback...")
+    position = {"value": (None, 60.0)}
+    router, replica = _router(position)
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is utils.engine
+    position["value"] = (None, 1.0)
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is replica
+    position["value"] = ConnectionError("replica down")
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is utils.engine
+    assert router.status()["fehler"] == "replica down"
+    assert not router.status()["gesund"]
+
+    # A slow replica check runs in the background; reads route on the last state meanwhile
+    router._replica_position = lambda: time.sleep(1) or (None, 0.0)
+    start = time.perf_counter()
+    assert router.read_engine() is utils.engine
+    assert time.perf_counter() - start < 0.5
+    assert router.refresh(timeout=10)
+    assert router.read_engine() is replica
+    replica.dispose()
+    print("Lag Fallback: OK")
+
+def test_reports_use_replica():
+    print("Testing Report Reads On Replica...")
+
+    class StubRouter:
+        def __init__(self, engine):
+            self.engine = engine
+
+        def read_engine(self):
+            return self.engine
+
+    replica = db_pool.create_pooled_engine(utils.DB_URL, pool_size=1, max_overflow=0)
+    statements = []
+    event.listen(replica, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    router = utils.replica_router
+    utils.replica_router = StubRouter(replica)
+    try:
+        budgets._overview.cache_clear()
+        availability._grids.clear()
+        assert list(budgets.get_budget_overview(2051).columns) == budgets.OVERVIEW_COLUMNS
+        assert any("project_budgets" in s for s in statements)
+        statements.clear()
+        availability.get_availability(date(2051, 1, 1), date(2051, 1, 31))
+        assert any("typ IN ('U', 'KK', 'F')" in s for s in statements)
+    finally:
+        utils.replica_router = router
+        budgets._overview.cache_clear()
+        availability._grids.clear()
+        replica.dispose()
+    print("Report Reads: OK")
+
+if __name__ == "__main__":
+    test_lsn()
+    test_default_primary()
+    test_same_server_counts_as_caught_up()
+    test_read_your_writes()
+    test_lag_and_failure_fallback()
+    test_reports_use_replica()
@@ -0,0 +1,83 @@
+import utils
+import search
+from datetime import date
+
+def test_search_entries():
+    print("Testing Description Search...")
+
+    emp = "Search User"
+    other = "Search Other"
+    proj = "Search Proj"
+    utils.save_employee(emp)
+    utils.save_employee(other)
+    utils.add_project(proj)
+
+    utils.save_month_entries(emp, 2039, 4, [
+        {"datum": date(2039, 4, d), "mitarbeiter": emp, "projekt": proj, "stunden": 2.0,
+         "beschreibung": f"Zebrafisch Kundentermin {d}", "typ": "Arbeit"}
+        for d in range(1, 8)
+    ] + [
+        {"datum": date(2039, 4, 10), "mitarbeiter": emp, "projekt": None, "stunden": 1.0,
+         "beschreibung": "Interne Zebrafischschulung", "typ": "Arbeit"},
+    ])
+    utils.save_month_entries(other, 2039, 4, [
+        {"datum": date(2039, 4, 3), "mitarbeiter": other, "projekt": proj, "stunden": 3.0,
+         "beschreibung": "Zebrafisch Kundentermine vorbereiten", "typ": "Arbeit"},
+    ])
+
+    # Full-text: stemming matches "Kundentermine" as well
+    results, total = search.search_entries("zebrafisch kundentermin")
+    assert total == 8, total
+    assert list(results.columns) == search.RESULT_COLUMNS
+    assert results["datum"].tolist() == sorted(results["datum"].tolist(), reverse=True)
+    print("Full-Text: OK")
+
+    # Filters
+    _, total = search.search_entries("zebrafisch kundentermin", employee=emp)
+    assert total == 7
+    _, total = search.search_entries("zebrafisch", employee=emp, start=date(2039, 4, 5), end=date(2039, 4, 6))
+    assert total == 2
+    _, total = search.search_entries("zebrafisch kundentermin", project=proj, employee=other)
+    assert total == 1
+    print("Filters: OK")
+
+    # Pagination
+    page1, total = search.search_entries("zebrafisch kundentermin", employee=emp, page_size=3)
+    page3, _ = search.search_entries("zebrafisch kundentermin", employee=emp, page=3, page_size=3)
+    assert total == 7 and len(page1) == 3 and len(page3) == 1
+    assert page3["datum"].iat[0] == date(2039, 4, 1)
+    print("Pagination: OK")
+
+    # Substring inside a compound word (needs pg_trgm)
+    if search.has_trigram():
+        results, total = search.search_entries("fischschul")
+        assert total == 1 and results["beschreibung"].iat[0] == "Interne Zebrafischschulung"
+        print("Substring: OK")
+
+    # Empty query returns nothing
+    results, total = search.search_entries("   ")
+    assert total == 0 and results.empty
+    print("Empty Query: OK")
+
+def test_trigram_lookup_retried():
+    print("Testing pg_trgm Lookup...")
+    read_engine = utils.read_engine
+
+    def failing():
+        raise ConnectionError("database down")
+
+    search._trigram = None
+    utils.read_engine = failing
+    try:
+        assert search.has_trigram() is False
+        assert search._trigram is None  # a failed lookup is not cached
+    finally:
+        utils.read_engine = read_engine
+    installed = search.has_trigram()
+    assert search._trigram is installed
+    print("Retry After Failure: OK")
+
+if __name__ == "__main__":
+    utils.init_db()
+    test_search_entries()
+    test_trigram_lookup_retried()
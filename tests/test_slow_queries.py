@@ -0,0 +1,127 @@
+import os
+import pandas as pd
+import tempfile
+import threading
+import utils
+import slow_queries
+from datetime import date
+from sqlalchemy import event, text
+
+def test_slow_query_log():
+    print("Testing Slow-Query Log...")
+
+    previous = slow_queries.get_threshold()
+    slow_queries.clear_log()
+    utils.clear_cache()
+    log_threads = []
+
+    def on_execute(conn, cursor, statement, *args):
+        if "slow_queries" in statement:
+            log_threads.append(threading.current_thread())
+
+    event.listen(utils.engine, "before_cursor_execute", on_execute)
+    slow_queries.set_threshold(0.000001)  # log everything
+    try:
+        utils.get_holidays_df(2026)
+        utils.get_holidays_df(2027)
+    finally:
+        slow_queries.set_threshold(previous)
+    slow_queries.flush()
+    event.remove(utils.engine, "before_cursor_execute", on_execute)
+    # Written by the log thread, never on the thread that ran the statement
+    assert log_threads and threading.current_thread() not in log_threads
+
+    log = slow_queries.get_log()
+    holidays = log[log["funktion"] == "utils.get_holidays_df"]
+    assert len(holidays) == 2, log[["funktion", "statement"]]
+    assert "2027" in holidays["parameter"].iat[0]
+    assert not log["statement"].str.contains("slow_queries").any()
+    print("Logging: OK")
+
+    offenders = slow_queries.top_offenders()
+    row = offenders[offenders["funktion"] == "utils.get_holidays_df"]
+    assert row["anzahl"].iat[0] == 2
+    print("Top Offenders: OK")
+
+    plan = slow_queries.explain(row["letzte_id"].iat[0])
+    assert plan and "Execution Time" in plan
+    assert slow_queries.get_log()["plan"].notna().any()
+    print("Explain: OK")
+
+def test_explain_rolls_back():
+    print("Testing Explain of Modifying Statements...")
+
+    utils.save_holiday(date(2041, 5, 1), "Slow Query Test")
+    slow_queries.clear_log()
+    previous = slow_queries.get_threshold()
+    slow_queries.set_threshold(0.000001)
+    try:
+        utils.update_holiday(date(2041, 5, 1), "Slow Query Test 2")
+    finally:
+        slow_queries.set_threshold(previous)
+
+    log = slow_queries.get_log()
+    update = log[log["statement"].str.contains("UPDATE holidays")]
+    assert slow_queries.explain(update["id"].iat[0])
+    # EXPLAIN ANALYZE ran the UPDATE, but in a rolled-back transaction
+    names = utils.get_holidays_df(2041)
+    assert names.loc[names["Datum"] == date(2041, 5, 1), "Name"].iat[0] == "Slow Query Test 2"
+    utils.delete_holiday(date(2041, 5, 1))
+    slow_queries.clear_log()
+    print("Rollback: OK")
+
+def test_auto_explain_skips_locks():
+    print("Testing Auto-Explain of Locking Reads...")
+
+    assert slow_queries._is_select("SELECT 1 FROM holidays")
+    assert not slow_queries._is_select("SELECT * FROM entries WHERE id = 1 FOR NO KEY UPDATE")
+    assert not slow_queries._is_select("select * from entries for  key share")
+    slow_queries.clear_log()
+    previous = slow_queries.get_threshold(), slow_queries.AUTO_EXPLAIN
+    slow_queries.set_threshold(0.000001)
+    slow_queries.AUTO_EXPLAIN = True
+    try:
+        with utils.engine.begin() as conn:
+            conn.execute(text("SELECT datum FROM holidays WHERE name = 'Auto Explain' FOR UPDATE"))
+            conn.execute(text("SELECT datum FROM holidays WHERE name = 'Auto Explain'"))
+    finally:
+        slow_queries.set_threshold(previous[0])
+        slow_queries.AUTO_EXPLAIN = previous[1]
+
+    log = slow_queries.get_log().set_index("statement")
+    assert pd.isna(log.loc["SELECT datum FROM holidays WHERE name = 'Auto Explain' FOR UPDATE", "plan"])
+    assert "Execution Time" in log.loc["SELECT datum FROM holidays WHERE name = 'Auto Explain'", "plan"]
+    slow_queries.clear_log()
+    print("Locking Reads: OK")
+
+def test_file_log():
+    print("Testing Rotating File Log...")
+
+    previous = slow_queries.get_threshold(), slow_queries.LOG_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        slow_queries.LOG_FILE = os.path.join(tmp, "slow.log")
+        slow_queries.set_threshold(0.000001)
+        try:
+            utils.clear_cache()
+            utils.get_holidays_df(2026)
+        finally:
+            slow_queries.set_threshold(previous[0])
+        try:
+            offenders = slow_queries.top_offenders()
+            row = offenders[offenders["funktion"] == "utils.get_holidays_df"]
+            assert row["anzahl"].iat[0] == 1
+            assert "Execution Time" in slow_queries.explain(row["letzte_id"].iat[0])
+            assert slow_queries.clear_log() and slow_queries.get_log().empty
+        finally:
+            slow_queries.LOG_FILE = previous[1]
+            for handler in list(slow_queries._logger.handlers):
+                handler.close()
+                slow_queries._logger.removeHandler(handler)
+            slow_queries._logger = None
+    print("File Log: OK")
+
+if __name__ == "__main__":
+    test_slow_query_log()
+    test_explain_rolls_back()
+    test_auto_explain_skips_locks()
+    test_file_log()
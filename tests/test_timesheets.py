@@ -0,0 +1,49 @@
+import utils
+import timesheets
+import io
+import zipfile
+from datetime import date
+
+def test_timesheet_batch():
+    print("Testing Timesheet Batch...")
+    
+    emps = ["Sheet User 1", "Sheet User 2", "Sheet User 3", "Sheet User 4"]
+    utils.add_project("Sheet Proj")
+    for emp in emps:
+        utils.save_employee(emp)
+        utils.update_assigned_projects(emp, ["Sheet Proj"])
+    
+    utils.save_month_entries(emps[0], 2026, 4, [
+        {"datum": date(2026, 4, 1), "mitarbeiter": emps[0], "projekt": "Sheet Proj", "stunden": 7.5, "beschreibung": "", "typ": "Arbeit"},
+        {"datum": date(2026, 4, 2), "mitarbeiter": emps[0], "projekt": "Sheet Proj", "stunden": 0.0, "beschreibung": "", "typ": "KK"},
+    ])
+    
+    # 1. Sheet data in the editor layout
+    sheets = timesheets.load_timesheets(2026, 4, emps)
+    assert [s["employee"] for s in sheets] == emps
+    proj, cells, total = sheets[0]["rows"][0]
+    assert proj == "Sheet Proj"
+    assert cells[0] == "7.5"
+    assert cells[1] == "KK"
+    assert cells[3] == "/"  # April 4, 2026 is a Saturday
+    assert total == 7.5
+    print("Sheet Data: OK")
+    
+    # 2. Parallel batch into a ZIP stream with progress
+    progress = []
+    out = io.BytesIO()
+    count = timesheets.write_timesheet_zip(out, 2026, 4, emps, max_workers=2,
+                                           progress=lambda done, total, emp: progress.append((done, total)))
+    assert count == 4
+    assert progress[-1] == (4, 4)
+    with zipfile.ZipFile(out) as zf:
+        names = zf.namelist()
+        assert len(names) == 4
+        assert timesheets.timesheet_filename(emps[0], 2026, 4) in names
+        assert zf.read(names[0]).startswith(b"%PDF")
+    print("Parallel ZIP: OK")
+    
+    print("Timesheet Batch Test Passed!")
+
+if __name__ == "__main__":
+    test_timesheet_batch()
@@ -0,0 +1,109 @@
+import utils
+import work_calendar
+from work_calendar import WORKDAY, WEEKEND, HOLIDAY, VACATION
+from datetime import date
+
+def test_year_calendar_day_types():
+    print("Testing Year Calendar Day Types...")
+    
+    holidays = {date(2026, 1, 1), date(2026, 1, 3)}  # Thursday, Saturday
+    vacation_days = {date(2026, 1, 1), date(2026, 1, 2)}  # Thursday (also holiday), Friday
+    cal = work_calendar.YearCalendar(2026, holidays, vacation_days)
+    
+    assert len(cal.day_types) == 365
+    jan = cal.day_types_for_month(1)
+    assert len(jan) == 31
+    # Priority: weekend > holiday > vacation
+    assert jan[0] == HOLIDAY
+    assert jan[1] == VACATION
+    assert jan[2] == WEEKEND
+    assert jan[4] == WORKDAY  # Monday, Jan 5
+    assert cal.default_row(1)[:5] == ["F", "U", "/", "/", None]
+    print("Day Types: OK")
+    
+    # Same classification as the per-day loop used in the editor
+    for month in range(1, 13):
+        row = cal.default_row(month)
+        for d, val in enumerate(row, start=1):
+            curr_date = date(2026, month, d)
+            if curr_date.weekday() >= 5:
+                expected = "/"
+            elif curr_date in holidays:
+                expected = "F"
+            elif curr_date in vacation_days:
+                expected = "U"
+            else:
+                expected = None
+            assert val == expected
+    print("Matches Editor Loop: OK")
+    
+    # Working days: January 2026 has 22 weekdays, minus holiday Jan 1 and vacation Jan 2
+    assert cal.working_days(date(2026, 1, 1), date(2026, 1, 31)) == 20
+    assert cal.working_days(date(2026, 1, 5), date(2026, 1, 5)) == 1
+    assert cal.working_days_per_month()[0] == 20
+    assert cal.working_days_per_month().sum() == cal.working_days(date(2026, 1, 1), date(2026, 12, 31))
+    print("Working Days: OK")
+
+def test_calendar_invalidation():
+    print("Testing Calendar Invalidation...")
+    
+    d = date(2031, 6, 4)  # Wednesday
+    utils.delete_holiday(d)
+    assert work_calendar.day_types(2031, 6)[3] == WORKDAY
+    before = work_calendar.working_days_in_month(2031, 6)
+    
+    utils.save_holiday(d, "Test Feiertag")
+    assert work_calendar.day_types(2031, 6)[3] == HOLIDAY
+    assert work_calendar.default_row(2031, 6)[3] == "F"
+    assert work_calendar.working_days_in_month(2031, 6) == before - 1
+    
+    # Ranges across years sum the per-year calendars
+    assert work_calendar.working_days(date(2030, 12, 31), date(2031, 1, 1)) == \
+        work_calendar.working_days(date(2030, 12, 31), date(2030, 12, 31)) + \
+        work_calendar.working_days(date(2031, 1, 1), date(2031, 1, 1))
+    
+    utils.delete_holiday(d)
+    assert work_calendar.day_types(2031, 6)[3] == WORKDAY
+    
+    matrix = work_calendar.default_matrix(2031, 6, ["Proj A", "Proj B"])
+    assert list(matrix.index) == ["Proj A", "Proj B"]
+    assert list(matrix.columns) == list(range(1, 31))
+    assert matrix.at["Proj B", 7] == "/"  # June 7, 2031 is a Saturday
+    print("Calendar Invalidation Test Passed!")
+
+def test_employee_region_calendar():
+    print("Testing Employee Region Calendars...")
+    
+    emp_default = "Region User TH"
+    emp_bavaria = "Region User BY"
+    utils.save_employee(emp_default)
+    utils.save_employee(emp_bavaria)
+    utils.set_employee_region(emp_bavaria, "Bayern")
+    assert utils.get_employee_region(emp_bavaria) == "Bayern"
+    assert utils.get_employee_region(emp_default) == utils.DEFAULT_REGION
+    
+    # Epiphany (Jan 6, 2032 is a Tuesday) is a holiday in Bavaria only
+    epiphany = date(2032, 1, 6)
+    utils.delete_holiday(epiphany, "Bayern")
+    utils.delete_holiday(epiphany)
+    utils.populate_holidays_bulk([2032], "Bayern", "Bayern")
+    assert epiphany in utils.load_region_holidays()["Bayern"]
+    assert epiphany not in utils.load_holidays()
+    
+    assert work_calendar.employee_calendar(2032, emp_bavaria).default_row(1)[5] == "F"
+    assert work_calendar.employee_calendar(2032, emp_default).default_row(1)[5] is None
+    # January 2032 has 22 weekdays; New Year (Thursday) and Epiphany are holidays in Bavaria
+    assert work_calendar.working_days_in_month(2032, 1, "Bayern") == 20
+    print("Region Calendars: OK")
+    
+    # Same date can exist in several regions
+    assert utils.save_holiday(epiphany, "Heilige Drei Könige")
+    assert not utils.save_holiday(epiphany, "Heilige Drei Könige", "Bayern")
+    assert utils.delete_holiday(epiphany)
+    assert epiphany in utils.load_region_holidays()["Bayern"]
+    print("Employee Region Calendars Test Passed!")
+
+if __name__ == "__main__":
+    test_year_calendar_day_types()
+    test_calendar_invalidation()
+    test_employee_region_calendar()
@@ -0,0 +1,77 @@
+import utils
+import write_queue
+from datetime import date
+
+def _entries(emp, year, month, hours, project):
+    return [{"datum": date(year, month, d), "mitarbeiter": emp, "projekt": project, "stunden": hours,
+             "beschreibung": "", "typ": "Arbeit"} for d in (3, 4, 5)]
+
+def _hours(emp, year, month):
+    df = utils.get_month_entries(year, month)
+    return df[df['mitarbeiter'] == emp]['stunden'].tolist()
+
+def test_write_behind():
+    print("Testing Write-Behind Queue...")
+    emps = ["Queue User 1", "Queue User 2"]
+    proj = "Queue Proj"
+    for emp in emps:
+        utils.save_employee(emp)
+    utils.add_project(proj)
+    batch_wait, retries = write_queue.BATCH_WAIT, write_queue.RETRIES
+    write_queue.BATCH_WAIT = 0.3
+    before = write_queue.status()
+
+    # Validation happens before queueing
+    assert write_queue.enqueue_month("Queue Nobody", 2041, 3, []) is None
+    assert write_queue.enqueue_month(emps[0], 2041, 3, _entries(emps[0], 2041, 4, 1.0, proj)) is None
+
+    # Repeated saves of one month are coalesced (last save wins), other months join the batch
+    first = write_queue.enqueue_month(emps[0], 2041, 3, _entries(emps[0], 2041, 3, 1.0, proj))
+    second = write_queue.enqueue_month(emps[0], 2041, 3, _entries(emps[0], 2041, 3, 2.0, proj))
+    other = write_queue.enqueue_month(emps[1], 2041, 3, _entries(emps[1], 2041, 3, 4.0, proj))
+    assert [e["stunden"] for e in write_queue.pending_entries(emps[0], 2041, 3)] == [2.0, 2.0, 2.0]
+    assert write_queue.flush(timeout=30)
+    assert first.result() and second.result() and other.result()
+    assert write_queue.pending_entries(emps[0], 2041, 3) is None
+    assert _hours(emps[0], 2041, 3) == [2.0, 2.0, 2.0]
+    assert _hours(emps[1], 2041, 3) == [4.0, 4.0, 4.0]
+    after = write_queue.status()
+    assert after["zusammengefasst"] == before["zusammengefasst"] + 1
+    assert after["batches"] == before["batches"] + 1
+    print("Coalesce & Batch: OK")
+
+    # A failing month (unknown project) does not take the rest of its batch down
+    write_queue.RETRIES = 0
+    bad = write_queue.enqueue_month(emps[0], 2041, 5, _entries(emps[0], 2041, 5, 1.0, "Queue Missing Proj"))
+    good = write_queue.enqueue_month(emps[1], 2041, 5, _entries(emps[1], 2041, 5, 3.0, proj))
+    assert not write_queue.flush(timeout=30)
+    assert bad.result() is False and good.result() is True
+    assert _hours(emps[1], 2041, 5) == [3.0, 3.0, 3.0]
+    print("Failure Isolation: OK")
+    write_queue.RETRIES = retries
+
+    # An error after the commit (here the PDF prerender) neither retries nor fails the save
+    prerender, pdf_prerender = utils.prerender_pdf_report, utils.PDF_PRERENDER
+    def failing_prerender(year, *args, **kwargs):
+        raise RuntimeError("prerender failed")
+    utils.prerender_pdf_report, utils.PDF_PRERENDER = failing_prerender, True
+    try:
+        before = write_queue.status()
+        committed = write_queue.enqueue_month(emps[0], 2041, 3, _entries(emps[0], 2041, 3, 6.0, proj))
+        assert committed.result(timeout=30) is True
+        assert write_queue.status()["wiederholungen"] == before["wiederholungen"]
+        assert _hours(emps[0], 2041, 3) == [6.0, 6.0, 6.0]
+    finally:
+        utils.prerender_pdf_report, utils.PDF_PRERENDER = prerender, pdf_prerender
+    print("Post-Commit Error: OK")
+    write_queue.BATCH_WAIT, write_queue.RETRIES = batch_wait, retries
+
+    # Cleanup
+    for emp in emps:
+        for month in (3, 5):
+            utils.save_month_entries(emp, 2041, month, [])
+        utils.remove_employee(emp)
+    utils.delete_project(proj)
+
+if __name__ == "__main__":
+    test_write_behind()
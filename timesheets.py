@@ -0,0 +1,227 @@
+"""
+Monthly timesheets per employee as PDF, in the Projekte x Tage layout of the editor,
+with signature lines. Batches for all employees are rendered across a process pool
+and written into a ZIP stream.
+
+Data is loaded once in the parent process; workers only receive plain lists and never
+touch the database (utils and work_calendar are imported lazily for that reason).
+
+CLI usage:
+    python timesheets.py 2026 3 -o stundenzettel_2026_03.zip --workers 8
+"""
+import argparse
+import calendar
+import multiprocessing
+import os
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+WEEKDAY_NAMES = ["Mo", "Di", "Mi", "Do", "Fr", "Sa", "So"]
+
+# Below this many timesheets the process pool startup costs more than it saves
+MIN_PARALLEL_BATCH = 4
+
+# Styles are built once per process and shared by every timesheet it renders
+STYLES = getSampleStyleSheet()
+CELL_STYLE = ParagraphStyle('TimesheetCell', parent=STYLES['Normal'], fontSize=7, leading=8)
+HEADER_ROWS = 2
+TIMESHEET_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, HEADER_ROWS - 1), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, HEADER_ROWS - 1), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, HEADER_ROWS - 1), 'Helvetica-Bold'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 7),
+    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 2),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+    ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+SIGNATURE_TABLE_STYLE = TableStyle([
+    ('LINEABOVE', (0, 1), (0, 1), 0.5, colors.black),
+    ('LINEABOVE', (2, 1), (2, 1), 0.5, colors.black),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 1), (-1, 1), 2),
+])
+NON_WORKDAY_COLOR = colors.HexColor('#e0e0e0')
+
+PROJECT_COL_WIDTH = 110
+DAY_COL_WIDTH = 19
+TOTAL_COL_WIDTH = 40
+
+
+def _format_hours(value):
+    return f"{round(float(value), 2):g}"
+
+
+def load_timesheets(year, month, employees=None):
+    """
+    Loads the data for all timesheets of a month in a few queries and returns one
+    plain dict per employee (picklable, ready for render_timesheet).
+    employees: list of names, default all employees except 'System'.
+    """
+    import utils
+    import work_calendar
+
+    year, month = int(year), int(month)
+    num_days = calendar.monthrange(year, month)[1]
+    days = [date(year, month, d) for d in range(1, num_days + 1)]
+
+    if employees is None:
+        employees = [e for e in utils.get_employees() if e != "System"]
+    assignments = utils.get_all_assigned_projects()
+    regions = utils.get_employee_regions()
+
+    df = utils.get_month_entries(year, month)
+    df = df[df['mitarbeiter'].isin(employees) & df['projekt'].notna()]
+    # Cell value like the editor: hours for work, the code otherwise; later entries win
+    df = df.assign(
+        tag=df['datum'].map(lambda d: d.day),
+        wert=df['typ'].where(df['typ'] != 'Arbeit', df['stunden'].map(_format_hours)),
+    )
+    cells = {
+        emp: dict(zip(zip(grp['projekt'], grp['tag']), grp['wert']))
+        for emp, grp in df.groupby('mitarbeiter', sort=False)
+    }
+    work = df[df['typ'] == 'Arbeit']
+    hours = work.groupby(['mitarbeiter', 'projekt'])['stunden'].sum().to_dict()
+    day_hours = work.groupby(['mitarbeiter', 'tag'])['stunden'].sum().to_dict()
+
+    sheets = []
+    for emp in employees:
+        # Day defaults from the employee's calendar region (one cached array per region)
+        defaults = work_calendar.default_row(year, month, regions.get(emp, utils.DEFAULT_REGION))
+        emp_cells = cells.get(emp, {})
+        projects = sorted(set(assignments.get(emp, [])) | {proj for proj, _ in emp_cells})
+        rows = []
+        for proj in projects:
+            row = [emp_cells.get((proj, d)) or defaults[d - 1] or "" for d in range(1, num_days + 1)]
+            rows.append((proj, row, hours.get((emp, proj), 0.0)))
+        sheets.append({
+            "employee": emp,
+            "year": year,
+            "month": month,
+            "title": f"Stundenzettel {utils.MONTH_NAMES[month - 1]} {year}",
+            "weekdays": [WEEKDAY_NAMES[d.weekday()] for d in days],
+            "defaults": defaults,
+            "rows": rows,
+            "day_totals": [day_hours.get((emp, d), 0.0) for d in range(1, num_days + 1)],
+        })
+    return sheets
+
+
+def render_timesheet(sheet):
+    """Renders one timesheet dict (see load_timesheets) to PDF bytes. Runs in pool workers."""
+    num_days = len(sheet["defaults"])
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), leftMargin=36, rightMargin=36, topMargin=36, bottomMargin=36)
+    elements = [
+        Paragraph(sheet["title"], STYLES['Title']),
+        Paragraph(f"Mitarbeiter: {escape(sheet['employee'])}", STYLES['Heading2']),
+        Spacer(1, 10),
+    ]
+
+    data = [
+        ["Projekt"] + [str(d) for d in range(1, num_days + 1)] + ["Gesamt"],
+        [""] + sheet["weekdays"] + [""],
+    ]
+    for proj, cells, total in sheet["rows"]:
+        data.append([Paragraph(escape(proj), CELL_STYLE)] + cells + [_format_hours(total)])
+    day_totals = sheet["day_totals"]
+    data.append(["Gesamt"] + [_format_hours(h) if h else "" for h in day_totals] + [_format_hours(sum(day_totals))])
+
+    table = Table(data, colWidths=[PROJECT_COL_WIDTH] + [DAY_COL_WIDTH] * num_days + [TOTAL_COL_WIDTH], repeatRows=HEADER_ROWS)
+    table.setStyle(TIMESHEET_TABLE_STYLE)
+    # Shade weekends, holidays and company vacation days
+    shading = [('BACKGROUND', (i + 1, HEADER_ROWS), (i + 1, -2), NON_WORKDAY_COLOR)
+               for i, default in enumerate(sheet["defaults"]) if default]
+    if shading:
+        table.setStyle(TableStyle(shading))
+    elements.append(table)
+    elements.append(Spacer(1, 50))
+
+    signature = Table(
+        [["", "", ""], ["Datum, Unterschrift Mitarbeiter", "", "Datum, Unterschrift Vorgesetzte/r"]],
+        colWidths=[250, 100, 250]
+    )
+    signature.setStyle(SIGNATURE_TABLE_STYLE)
+    elements.append(signature)
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def timesheet_filename(employee, year, month):
+    name = employee.replace(" ", "_").replace("/", "-")
+    return f"{int(year)}_{int(month):02d}_stundenzettel_{name}.pdf"
+
+
+def write_timesheet_zip(out, year, month, employees=None, max_workers=None, progress=None):
+    """
+    Renders the timesheets of a month for all (or the given) employees and writes them into
+    a ZIP archive on the binary stream `out`, fanning out across a process pool.
+    progress: optional callback(done, total, employee) called after each timesheet.
+    Returns the number of timesheets written.
+    """
+    sheets = load_timesheets(year, month, employees)
+    total = len(sheets)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        if max_workers == 1 or total < MIN_PARALLEL_BATCH:
+            for done, sheet in enumerate(sheets, start=1):
+                zf.writestr(timesheet_filename(sheet["employee"], year, month), render_timesheet(sheet))
+                if progress:
+                    progress(done, total, sheet["employee"])
+        else:
+            # spawn: the parent may hold DB connections and threads that must not be forked
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(max_workers, total), mp_context=ctx) as pool:
+                futures = {pool.submit(render_timesheet, sheet): sheet["employee"] for sheet in sheets}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    employee = futures[future]
+                    zf.writestr(timesheet_filename(employee, year, month), future.result())
+                    if progress:
+                        progress(done, total, employee)
+    return total
+
+
+def generate_timesheet_zip(year, month, employees=None, max_workers=None, progress=None):
+    """Returns the ZIP archive with all timesheets of a month as bytes."""
+    buffer = BytesIO()
+    write_timesheet_zip(buffer, year, month, employees, max_workers, progress)
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate monthly timesheet PDFs for all employees as a ZIP archive.")
+    parser.add_argument("year", type=int)
+    parser.add_argument("month", type=int)
+    parser.add_argument("--employee", action="append", dest="employees", help="Only this employee (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", help="ZIP file (default: <year>_<month>_stundenzettel.zip)")
+    args = parser.parse_args(argv)
+
+    output = args.output or f"{args.year}_{args.month:02d}_stundenzettel.zip"
+
+    def report(done, total, employee):
+        print(f"[{done}/{total}] {employee}", file=sys.stderr)
+
+    with open(output, "wb") as out:
+        count = write_timesheet_zip(out, args.year, args.month, args.employees, args.workers, report)
+    print(f"{count} Stundenzettel in {output} geschrieben.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
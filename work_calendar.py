@@ -0,0 +1,154 @@
+"""
+Working-day calendar: per-year day-type arrays (workday / weekend / holiday / company vacation)
+and a numpy busdaycalendar, built once per year and reused by the matrix editor, timesheets,
+target-hour calculations and reports.
+
+Holidays are stored per calendar region (utils.DEFAULT_REGION = company calendar); every employee
+is assigned a region. Calendars are memoized per (region, year) and rebuilt automatically when
+holidays or vacation days change (see utils.get_holiday_version).
+"""
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+WORKDAY = 0
+WEEKEND = 1
+HOLIDAY = 2
+VACATION = 3
+
+DAY_TYPE_NAMES = {WORKDAY: "Arbeitstag", WEEKEND: "Wochenende", HOLIDAY: "Feiertag", VACATION: "Betriebsurlaub"}
+
+# Editor default per day type, indexed by day type (priority: weekend > holiday > vacation)
+DEFAULT_VALUES = np.array([None, "/", "F", "U"], dtype=object)
+
+
+class YearCalendar:
+    """Precomputed day types for one year and calendar region. Day index 0 is January 1st."""
+
+    def __init__(self, year, holidays, vacation_days, region=utils.DEFAULT_REGION):
+        self.year = year
+        self.region = region
+        self.start = np.datetime64(date(year, 1, 1), 'D')
+        dates = np.arange(self.start, np.datetime64(date(year + 1, 1, 1), 'D'))
+
+        holiday_dates = np.array(sorted(d for d in holidays if d.year == year), dtype='datetime64[D]')
+        vacation_dates = np.array(sorted(d for d in vacation_days if d.year == year), dtype='datetime64[D]')
+
+        # Assign in reverse priority so weekend wins over holiday wins over vacation
+        day_types = np.full(len(dates), WORKDAY, dtype=np.int8)
+        day_types[np.isin(dates, vacation_dates)] = VACATION
+        day_types[np.isin(dates, holiday_dates)] = HOLIDAY
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 gives Monday = 0
+        weekday = (dates.astype('int64') + 3) % 7
+        day_types[weekday >= 5] = WEEKEND
+        day_types.setflags(write=False)
+        self.day_types = day_types
+        self.weekday = weekday
+
+        self.busdaycal = np.busdaycalendar(weekmask="1111100", holidays=np.concatenate([holiday_dates, vacation_dates]))
+
+        # Prefix sums make working-day counts over any range O(1)
+        self._workday_cumsum = np.concatenate([[0], np.cumsum(day_types == WORKDAY)])
+        # Day index of the first day of each month (index 12 = end of year)
+        self._month_offsets = np.concatenate([[0], np.cumsum([calendar.monthrange(year, m)[1] for m in range(1, 13)])])
+
+    def _index(self, day):
+        return int((np.datetime64(day, 'D') - self.start).astype('int64'))
+
+    def month_slice(self, month):
+        return slice(int(self._month_offsets[month - 1]), int(self._month_offsets[month]))
+
+    def day_types_for_month(self, month):
+        """Day types of one month as a read-only array (index 0 = day 1)."""
+        return self.day_types[self.month_slice(month)]
+
+    def default_row(self, month):
+        """Editor default values for each day of the month ('/', 'F', 'U' or None)."""
+        return DEFAULT_VALUES[self.day_types_for_month(month)].tolist()
+
+    def working_days(self, start, end):
+        """Number of working days between start and end (both inclusive, clipped to this year)."""
+        first = max(self._index(start), 0)
+        last = min(self._index(end), len(self.day_types) - 1)
+        if last < first:
+            return 0
+        return int(self._workday_cumsum[last + 1] - self._workday_cumsum[first])
+
+    def working_days_per_month(self):
+        """Array of 12 working-day counts."""
+        return np.diff(self._workday_cumsum[self._month_offsets])
+
+
+# One int8 array per (region, year) is small, so keep plenty of them
+@lru_cache(maxsize=512)
+def _year_calendar(year, region, holiday_version):
+    # All regions come from one cached query, so a new region/year never costs an extra round trip
+    holidays = utils.load_region_holidays().get(region, ())
+    return YearCalendar(year, set(holidays), set(utils.load_vacation_days()), region)
+
+
+def year_calendar(year, region=utils.DEFAULT_REGION):
+    """Returns the (memoized) YearCalendar for the given year and calendar region."""
+    return _year_calendar(int(year), region or utils.DEFAULT_REGION, utils.get_holiday_version())
+
+
+def employee_calendar(year, employee):
+    """Returns the YearCalendar of the employee's calendar region."""
+    return year_calendar(year, utils.get_employee_region(employee))
+
+
+def day_types(year, month, region=utils.DEFAULT_REGION):
+    """Day-type array for one month (WORKDAY, WEEKEND, HOLIDAY, VACATION per day)."""
+    return year_calendar(year, region).day_types_for_month(int(month))
+
+
+def default_row(year, month, region=utils.DEFAULT_REGION):
+    """Editor default values for each day of the month ('/', 'F', 'U' or None)."""
+    return year_calendar(year, region).default_row(int(month))
+
+
+def default_matrix(year, month, projects, region=utils.DEFAULT_REGION):
+    """Empty editor matrix (Index: projects, Columns: days 1..n) pre-filled with the day defaults."""
+    row = default_row(year, month, region)
+    days = list(range(1, len(row) + 1))
+    return pd.DataFrame([row] * len(projects), index=list(projects), columns=days, dtype=object)
+
+
+def month_matrix(year, month, projects, entries, region=utils.DEFAULT_REGION):
+    """
+    Editor matrix of one employee-month: the day defaults (weekend "/", holiday "F",
+    company vacation "U") overlaid with the saved entries (hours for Arbeit, else the code).
+    Entries of projects not in `projects` are ignored.
+    """
+    matrix = default_matrix(year, month, projects, region)
+    for _, row in entries.iterrows():
+        proj = row['projekt']
+        val = row['stunden'] if row['typ'] == 'Arbeit' else row['typ']
+        # Keep the day default if the DB value is None/empty
+        if proj in matrix.index and val is not None and str(val).strip() != "" and str(val).lower() != 'nan':
+            matrix.at[proj, row['datum'].day] = val
+    return matrix
+
+
+def working_days(start, end, region=utils.DEFAULT_REGION):
+    """Number of working days between start and end (both inclusive), across years if needed."""
+    if isinstance(start, str):
+        start = date.fromisoformat(start)
+    if isinstance(end, str):
+        end = date.fromisoformat(end)
+    total = 0
+    for year in range(start.year, end.year + 1):
+        total += year_calendar(year, region).working_days(start, end)
+    return total
+
+
+def working_days_in_month(year, month, region=utils.DEFAULT_REGION):
+    """Number of working days in one month."""
+    first = date(int(year), int(month), 1)
+    last = first + timedelta(days=calendar.monthrange(int(year), int(month))[1] - 1)
+    return year_calendar(year, region).working_days(first, last)
@@ -0,0 +1,212 @@
+"""
+Optional write-behind queue for month saves.
+
+enqueue_month() / enqueue_matrix() validate a save, queue it and return a Future right away;
+one worker thread commits the queued months in batches (one transaction per batch, via
+utils.save_month_batch). A month that is saved again before its write started replaces the
+queued version (last save wins, every caller's Future resolves with its outcome). A failed
+batch is retried with backoff, then split into single months so one bad month does not fail
+the others.
+
+Durability: future.result() waits for one save, flush() for everything queued so far (e.g.
+before reports and exports). pending_entries() returns a month's not yet committed entries,
+so the editor can show what was saved. Queued saves live in process memory only: saves not
+committed when the process dies are lost (flush() runs at interpreter exit).
+
+Configuration (environment):
+    WRITE_BEHIND           1 = app.py queues month saves (default: save synchronously)
+    WRITE_BATCH_SIZE       maximum months per transaction (default 20)
+    WRITE_BATCH_WAIT_MS    time to collect further saves before a commit (default 50)
+    WRITE_RETRIES          retries of a failed batch (default 3)
+"""
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+
+import utils
+
+ENABLED = os.getenv("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "20"))
+BATCH_WAIT = float(os.getenv("WRITE_BATCH_WAIT_MS", "50")) / 1000
+RETRIES = int(os.getenv("WRITE_RETRIES", "3"))
+
+RETRY_BACKOFF = 0.2
+# flush() at interpreter exit waits at most this long
+SHUTDOWN_TIMEOUT = 30
+
+ENTRY_TYPES = ("Arbeit", "U", "KK", "F", "/")
+
+
+class _Pending:
+    """Latest entries of one queued employee-month and the Futures waiting for them."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.futures = []
+        self.queued_at = time.monotonic()
+
+
+# (mitarbeiter, year, month) -> _Pending, in queue order
+_pending = OrderedDict()
+# (mitarbeiter, year, month) -> entries of the batch being committed
+_in_flight = {}
+# Futures not resolved yet (for flush)
+_outstanding = set()
+_cond = threading.Condition()
+_worker = None
+_stats = {"batches": 0, "saves": 0, "coalesced": 0, "retries": 0, "failed": 0, "max_queue_s": 0.0}
+
+
+def validate(mitarbeiter, year, month, entries):
+    """Returns an error message, or None if the save can be queued."""
+    if not mitarbeiter or mitarbeiter.strip() not in utils.get_employees():
+        return f"Unknown employee: {mitarbeiter}"
+    if not 1 <= int(month) <= 12:
+        return f"Invalid month: {month}"
+    for e in entries:
+        datum = e.get('datum')
+        if datum is None or (datum.year, datum.month) != (int(year), int(month)):
+            return f"Entry outside {int(month):02d}/{int(year)}: {datum}"
+        if e.get('typ') not in ENTRY_TYPES:
+            return f"Invalid entry type: {e.get('typ')}"
+        try:
+            float(e.get('stunden') or 0)
+        except (TypeError, ValueError):
+            return f"Invalid hours: {e.get('stunden')}"
+    return None
+
+
+def _ensure_worker():
+    global _worker
+    with _cond:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="write-behind", daemon=True)
+            _worker.start()
+
+
+def enqueue_month(mitarbeiter, year, month, entries):
+    """
+    Validates and queues a save_month_entries call. Returns a Future resolving to True once
+    the month is committed (False if it failed), or None if the save is invalid.
+    """
+    error = validate(mitarbeiter, year, month, entries)
+    if error:
+        print(f"Error queueing month save: {error}")
+        return None
+    key = (mitarbeiter.strip(), int(year), int(month))
+    future = Future()
+    with _cond:
+        item = _pending.get(key)
+        if item is None:
+            item = _pending[key] = _Pending(None)
+        else:
+            _stats["coalesced"] += 1
+        item.entries = [dict(e) for e in entries]
+        item.futures.append(future)
+        _outstanding.add(future)
+        _cond.notify_all()
+    _ensure_worker()
+    return future
+
+
+def enqueue_matrix(mitarbeiter, year, month, df_matrix):
+    """Queues a save_matrix_entries call (see enqueue_month)."""
+    return enqueue_month(mitarbeiter, year, month, utils.matrix_to_entries(mitarbeiter, year, month, df_matrix))
+
+
+def pending_entries(mitarbeiter, year, month):
+    """The queued or committing entries of an employee-month, or None if nothing is pending."""
+    key = (mitarbeiter.strip(), int(year), int(month))
+    with _cond:
+        item = _pending.get(key)
+        if item is not None:
+            return list(item.entries)
+        if key in _in_flight:
+            return list(_in_flight[key])
+    return None
+
+
+def _take_batch():
+    with _cond:
+        while not _pending:
+            _cond.wait()
+        # Give concurrent savers a moment to join this transaction
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(_pending) < BATCH_SIZE and time.monotonic() < deadline:
+            _cond.wait(deadline - time.monotonic())
+        batch = []
+        while _pending and len(batch) < BATCH_SIZE:
+            key, item = _pending.popitem(last=False)
+            _in_flight[key] = item.entries
+            _stats["max_queue_s"] = max(_stats["max_queue_s"], time.monotonic() - item.queued_at)
+            batch.append((key, item))
+        return batch
+
+
+def _commit(batch, retries):
+    saves = [(*key, item.entries) for key, item in batch]
+    for attempt in range(retries + 1):
+        if utils.save_month_batch(saves):
+            return True
+        if attempt < retries:
+            with _cond:
+                _stats["retries"] += 1
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+    return False
+
+
+def _run():
+    while True:
+        batch = _take_batch()
+        try:
+            ok = _commit(batch, RETRIES)
+            results = {key: ok for key, _ in batch}
+            if not ok and len(batch) > 1:
+                results = {key: _commit([(key, item)], 0) for key, item in batch}
+        except Exception as e:
+            print(f"Error in write-behind worker: {e}")
+            results = {key: False for key, _ in batch}
+        with _cond:
+            _stats["batches"] += 1
+            _stats["saves"] += len(batch)
+            _stats["failed"] += sum(1 for ok in results.values() if not ok)
+            for key, item in batch:
+                _in_flight.pop(key, None)
+                _outstanding.difference_update(item.futures)
+        for key, item in batch:
+            for future in item.futures:
+                future.set_result(results[key])
+
+
+def flush(timeout=None):
+    """
+    Waits until every save queued before this call is committed or has failed. Returns True if
+    all of them were committed in time.
+    """
+    with _cond:
+        futures = list(_outstanding)
+    if not futures:
+        return True
+    done, not_done = wait(futures, timeout)
+    return not not_done and all(f.result() for f in done)
+
+
+def status():
+    """Queue length and worker counters (for the debug panel)."""
+    with _cond:
+        return {
+            "wartend": len(_pending),
+            "in_arbeit": len(_in_flight),
+            "batches": _stats["batches"],
+            "gespeichert": _stats["saves"],
+            "zusammengefasst": _stats["coalesced"],
+            "wiederholungen": _stats["retries"],
+            "fehlgeschlagen": _stats["failed"],
+            "max_wartezeit_s": _stats["max_queue_s"],
+        }
+
+
+atexit.register(flush, SHUTDOWN_TIMEOUT)